@@ -0,0 +1,1033 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Benchmarks des scripts de prospection (hors ligne)
+Donnees synthetiques, aucun appel reseau.
+
+Usage:
+    python benchmark.py dedup --n 100000
+    python benchmark.py geo --n 200000
+    python benchmark.py scoring --n 500000
+    python benchmark.py templates --n 20000
+    python benchmark.py matcher --n 50000 --brands 500
+    python benchmark.py upload --n 300 --latency 0.05
+    python benchmark.py columnar --n 1000000
+    python benchmark.py leads --n 500000
+    python benchmark.py html --repeat 20
+    python benchmark.py e2e --latency 0.02 --save e2e.json
+    python benchmark.py e2e --cassette fixtures/http/paris.json --baseline e2e.json
+    python benchmark.py stream --concurrency 4
+"""
+
+import sys
+import io
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+import argparse
+import contextlib
+import csv
+import glob
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import zlib
+from datetime import datetime
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # aiosmtpd est optionnel (etape campagne du benchmark e2e)
+    Controller = None
+
+from dedup import LeadDeduplicator
+from geo import GeoIndex
+import html_parsing
+from leads import Lead, SOURCE_ANNUAIRE, batch_timestamp
+import scoring
+from scraper_self_stockage import (
+    PAGESJAUNES_FIELDS, PAGESJAUNES_LISTING, SOCIETE_FIELDS, SOCIETE_LISTING, SOCIETE_MAX_RESULTS,
+    ScopeComplete, SelfStorageScraper,
+)
+
+NAME_PREFIXES = ['Box', 'Stock', 'Garde', 'Self', 'Espace', 'Depot', 'Local', 'Entrepot', 'Cube', 'Abri']
+NAME_SUFFIXES = ['Stockage', 'Storage', 'Meuble', 'Box', 'Services', 'Center', 'Plus', 'Express', 'Pro', 'Zen']
+CITIES = [
+    ('Paris', '75', 48.85, 2.35), ('Lyon', '69', 45.76, 4.83), ('Marseille', '13', 43.30, 5.37),
+    ('Toulouse', '31', 43.60, 1.44), ('Bordeaux', '33', 44.84, -0.58), ('Nantes', '44', 47.22, -1.55),
+    ('Lille', '59', 50.63, 3.06), ('Nice', '06', 43.70, 7.26), ('Rennes', '35', 48.11, -1.68),
+    ('Strasbourg', '67', 48.57, 7.75),
+]
+
+
+def synthetic_leads(n: int, duplicate_rate: float = 0.2, seed: int = 42) -> list:
+    """
+    Leads synthetiques realistes: noms composes, code postal, coordonnees,
+    et une part de quasi-doublons (casse, forme juridique, sigle, coquille).
+    """
+    rng = random.Random(seed)
+    leads = []
+    for i in range(n):
+        if leads and rng.random() < duplicate_rate:
+            original = rng.choice(leads)
+            name = original['name']
+            variant = rng.randrange(4)
+            if variant == 0:
+                name = name.upper()
+            elif variant == 1:
+                name = f'{name} SARL'
+            elif variant == 2:
+                name = f'{name} ({"".join(w[0] for w in name.split()).upper()})'
+            else:
+                pos = rng.randrange(len(name))
+                name = name[:pos] + name[pos + 1:]
+            lead = dict(original, name=name, source='overpass')
+            lead.pop('siren', None)
+            lead['lat'] = original['lat'] + rng.uniform(-0.0005, 0.0005)
+            lead['lon'] = original['lon'] + rng.uniform(-0.0005, 0.0005)
+            leads.append(lead)
+            continue
+
+        city, dept, lat, lon = rng.choice(CITIES)
+        leads.append({
+            'name': f'{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)} {city} {i}',
+            'city': city,
+            'postal_code': f'{dept}{rng.randrange(1000):03d}',
+            'siren': f'{rng.randrange(10 ** 8, 10 ** 9)}',
+            'lat': lat + rng.uniform(-0.3, 0.3),
+            'lon': lon + rng.uniform(-0.3, 0.3),
+            'source': 'annuaire_entreprises',
+        })
+    return leads
+
+
+def bench_dedup(args):
+    """Temps de deduplication pour n/4, n/2, n leads: doit rester sous-quadratique"""
+    print(f"Deduplication: jusqu'a {args.n} leads synthetiques")
+    print(f"{'leads':>10} {'uniques':>10} {'fusions':>10} {'comparaisons':>13} {'temps (s)':>10} {'leads/s':>10}")
+
+    timings = []
+    for size in (args.n // 4, args.n // 2, args.n):
+        leads = synthetic_leads(size, seed=args.seed)
+        dedup = LeadDeduplicator()
+        start = time.perf_counter()
+        dedup.dedupe(leads)
+        elapsed = time.perf_counter() - start
+        timings.append((size, elapsed))
+
+        stats = dedup.stats()
+        print(f"{size:>10} {stats['unique']:>10} {stats['merged']:>10} {stats['comparisons']:>13} "
+              f"{elapsed:>10.2f} {size / elapsed:>10.0f}")
+
+    # Quadratique: x4 quand n double. Lineaire: x2.
+    ratio = timings[-1][1] / timings[-2][1]
+    verdict = 'OK (sous-quadratique)' if ratio < 3 else 'ATTENTION (proche du quadratique)'
+    print(f"\nRatio temps(n) / temps(n/2): {ratio:.2f} -> {verdict}")
+
+
+def bench_geo(args):
+    """Latence des requetes de l'index spatial sur un jeu national synthetique"""
+    leads = synthetic_leads(args.n, duplicate_rate=0.0, seed=args.seed)
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    index = GeoIndex.from_leads(leads)
+    build = time.perf_counter() - start
+    print(f"Index spatial: {len(index)} leads, construction {build:.2f}s")
+
+    queries = [(rng.uniform(43.0, 50.5), rng.uniform(-1.5, 7.5)) for _ in range(args.queries)]
+
+    def timed(label, fn):
+        start = time.perf_counter()
+        results = [fn(lat, lon) for lat, lon in queries]
+        elapsed = (time.perf_counter() - start) / len(queries) * 1000
+        print(f"  {label:<32} {elapsed:8.3f} ms/requete ({sum(results) / len(results):.1f} resultats)")
+
+    timed('rayon 10 km', lambda lat, lon: len(index.within(lat, lon, 10)))
+    timed('rayon 50 km', lambda lat, lon: len(index.within(lat, lon, 50)))
+    timed('plus proche voisin', lambda lat, lon: len(index.nearest(lat, lon, k=1)))
+    timed('5 plus proches voisins', lambda lat, lon: len(index.nearest(lat, lon, k=5)))
+
+    start = time.perf_counter()
+    index.count_by_departement()
+    print(f"  {'leads par departement':<32} {(time.perf_counter() - start) * 1000:8.3f} ms (total)")
+
+
+def bench_scoring(args):
+    """Scoring par lead (boucle Python) vs scoring batch vectorise"""
+    rng = random.Random(args.seed)
+    leads = [
+        {field: 'x' if rng.random() < 0.5 else '' for field in scoring.ENRICHED_WEIGHTS}
+        for _ in range(args.n)
+    ]
+    scorer = scoring.LeadScorer(scoring.ENRICHED_WEIGHTS)
+    print(f"Scoring: {args.n} leads (NumPy: {'oui' if scoring.np is not None else 'non'})")
+
+    start = time.perf_counter()
+    for lead in leads:
+        scorer.score_lead(lead)
+    counts = {name: sum(1 for l in leads if l['priority'] == name) for name, _ in scoring.PRIORITY_THRESHOLDS}
+    per_lead = time.perf_counter() - start
+    print(f"  {'par lead + comptages':<24} {per_lead:8.3f}s")
+
+    start = time.perf_counter()
+    summary = scorer.score_batch(leads)
+    batch = time.perf_counter() - start
+    print(f"  {'batch (une passe)':<24} {batch:8.3f}s  (x{per_lead / batch:.1f})")
+
+    same = all(summary[name] == count for name, count in counts.items())
+    print(f"  Comptages identiques: {'[OK]' if same else '[!] NON'} {counts}")
+
+
+def bench_templates(args):
+    """Personnalisation + construction MIME: email.mime par lead vs template compile"""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email_campaign import EMAIL_TEMPLATES, FROM_EMAIL, FROM_NAME
+    from template_engine import compile_templates
+
+    leads = [{'name': f'Centre Stockage {i}', 'email': f'contact{i}@example.fr'} for i in range(args.n)]
+    raw_template = EMAIL_TEMPLATES[args.template]
+    compiled = compile_templates(EMAIL_TEMPLATES, FROM_EMAIL, FROM_NAME)[args.template]
+    print(f"Templates: {args.n} emails '{args.template}'")
+
+    start = time.perf_counter()
+    for lead in leads:
+        company = lead.get('name', 'votre centre')
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = raw_template['subject'].format(company=company)
+        msg['From'] = f'{FROM_NAME} <{FROM_EMAIL}>'
+        msg['To'] = lead['email']
+        msg.attach(MIMEText(raw_template['body'].format(company=company, first_name=''), 'plain', 'utf-8'))
+        msg.as_string()
+    naive = time.perf_counter() - start
+    print(f"  {'str.format + email.mime':<26} {args.n / naive:10.0f} emails/s")
+
+    start = time.perf_counter()
+    for lead in leads:
+        subject, body = compiled.render(lead)
+        compiled.build_message(lead['email'], subject, body)
+    fast = time.perf_counter() - start
+    print(f"  {'template compile':<26} {args.n / fast:10.0f} emails/s  (x{naive / fast:.1f})")
+
+
+def bench_matcher(args):
+    """Detection des operateurs: boucle `key in name` vs matcher compile"""
+    from operator_kb import get_kb
+    from operator_matcher import KeywordMatcher
+
+    rng = random.Random(args.seed)
+    operators = {operator['brand']: operator for operator in get_kb().operators}
+    # Marques et alias synthetiques pour simuler une liste qui grandit
+    while len(operators) < args.brands:
+        alias = f'{rng.choice(NAME_PREFIXES)}{rng.choice(NAME_SUFFIXES)} {rng.randrange(10 ** 6)}'.lower()
+        operators[alias] = {'website': f'https://www.{alias.replace(" ", "")}.fr'}
+    brands = list(operators)
+
+    names = [lead['name'] for lead in synthetic_leads(args.n, duplicate_rate=0.0, seed=args.seed)]
+    for i in range(0, len(names), 10):
+        names[i] = f'{rng.choice(brands).upper()} {names[i]}'
+    print(f"Matcher: {len(names)} noms, {len(operators)} marques")
+
+    def loop_match(name):
+        name_lower = name.lower()
+        for key, data in operators.items():
+            if key in name_lower:
+                return data
+        return None
+
+    start = time.perf_counter()
+    found = sum(1 for name in names if loop_match(name))
+    loop = time.perf_counter() - start
+    print(f"  {'boucle key in name':<24} {loop:8.3f}s  ({found} trouves)")
+
+    start = time.perf_counter()
+    matcher = KeywordMatcher(operators)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    found = sum(1 for name in names if matcher.match(name))
+    compiled = time.perf_counter() - start
+    print(f"  {'matcher compile':<24} {compiled:8.3f}s  ({found} trouves, construction {build * 1000:.1f} ms)"
+          f"  x{loop / compiled:.1f}")
+
+
+def bench_upload(args):
+    """Envoi vers l'API BoxiBox (faux serveur local): un par un vs client par lots"""
+    from boxibox_client import BoxiBoxClient
+    from boxibox_stub import BoxiBoxStub
+
+    leads = synthetic_leads(args.n, duplicate_rate=0.0)
+    for i, lead in enumerate(leads):
+        lead.update(email=f'contact{i}@centre{i}.fr', score=60, priority='warm')
+    print(f"Upload: {len(leads)} leads, latence serveur {args.latency * 1000:.0f} ms, "
+          f"{args.fail_rate:.0%} d'erreurs 500")
+
+    for label, concurrency in (('un par un', 1), (f'lots x{args.concurrency}', args.concurrency)):
+        with BoxiBoxStub(api_key='bench', latency=args.latency, fail_rate=args.fail_rate) as stub:
+            # Pas de throttle cote stub: on mesure le client, pas la limite de 60 req/min
+            client = BoxiBoxClient(stub.url, 'bench', chunk_size=args.chunk_size, concurrency=concurrency,
+                                   rate=10000, backoff=0.01)
+            start = time.perf_counter()
+            results = client.upload(leads, verbose=False)
+            elapsed = time.perf_counter() - start
+            client.close()
+        counts = client.summary(results)
+        print(f"  {label:<16} {elapsed:7.2f}s  {len(leads) / elapsed:8.1f} leads/s  "
+              f"({counts['created']} crees, {counts['error']} erreurs, {stub.requests} requetes)")
+
+
+# Chargements mesures par le benchmark columnar (un sous-processus chacun)
+COLUMNAR_LOADS = (
+    ('baseline', 'interpreteur + imports'),
+    ('csv', 'CSV -> dicts (+ int/float)'),
+    ('csv-email-score', 'CSV -> email+score'),
+    ('parquet', 'Parquet -> dicts'),
+    ('parquet-email-score', 'Parquet -> email+score'),
+    ('arrow-email-score', 'Parquet -> Arrow email+score'),
+)
+
+
+def columnar_leads(n: int, seed: int = 42):
+    """Flux de leads enrichis synthetiques (sans tout garder en memoire)"""
+    rng = random.Random(seed)
+    for i in range(n):
+        city, dept, lat, lon = rng.choice(CITIES)
+        score = rng.choice((40, 55, 60, 75, 80, 95))
+        yield {
+            'name': f'{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)} {city} {i}',
+            'email': f'contact{i}@centre{i}.fr',
+            'phone': f'0{rng.randrange(1, 10)} {rng.randrange(10 ** 8):08d}',
+            'website': f'https://www.centre{i}.fr',
+            'address': f'{rng.randrange(1, 200)} rue de la Gare, {dept}{rng.randrange(1000):03d} {city}',
+            'city': city,
+            'postal_code': f'{dept}{rng.randrange(1000):03d}',
+            'siren': f'{rng.randrange(10 ** 8, 10 ** 9)}',
+            'lat': lat + rng.uniform(-0.3, 0.3),
+            'lon': lon + rng.uniform(-0.3, 0.3),
+            'score': score,
+            'priority': 'hot' if score >= 70 else 'warm' if score >= 50 else 'cold',
+            'source': 'annuaire_entreprises',
+            'ville_recherche': city,
+            'scraped_at': '2026-01-15T08:00:00',
+        }
+
+
+def _peak_rss_mb():
+    """Pic de memoire residente du processus (Mo), None si inconnu"""
+    # Linux: VmHWM repart de zero a l'exec, contrairement a ru_maxrss (herite du parent)
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Ko sous Linux, octets sous macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def columnar_load(args):
+    """Sous-processus du benchmark columnar: un chargement, resultat en JSON"""
+    import columnar
+
+    start = time.perf_counter()
+    rows = 0
+    if args.load == 'csv':
+        with open(args.file, newline='', encoding='utf-8') as f:
+            leads = []
+            for row in csv.DictReader(f):
+                row['score'] = int(row['score'])
+                row['lat'] = float(row['lat'])
+                row['lon'] = float(row['lon'])
+                leads.append(row)
+        rows = len(leads)
+    elif args.load == 'csv-email-score':
+        with open(args.file, newline='', encoding='utf-8') as f:
+            leads = [{'email': row['email'], 'score': int(row['score'])} for row in csv.DictReader(f)]
+        rows = len(leads)
+    elif args.load == 'parquet':
+        rows = len(columnar.load_leads(args.file))
+    elif args.load == 'parquet-email-score':
+        rows = len(columnar.load_leads(args.file, columns=['email', 'score']))
+    elif args.load == 'arrow-email-score':
+        import pyarrow.compute as pc
+        table = columnar.read_table(args.file, columns=['email', 'score'])
+        rows = pc.sum(pc.greater_equal(table['score'], 50)).as_py()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'rss_mb': _peak_rss_mb(), 'rows': rows}))
+
+
+def bench_columnar(args):
+    """Chargement d'un fichier de leads: CSV vs Parquet (temps et pic de RSS, un processus par mesure)"""
+    import columnar
+
+    if args.load:
+        columnar_load(args)
+        return
+    if not columnar.available():
+        print("[!] pyarrow non installe: pip install pyarrow")
+        return
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        csv_file = os.path.join(tmp, 'leads.csv')
+        parquet_file = os.path.join(tmp, 'leads.parquet')
+
+        # Ecriture des deux fichiers en un seul passage, en streaming
+        start = time.perf_counter()
+        with open(csv_file, 'w', newline='', encoding='utf-8') as f, \
+                columnar.ParquetSink(parquet_file, row_group_size=args.row_group) as sink:
+            writer = None
+            for lead in columnar_leads(args.n, seed=args.seed):
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(lead))
+                    writer.writeheader()
+                writer.writerow(lead)
+                sink.write(lead)
+        print(f"Columnar: {args.n} leads, ecriture CSV + Parquet {time.perf_counter() - start:.1f}s")
+        print(f"  CSV     {os.path.getsize(csv_file) / 1e6:8.1f} Mo")
+        print(f"  Parquet {os.path.getsize(parquet_file) / 1e6:8.1f} Mo ({sink.row_groups} row groups)")
+
+        print(f"\n  {'chargement':<30} {'temps (s)':>10} {'pic RSS (Mo)':>13} {'lignes':>10}")
+        for load, label in COLUMNAR_LOADS:
+            path = parquet_file if load.startswith(('parquet', 'arrow')) else csv_file
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), 'columnar', '--load', load, '--file', path],
+                capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            rss = f"{result['rss_mb']:.0f}" if result['rss_mb'] is not None else 'n/a'
+            print(f"  {label:<30} {result['seconds']:>10.2f} {rss:>13} {result['rows']:>10}")
+        print("\n  (arrow-email-score: nombre de leads score >= 50, sans conversion en dicts)")
+
+
+def annuaire_pages(n: int, per_page: int = 25, seed: int = 42):
+    """Pages JSON synthetiques de l'annuaire (chaines neuves a chaque json.loads, comme une vraie reponse)"""
+    rng = random.Random(seed)
+    for start in range(0, n, per_page):
+        results = []
+        for i in range(start, min(n, start + per_page)):
+            city, dept, _, _ = rng.choice(CITIES)
+            results.append({
+                'nom_complet': f'{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)} {city} {i}',
+                'siren': f'{rng.randrange(10 ** 8, 10 ** 9)}',
+                'siege': {'libelle_commune': city, 'code_postal': f'{dept}{rng.randrange(1000):03d}'},
+            })
+        yield json.dumps({'results': results}), city
+
+
+def _dict_lead(result: dict, ville: str, scraped_at: str) -> dict:
+    siege = result['siege']
+    return {
+        'name': result['nom_complet'],
+        'city': siege['libelle_commune'],
+        'postal_code': siege['code_postal'],
+        'siren': result['siren'],
+        'source': 'annuaire_entreprises',
+        'ville_recherche': ville,
+        'scraped_at': datetime.now().isoformat(),
+    }
+
+
+def _slots_lead(result: dict, ville: str, scraped_at: str) -> Lead:
+    siege = result['siege']
+    return Lead(name=result['nom_complet'], city=siege['libelle_commune'], postal_code=siege['code_postal'],
+                siren=result['siren'], source=SOURCE_ANNUAIRE, ville_recherche=ville, scraped_at=scraped_at)
+
+
+def _build_leads(pages: list, build) -> list:
+    """Leads des pages, une horodate par page (la version dict l'ignore et horodate chaque lead)"""
+    leads = []
+    for page, ville in pages:
+        scraped_at = batch_timestamp()
+        for result in json.loads(page)['results']:
+            leads.append(build(result, ville, scraped_at))
+    return leads
+
+
+def bench_leads(args):
+    """Memoire retenue et allocations par lead: dict + horodate par lead vs Lead a slots"""
+    # Villes de recherche: une chaine par ville, comme l'argument --villes
+    pages = [(page, sys.intern(ville)) for page, ville in annuaire_pages(args.n, seed=args.seed)]
+    print(f"Leads: {args.n} leads en {len(pages)} pages de l'annuaire")
+    print(f"  {'representation':<30} {'octets/lead':>12} {'blocs/lead':>11} {'temps (s)':>10}")
+
+    per_lead = []
+    for label, build in (('dict, horodate par lead', _dict_lead), ('Lead a slots, horodate par page', _slots_lead)):
+        # Temps sans tracemalloc (qui ralentit chaque allocation)
+        start = time.perf_counter()
+        leads = _build_leads(pages, build)
+        elapsed = time.perf_counter() - start
+        del leads
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        leads = _build_leads(pages, build)
+        current, _ = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        tracemalloc.stop()
+        per_lead.append((current - before) / len(leads))
+        print(f"  {label:<30} {per_lead[-1]:>12.0f} {blocks / len(leads):>11.1f} {elapsed:>10.2f}")
+        del leads
+
+    old, new = per_lead
+    print(f"\n  Memoire par lead: -{1 - new / old:.0%} ({(old - new) * args.n / 1e6:.0f} Mo pour {args.n} leads)")
+
+
+HTML_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', '*.html')
+
+
+def _legacy_parse(html: str, societe: bool) -> list:
+    """Ancien parsing: page entiere en BeautifulSoup, selecteurs re-analyses pour chaque bloc"""
+    soup = BeautifulSoup(html, 'html.parser')
+    if societe:
+        return [{'name': el.get_text(strip=True)}
+                for result in soup.select(SOCIETE_LISTING)[:SOCIETE_MAX_RESULTS]
+                for el in [result.select_one(SOCIETE_FIELDS['name'])] if el]
+    leads = []
+    for listing in soup.select(PAGESJAUNES_LISTING):
+        lead = {}
+        for field, selector in PAGESJAUNES_FIELDS.items():
+            el = listing.select_one(selector)
+            if el:
+                href = el.get('href', '') if field in ('phone', 'website') else ''
+                lead[field] = href or el.get_text(strip=True)
+        leads.append(lead)
+    return leads
+
+
+def _parse_page(scraper: SelfStorageScraper, html: str, societe: bool) -> list:
+    if societe:
+        return scraper.parse_societe_com(html, 'Benchmark')
+    return scraper.parse_pagesjaunes(html, 'Benchmark')
+
+
+def bench_html(args):
+    """Parsing des pages de resultats HTML: ancien parsing vs chaque backend disponible"""
+    files = sorted(glob.glob(args.pages))
+    if not files:
+        print(f"[!] Aucune page HTML: {args.pages}")
+        return
+    pages = []
+    for filename in files:
+        with open(filename, 'r', encoding='utf-8') as f:
+            pages.append((f.read(), 'societe' in os.path.basename(filename)))
+    size_kb = sum(len(html) for html, _ in pages) / 1024
+    total = len(pages) * args.repeat
+    print(f"HTML: {len(pages)} pages ({size_kb:.0f} Ko), {args.repeat} passes")
+    print(f"  {'parsing':<30} {'pages/s':>10} {'ms/page':>10} {'leads':>8}")
+
+    runs = [('ancien (html.parser complet)', _legacy_parse)]
+    for backend in html_parsing.available_backends():
+        scraper = SelfStorageScraper(html_backend=backend)
+        runs.append((backend, lambda html, societe, scraper=scraper: _parse_page(scraper, html, societe)))
+
+    results = {}
+    baseline = None
+    for label, parse in runs:
+        leads = [parse(html, societe) for html, societe in pages]
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for html, societe in pages:
+                parse(html, societe)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        results[label] = leads
+        print(f"  {label:<30} {total / elapsed:>10.1f} {elapsed * 1000 / total:>10.2f} "
+              f"{sum(len(page) for page in leads):>8}  (x{baseline / elapsed:.1f})")
+
+    # Memes leads quel que soit le backend (horodate exclue)
+    extracted = {label: [[{k: v for k, v in dict(lead).items() if k != 'scraped_at'} for lead in page] for page in leads]
+                 for label, leads in results.items() if label in html_parsing.BACKENDS}
+    identical = len({repr(leads) for leads in extracted.values()}) <= 1
+    print(f"\n  Leads identiques entre backends: {'✅' if identical else '❌'}")
+
+
+# Fausses sources HTTP du benchmark bout en bout (enregistrees puis rejouees)
+E2E_PAGES_PER_CITY = 4
+E2E_DEFAULT_VILLES = 'Paris,Lyon,Marseille,Toulouse,Bordeaux'
+E2E_STAGES = ('scrape', 'enrich', 'campaign')
+
+
+def _e2e_name(ville: str, index: int) -> str:
+    """Nom d'un centre: le meme index donne le meme nom quelle que soit la source (doublons a fusionner)"""
+    return f'{NAME_PREFIXES[index % 10]} {NAME_SUFFIXES[index // 10 % 10]} {ville} {index}'
+
+
+def _e2e_slug(name: str) -> str:
+    return ''.join(c for c in name.lower() if c.isalnum())[:30]
+
+
+class SyntheticUpstream(BaseAdapter):
+    """
+    Reponses deterministes des sources (API Gouv, Nominatim, Overpass,
+    DuckDuckGo, Pappers) pour fabriquer un enregistrement sans reseau
+    """
+
+    def __init__(self, pages_per_city: int = E2E_PAGES_PER_CITY, seed: int = 42):
+        super().__init__()
+        self.pages_per_city = pages_per_city
+        self.seed = seed
+        self.coords = {city: (lat, lon) for city, _, lat, lon in CITIES}
+
+    def send(self, request, **kwargs):
+        parts = urlparse(request.url)
+        params = dict(parse_qsl(parts.query))
+        rng = random.Random(f'{self.seed}|{request.method}|{request.url}|{request.body}')
+        handler = {
+            'recherche-entreprises.api.gouv.fr': self._annuaire,
+            'nominatim.openstreetmap.org': self._nominatim,
+            'overpass-api.de': self._overpass,
+            'api.duckduckgo.com': self._duckduckgo,
+            'api.pappers.fr': self._pappers,
+        }.get(parts.hostname)
+        status, payload = handler(params, request, rng) if handler else (404, {})
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = 'OK' if status == 200 else 'Not Found'
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json; charset=utf-8'})
+        response._content = json.dumps(payload).encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+    def _city(self, query: str) -> str:
+        for city in self.coords:
+            if city.lower() in query.lower():
+                return city
+        return query.split(',')[0].strip()
+
+    def _annuaire(self, params, request, rng):
+        ville = params['q'].replace('stockage', '', 1).strip()
+        page = int(params.get('page', 1))
+        per_page = int(params.get('per_page', 25))
+        results = []
+        for i in range((page - 1) * per_page, page * per_page):
+            results.append({
+                'nom_complet': _e2e_name(ville, i),
+                'siren': f'{zlib.crc32(f"{ville}:{i}".encode()) % 900000000 + 100000000}',
+                'siege': {'numero_voie': str(rng.randrange(1, 200)), 'type_voie': 'RUE',
+                          'libelle_voie': f'DES ENTREPOTS {i}', 'code_postal': f'{rng.randrange(10, 96)}000',
+                          'libelle_commune': ville},
+            })
+        return 200, {'results': results, 'total_pages': self.pages_per_city}
+
+    def _nominatim(self, params, request, rng):
+        ville = self._city(params['q'])
+        lat, lon = self.coords.get(ville, (46.6, 2.4))
+        if params.get('limit') == '1':
+            return 200, [{'lat': str(lat), 'lon': str(lon), 'display_name': f'{ville}, France'}]
+        items = []
+        for _ in range(10):
+            index = rng.randrange(self.pages_per_city * 25)
+            items.append({
+                'display_name': f'{_e2e_name(ville, index)}, rue du Stockage, {ville}, France',
+                'type': 'storage_rental', 'class': 'shop',
+                'address': {'city': ville, 'postcode': f'{rng.randrange(10, 96)}000'},
+                'lat': str(lat + rng.uniform(-0.1, 0.1)), 'lon': str(lon + rng.uniform(-0.1, 0.1)),
+                'osm_type': 'node', 'osm_id': rng.randrange(10 ** 9),
+            })
+        return 200, items
+
+    def _overpass(self, params, request, rng):
+        body = request.body.decode('utf-8') if isinstance(request.body, bytes) else request.body or ''
+        around = re.search(r'around%3A\d+%2C([-\d.]+)%2C([-\d.]+)', body)
+        bbox = re.search(r'bbox%3A([-\d.]+)%2C([-\d.]+)%2C([-\d.]+)%2C([-\d.]+)', body)
+        if around:
+            lat, lon = float(around.group(1)), float(around.group(2))
+        elif bbox:
+            # Mode batch: resultats autour du centre de la tuile
+            south, west, north, east = (float(value) for value in bbox.groups())
+            lat, lon = (south + north) / 2, (west + east) / 2
+        else:
+            lat, lon = 46.6, 2.4
+        ville = min(self.coords, key=lambda city: abs(self.coords[city][0] - lat) + abs(self.coords[city][1] - lon))
+        elements = []
+        for _ in range(30):
+            name = _e2e_name(ville, rng.randrange(self.pages_per_city * 25))
+            tags = {'name': name, 'amenity': 'storage_rental'}
+            if rng.random() < 0.7:
+                tags['phone'] = f'+33 1 {rng.randrange(10, 99)} {rng.randrange(10, 99)} {rng.randrange(10, 99)} {rng.randrange(10, 99)}'
+            if rng.random() < 0.5:
+                tags['website'] = f'https://www.{_e2e_slug(name)}.fr'
+            element = {'type': 'node', 'id': rng.randrange(10 ** 9), 'tags': tags,
+                       'lat': lat + rng.uniform(-0.2, 0.2), 'lon': lon + rng.uniform(-0.2, 0.2)}
+            elements.append(element)
+        return 200, {'elements': elements}
+
+    def _duckduckgo(self, params, request, rng):
+        name = params.get('q', '').replace(' self stockage site officiel', '')
+        draw = rng.random()
+        if draw < 0.4:
+            return 200, {'AbstractURL': f'https://www.{_e2e_slug(name)}.fr'}
+        if draw < 0.6:
+            return 200, {'AbstractURL': '', 'Results': [{'FirstURL': f'https://{_e2e_slug(name)}.com'}]}
+        return 200, {'AbstractURL': '', 'Results': []}
+
+    def _pappers(self, params, request, rng):
+        draw = rng.random()
+        if draw < 0.3:
+            return 200, {'site_web': f'https://www.centre{params.get("siren")}.fr',
+                         'telephone': f'01{rng.randrange(10 ** 8):08d}', 'email': None}
+        if draw < 0.6:
+            return 200, {}
+        return 404, {'error': 'Entreprise introuvable'}
+
+
+def _timed(items, latencies: list):
+    """Re-emet les elements en notant le temps de production de chacun (ms, hors consommateur)"""
+    start = time.perf_counter()
+    for item in items:
+        if not isinstance(item, ScopeComplete):
+            latencies.append((time.perf_counter() - start) * 1000)
+        yield item
+        start = time.perf_counter()
+
+
+def _percentiles(latencies: list) -> tuple:
+    """p50, p95, p99 (ms)"""
+    if len(latencies) < 2:
+        value = latencies[0] if latencies else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return cuts[49], cuts[94], cuts[98]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class SmtpSink:
+    """Handler aiosmtpd: accepte et compte les messages, sans les garder"""
+
+    def __init__(self):
+        self.messages = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return '250 OK'
+
+
+def _record_synthetic(path: str, villes: list, pages_per_city: int, seed: int):
+    """Enregistrement des fausses sources pour ces villes (scraping + enrichissement)"""
+    from enrichir_leads import LeadEnricher
+    import http_replay
+
+    cassette = http_replay.Cassette(meta={'villes': ','.join(villes), 'source': 'synthetique'})
+    upstream = SyntheticUpstream(pages_per_city, seed)
+    scraper = SelfStorageScraper()
+    enricher = LeadEnricher()
+    for session in (scraper.session, enricher.session):
+        session.mount('https://', upstream)
+        session.mount('http://', upstream)
+        http_replay.mount_recorder(session, cassette)
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        list(enricher.iter_enriched(scraper.iter_unique(scraper.stream_all(villes, scope_marks=True))))
+    cassette.save(path)
+
+
+def _run_e2e(cassette, villes: list, args, sink_port: int, memory: bool = False) -> dict:
+    """Scrape -> enrichissement -> campagne en rejeu; par etape: elements, duree, latences (ms)"""
+    from email_campaign import EmailCampaign
+    from enrichir_leads import LeadEnricher
+    from send_policy import SendPolicy
+    import http_replay
+
+    stages = {}
+
+    def stage(name, run):
+        latencies = []
+        if memory:
+            tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0] if memory else 0
+        start = time.perf_counter()
+        result = run(latencies)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - before if memory else None
+        stages[name] = {'items': len(result), 'seconds': elapsed, 'latencies': latencies, 'peak': peak}
+        return result
+
+    scraper = SelfStorageScraper(concurrency=args.concurrency)
+    http_replay.mount_replay(scraper.session, cassette, args.latency)
+    leads = stage('scrape', lambda latencies: list(
+        scraper.iter_unique(_timed(scraper.stream_all(villes, scope_marks=True), latencies))))
+
+    enricher = LeadEnricher(concurrency=args.concurrency)
+    http_replay.mount_replay(enricher.session, cassette, args.latency)
+    enriched = stage('enrich', lambda latencies: list(_timed(enricher.iter_enriched(leads), latencies)))
+
+    if sink_port is None:
+        return stages
+
+    smtp_config = {'host': '127.0.0.1', 'port': sink_port, 'starttls': False, 'username': None, 'password': None}
+    # Pas de cadence anti-spam: on mesure le pipeline, pas la politique d'envoi
+    policy = SendPolicy(messages_per_minute=10 ** 9, daily_cap=10 ** 9, pause_every=0, burst=10 ** 6)
+    campaign = EmailCampaign(smtp_config, policy=policy, concurrency=args.smtp_concurrency)
+
+    def run_campaign(latencies):
+        send_email = campaign.send_email
+
+        def timed_send(*send_args, **send_kwargs):
+            start = time.perf_counter()
+            try:
+                return send_email(*send_args, **send_kwargs)
+            finally:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        campaign.send_email = timed_send
+        campaign.run_campaign(enriched, 'intro')
+        return latencies
+
+    stage('campaign', run_campaign)
+    stages['campaign']['errors'] = campaign.error_count
+    return stages
+
+
+def bench_e2e(args):
+    """Pipeline complet hors ligne (scrape -> enrichissement -> campagne SMTP locale), par etape"""
+    import http_replay
+
+    if args.cassette:
+        cassette = http_replay.Cassette.load(args.cassette)
+        origin = args.cassette
+    else:
+        # Enregistrement fabrique puis relu depuis le disque, comme un vrai
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'synthetique.json')
+            _record_synthetic(path, (args.villes or E2E_DEFAULT_VILLES).split(','), args.pages, args.seed)
+            cassette = http_replay.Cassette.load(path)
+        origin = f'synthetique, {args.pages} pages API Gouv par ville'
+    villes = [v.strip() for v in (args.villes or cassette.meta.get('villes') or E2E_DEFAULT_VILLES).split(',')]
+    print(f"E2E: {len(villes)} villes, {len(cassette.entries)} reponses enregistrees ({origin})")
+    print(f"     latence simulee {args.latency * 1000:.0f} ms/requete, concurrence {args.concurrency}")
+
+    controller = None
+    if Controller is None:
+        print("[!] aiosmtpd non installe (pip install aiosmtpd): etape campagne ignoree")
+    else:
+        sink = SmtpSink()
+        controller = Controller(sink, hostname='127.0.0.1', port=_free_port())
+        controller.start()
+
+    runs = []
+    try:
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            # Temps et latences sans tracemalloc, puis pic memoire par etape sur une 2e passe
+            sink_port = controller.port if controller is not None else None
+            runs.append(_run_e2e(cassette, villes, args, sink_port))
+            if not args.no_memory:
+                tracemalloc.start()
+                runs.append(_run_e2e(cassette, villes, args, sink_port, memory=True))
+                tracemalloc.stop()
+    finally:
+        if controller is not None:
+            controller.stop()
+
+    stages = runs[0]
+    for name, traced in runs[-1].items():
+        stages[name]['peak'] = traced['peak']
+
+    print(f"\n  {'etape':<10} {'elements':>9} {'elem/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'pic Mo':>8}")
+    results = {}
+    for name in E2E_STAGES:
+        if name not in stages:
+            continue
+        stage = stages[name]
+        p50, p95, p99 = _percentiles(stage['latencies'])
+        throughput = stage['items'] / stage['seconds'] if stage['seconds'] else 0.0
+        peak = f"{stage['peak'] / 1e6:.1f}" if stage['peak'] is not None else 'n/a'
+        print(f"  {name:<10} {stage['items']:>9} {throughput:>10.1f} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {peak:>8}")
+        results[name] = {'items': stage['items'], 'throughput': round(throughput, 1), 'p50_ms': round(p50, 3),
+                         'p95_ms': round(p95, 3), 'p99_ms': round(p99, 3),
+                         'peak_mb': None if stage['peak'] is None else round(stage['peak'] / 1e6, 2)}
+
+    replay = cassette.stats()
+    print(f"\n  Rejeu ({len(runs)} passe(s)): {replay['hits']} reponses, "
+          f"{replay['misses']} requetes absentes de l'enregistrement")
+    if controller is not None:
+        print(f"  SMTP local ({len(runs)} passe(s)): {sink.messages} messages recus, "
+              f"{stages['campaign']['errors']} erreurs d'envoi")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'villes': villes, 'latency': args.latency, 'stages': results}, f, indent=2)
+        print(f"  Resultats -> {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['stages']
+        regressions = []
+        for name, result in results.items():
+            reference = baseline.get(name)
+            if not reference:
+                continue
+            if result['throughput'] < reference['throughput'] * (1 - args.tolerance):
+                regressions.append(f"{name}: {result['throughput']} elem/s (reference {reference['throughput']})")
+            if reference.get('peak_mb') and result['peak_mb'] and result['peak_mb'] > reference['peak_mb'] * (1 + args.tolerance):
+                regressions.append(f"{name}: pic {result['peak_mb']} Mo (reference {reference['peak_mb']})")
+        if regressions:
+            print(f"\n❌ Regressions (tolerance {args.tolerance:.0%}) par rapport a {args.baseline}:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            sys.exit(1)
+        print(f"\n✅ Pas de regression par rapport a {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+def _lead_snapshot(leads) -> list:
+    """Leads comparables (horodate exclue), tries: l'ordre des villes varie en mode concurrent"""
+    return sorted(repr(sorted((k, v) for k, v in dict(lead).items() if k != 'scraped_at')) for lead in leads)
+
+
+def bench_stream(args):
+    """Streaming (iter_unique) vs batch (scrape_all): memes leads fusionnes, sources synthetiques"""
+    villes = [v.strip() for v in args.villes.split(',')]
+    upstream = SyntheticUpstream(args.pages, args.seed)
+    print(f"Stream vs batch: {len(villes)} villes, sources synthetiques ({args.pages} pages API Gouv par ville)")
+    print(f"  {'mode':<28} {'batch':>7} {'stream':>7} {'1er lead (s)':>13} {'identiques':>11}")
+
+    failures = 0
+    for concurrency in sorted({1, args.concurrency}):
+        for overpass_batch in (False, True):
+            results = []
+            first_lead = None
+            for streaming in (False, True):
+                scraper = SelfStorageScraper(concurrency=concurrency, overpass_batch=overpass_batch)
+                scraper.session.mount('https://', upstream)
+                scraper.session.mount('http://', upstream)
+                with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+                    if not streaming:
+                        results.append(scraper.scrape_all(villes))
+                        continue
+                    leads = []
+                    start = time.perf_counter()
+                    for lead in scraper.iter_unique(scraper.stream_all(villes, scope_marks=True)):
+                        if first_lead is None:
+                            first_lead = time.perf_counter() - start
+                        leads.append(lead)
+                    results.append(leads)
+            identical = _lead_snapshot(results[0]) == _lead_snapshot(results[1])
+            failures += not identical
+            label = f"concurrence {concurrency}" + (", Overpass batch" if overpass_batch else "")
+            print(f"  {label:<28} {len(results[0]):>7} {len(results[1]):>7} {first_lead or 0:>13.3f} "
+                  f"{'✅' if identical else '❌':>11}")
+
+    if failures:
+        print(f"\n❌ {failures} mode(s) ou le streaming differe du batch")
+        sys.exit(1)
+    print("\n✅ Streaming et batch produisent les memes leads")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks hors ligne des scripts de prospection')
+    subparsers = parser.add_subparsers(dest='bench', required=True)
+
+    dedup_parser = subparsers.add_parser('dedup', help='Deduplication floue des leads')
+    dedup_parser.add_argument('--n', type=int, default=100000, help='Nombre de leads synthetiques')
+    dedup_parser.add_argument('--seed', type=int, default=42)
+    dedup_parser.set_defaults(func=bench_dedup)
+
+    geo_parser = subparsers.add_parser('geo', help='Index spatial (rayon, plus proches voisins)')
+    geo_parser.add_argument('--n', type=int, default=200000, help='Nombre de leads synthetiques')
+    geo_parser.add_argument('--queries', type=int, default=1000)
+    geo_parser.add_argument('--seed', type=int, default=42)
+    geo_parser.set_defaults(func=bench_geo)
+
+    scoring_parser = subparsers.add_parser('scoring', help='Scoring et priorites des leads')
+    scoring_parser.add_argument('--n', type=int, default=500000, help='Nombre de leads synthetiques')
+    scoring_parser.add_argument('--seed', type=int, default=42)
+    scoring_parser.set_defaults(func=bench_scoring)
+
+    templates_parser = subparsers.add_parser('templates', help='Personnalisation des emails')
+    templates_parser.add_argument('--n', type=int, default=20000, help='Nombre d\'emails')
+    templates_parser.add_argument('--template', type=str, default='intro')
+    templates_parser.set_defaults(func=bench_templates)
+
+    matcher_parser = subparsers.add_parser('matcher', help='Detection des operateurs connus')
+    matcher_parser.add_argument('--n', type=int, default=50000, help='Nombre de noms')
+    matcher_parser.add_argument('--brands', type=int, default=500, help='Nombre de marques et alias')
+    matcher_parser.add_argument('--seed', type=int, default=42)
+    matcher_parser.set_defaults(func=bench_matcher)
+
+    upload_parser = subparsers.add_parser('upload', help='Envoi des leads vers l\'API BoxiBox (faux serveur)')
+    upload_parser.add_argument('--n', type=int, default=300, help='Nombre de leads')
+    upload_parser.add_argument('--latency', type=float, default=0.05, help='Latence du faux serveur (s)')
+    upload_parser.add_argument('--fail-rate', type=float, default=0.05, help='Proportion de reponses 500')
+    upload_parser.add_argument('--chunk-size', type=int, default=50)
+    upload_parser.add_argument('--concurrency', type=int, default=8)
+    upload_parser.set_defaults(func=bench_upload)
+
+    columnar_parser = subparsers.add_parser('columnar', help='Chargement CSV vs Parquet (temps, RSS)')
+    columnar_parser.add_argument('--n', type=int, default=1000000, help='Nombre de leads')
+    columnar_parser.add_argument('--row-group', type=int, default=100000, help='Leads par row group Parquet')
+    columnar_parser.add_argument('--dir', type=str, default=None, help='Dossier des fichiers temporaires')
+    columnar_parser.add_argument('--seed', type=int, default=42)
+    # Sous-processus de mesure
+    columnar_parser.add_argument('--load', type=str, choices=[load for load, _ in COLUMNAR_LOADS],
+                                 help=argparse.SUPPRESS)
+    columnar_parser.add_argument('--file', type=str, help=argparse.SUPPRESS)
+    columnar_parser.set_defaults(func=bench_columnar)
+
+    leads_parser = subparsers.add_parser('leads', help='Memoire par lead: dict vs Lead a slots')
+    leads_parser.add_argument('--n', type=int, default=500000, help='Nombre de leads')
+    leads_parser.add_argument('--seed', type=int, default=42)
+    leads_parser.set_defaults(func=bench_leads)
+
+    html_parser = subparsers.add_parser('html', help='Parsing des pages HTML: ancien parsing vs backends')
+    html_parser.add_argument('--pages', type=str, default=HTML_FIXTURES, help='Pages HTML (motif glob)')
+    html_parser.add_argument('--repeat', type=int, default=20, help='Passes sur les pages')
+    html_parser.set_defaults(func=bench_html)
+
+    e2e_parser = subparsers.add_parser('e2e', help='Scrape -> enrichissement -> campagne hors ligne (rejeu HTTP)')
+    e2e_parser.add_argument('--cassette', type=str, help='Enregistrement a rejouer (defaut: sources synthetiques)')
+    e2e_parser.add_argument('--villes', type=str, default=None, help='Villes (defaut: celles de l\'enregistrement)')
+    e2e_parser.add_argument('--pages', type=int, default=E2E_PAGES_PER_CITY,
+                            help='Sources synthetiques: pages API Gouv par ville')
+    e2e_parser.add_argument('--latency', type=float, default=0.0, help='Latence simulee par requete HTTP (s)')
+    e2e_parser.add_argument('--concurrency', type=int, default=1, help='Workers du scraper et de l\'enrichisseur')
+    e2e_parser.add_argument('--smtp-concurrency', type=int, default=1, help='Envois SMTP en parallele')
+    e2e_parser.add_argument('--no-memory', action='store_true', help='Sans la passe tracemalloc (pic memoire)')
+    e2e_parser.add_argument('--save', type=str, help='Ecrire les resultats (JSON, reference des prochains runs)')
+    e2e_parser.add_argument('--baseline', type=str, help='Comparer a des resultats enregistres (code 1 si regression)')
+    e2e_parser.add_argument('--tolerance', type=float, default=0.25, help='Ecart tolere vs la reference')
+    e2e_parser.add_argument('--seed', type=int, default=42)
+    e2e_parser.set_defaults(func=bench_e2e)
+
+    stream_parser = subparsers.add_parser('stream', help='Verifie que le streaming produit les memes leads que le batch')
+    stream_parser.add_argument('--villes', type=str, default=E2E_DEFAULT_VILLES)
+    stream_parser.add_argument('--pages', type=int, default=E2E_PAGES_PER_CITY,
+                               help='Pages API Gouv synthetiques par ville')
+    stream_parser.add_argument('--concurrency', type=int, default=4, help='Workers par source (mode concurrent)')
+    stream_parser.add_argument('--seed', type=int, default=42)
+    stream_parser.set_defaults(func=bench_stream)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Client d'envoi des leads vers l'API BoxiBox
+POST /api/v1/external/leads (un lead par requete, l'API n'a pas d'endpoint
+bulk). Les leads partent par lots sur une session keep-alive:
+  - `concurrency` requetes en vol au maximum, debit borne par le rate limiter
+    du client (throttle:60,1 cote serveur = 1 req/s par defaut), distinct du
+    limiter partage des scrapers
+  - 5xx, 429 et erreurs reseau: nouvel essai avec backoff exponentiel, a ce
+    seul niveau (l'adapter ne rejoue pas les 429: `attempts` = requetes
+    reellement envoyees); un 429 bloque l'hote le temps du Retry-After
+  - un resultat par lead: cree, doublon (409), invalide (422), erreur
+  - 401: cle refusee, les lots suivants ne sont pas envoyes
+  - `key_func`: identifiant stable du lead, reporte dans son resultat (suivi
+    des envois par crm_sync; l'API ne fait que creer, sans cle d'idempotence)
+
+Usage:
+    client = BoxiBoxClient('https://app.boxibox.fr', api_key)
+    results = client.upload(leads)
+    print(client.summary(results))
+"""
+
+import csv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+import rate_limiter
+
+LEADS_PATH = '/api/v1/external/leads'
+
+DEFAULT_CHUNK_SIZE = 50
+DEFAULT_CONCURRENCY = 4
+# throttle:60,1 sur les routes /api/v1/external
+DEFAULT_RATE = 1.0
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0
+
+# Score minimum d'un lead envoye au CRM
+MIN_SCORE = 50
+
+PRIORITIES = ('cold', 'lukewarm', 'warm', 'hot', 'very_hot')
+
+# Statuts d'un resultat
+CREATED = 'created'
+DUPLICATE = 'duplicate'
+INVALID = 'invalid'
+ERROR = 'error'
+SKIPPED = 'skipped'
+
+REPORT_FIELDS = ['email', 'name', 'key', 'status', 'http_status', 'lead_id', 'attempts', 'error']
+
+
+def lead_payload(lead: dict) -> dict:
+    """Corps JSON de l'API pour un lead du scraper/enrichisseur"""
+    priority = lead.get('priority') or 'warm'
+    try:
+        score = int(lead.get('score') or 50)
+    except (TypeError, ValueError):
+        score = 50
+    return {
+        'first_name': '',
+        'last_name': '',
+        'email': lead.get('email', ''),
+        'phone': lead.get('phone', ''),
+        'company': lead.get('name', ''),
+        'source': f"scraper_{lead.get('source', 'manual')}",
+        'score': score,
+        'priority': priority if priority in PRIORITIES else 'warm',
+        'notes': f"Adresse: {lead.get('address', 'N/A')}\nSite: {lead.get('website', 'N/A')}",
+        'metadata': {
+            'scraped_at': lead.get('scraped_at'),
+            'ville_recherche': lead.get('ville_recherche'),
+        },
+    }
+
+
+class UploadResult:
+    """Issue de l'envoi d'un lead"""
+
+    __slots__ = ('lead', 'key', 'status', 'http_status', 'lead_id', 'attempts', 'error')
+
+    def __init__(self, lead: dict, status: str, http_status: int = None, lead_id=None,
+                 attempts: int = 0, error: str = '', key: str = ''):
+        self.lead = lead
+        self.key = key
+        self.status = status
+        self.http_status = http_status
+        self.lead_id = lead_id
+        self.attempts = attempts
+        self.error = error
+
+    def as_row(self) -> dict:
+        return {
+            'email': self.lead.get('email', ''),
+            'name': self.lead.get('name', ''),
+            'key': self.key,
+            'status': self.status,
+            'http_status': self.http_status or '',
+            'lead_id': self.lead_id or '',
+            'attempts': self.attempts,
+            'error': self.error,
+        }
+
+
+class BoxiBoxClient:
+    """Envoi des leads par lots, avec reessais et rapport par lead"""
+
+    def __init__(self, api_url: str, api_key: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 concurrency: int = DEFAULT_CONCURRENCY, rate: float = DEFAULT_RATE,
+                 max_retries: int = MAX_RETRIES, backoff: float = RETRY_BACKOFF, timeout: float = 10,
+                 limiter: rate_limiter.RateLimiter = None):
+        self.endpoint = api_url.rstrip('/') + LEADS_PATH
+        self.chunk_size = max(1, chunk_size)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'X-API-Key': api_key,
+            'Accept': 'application/json',
+            'User-Agent': 'BoxiBox-Prospection/1.0 (contact@boxibox.fr)',
+        })
+        # Budget propre au client (rate): ne modifie pas le limiter partage du processus.
+        # Les 429 ne sont pas rejoues par l'adapter: _post_lead est le seul niveau de reessai.
+        if limiter is None:
+            host = urlparse(self.endpoint).hostname or ''
+            limiter = rate_limiter.RateLimiter(limits={host: (rate, max(1, int(rate)))})
+        self.rate_limiter = rate_limiter.mount(self.session, limiter, pool_maxsize=max(10, self.concurrency),
+                                               max_throttle_retries=0)
+
+        # Cle API refusee: plus aucun envoi
+        self._refused = threading.Event()
+
+    def post_lead(self, lead: dict, key: str = '') -> UploadResult:
+        """Envoie un lead (avec reessais sur 5xx, 429 et erreurs reseau)"""
+        result = self._post_lead(lead, key)
+        result.key = key
+        return result
+
+    def _post_lead(self, lead: dict, key: str) -> UploadResult:
+        if not lead.get('email'):
+            return UploadResult(lead, SKIPPED, error='pas d\'email')
+
+        payload = lead_payload(lead)
+        error = ''
+        status_code = None
+        for attempt in range(1, self.max_retries + 2):
+            if self._refused.is_set():
+                return UploadResult(lead, ERROR, status_code, attempts=attempt - 1, error='cle API refusee')
+            # Apres un 429, l'attente (Retry-After ou backoff) est deja imposee par le rate limiter
+            if attempt > 1 and status_code != 429:
+                time.sleep(self.backoff * 2 ** (attempt - 2))
+
+            try:
+                response = self.session.post(self.endpoint, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = str(e)[:200]
+                status_code = None
+                continue
+
+            status_code = response.status_code
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+
+            if status_code == 201:
+                return UploadResult(lead, CREATED, status_code, (body.get('data') or {}).get('id'), attempt)
+            if status_code == 409:
+                return UploadResult(lead, DUPLICATE, status_code, body.get('existing_lead_id'), attempt)
+            if status_code == 422:
+                details = body.get('details') or body.get('error') or ''
+                return UploadResult(lead, INVALID, status_code, attempts=attempt, error=str(details)[:200])
+            if status_code in (401, 403):
+                if status_code == 401:
+                    self._refused.set()
+                return UploadResult(lead, ERROR, status_code, attempts=attempt, error=body.get('error', ''))
+
+            error = body.get('error') or f'HTTP {status_code}'
+            if status_code != 429 and status_code < 500:
+                return UploadResult(lead, ERROR, status_code, attempts=attempt, error=error)
+
+        return UploadResult(lead, ERROR, status_code, attempts=self.max_retries + 1, error=error)
+
+    def upload(self, leads, min_score: int = MIN_SCORE, verbose: bool = True, key_func=None,
+               on_chunk=None) -> list:
+        """
+        Envoie les leads de score >= min_score, lot par lot; resultats dans
+        l'ordre des leads. key_func(lead) -> identifiant reporte dans le resultat;
+        on_chunk(resultats) est appele apres chaque lot (sauvegarde au fil de l'eau).
+        """
+        selected = [lead for lead in leads if _score(lead) >= min_score]
+        keys = [key_func(lead) if key_func else '' for lead in selected]
+        chunks = [selected[i:i + self.chunk_size] for i in range(0, len(selected), self.chunk_size)]
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for number, chunk in enumerate(chunks, 1):
+                chunk_keys = keys[(number - 1) * self.chunk_size:number * self.chunk_size]
+                if self._refused.is_set():
+                    results.extend(UploadResult(lead, ERROR, 401, error='cle API refusee', key=key)
+                                   for lead, key in zip(chunk, chunk_keys))
+                    continue
+                chunk_results = list(executor.map(self.post_lead, chunk, chunk_keys))
+                results.extend(chunk_results)
+                if on_chunk:
+                    on_chunk(chunk_results)
+                if verbose:
+                    counts = self.summary(chunk_results)
+                    print(f"  [lot {number}/{len(chunks)}] {len(chunk)} leads: {counts[CREATED]} crees, "
+                          f"{counts[DUPLICATE]} doublons, {counts[INVALID] + counts[ERROR]} erreurs")
+
+        if self._refused.is_set():
+            print("  [!] Cle API BoxiBox refusee (401): envoi interrompu")
+        return results
+
+    @staticmethod
+    def summary(results: list) -> dict:
+        """Nombre de leads par statut"""
+        counts = dict.fromkeys((CREATED, DUPLICATE, INVALID, ERROR, SKIPPED), 0)
+        for result in results:
+            counts[result.status] += 1
+        return counts
+
+    @staticmethod
+    def export_report(results: list, filename: str):
+        """Rapport CSV: un lead par ligne avec son statut"""
+        with open(filename, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(result.as_row() for result in results)
+
+    def close(self):
+        self.session.close()
+
+
+def _score(lead: dict) -> int:
+    try:
+        return int(lead.get('score') or 0)
+    except (TypeError, ValueError):
+        return 0
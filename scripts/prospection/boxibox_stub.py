@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Faux serveur de l'API leads, pour tester l'envoi hors ligne
+Reproduit POST /api/v1/external/leads (ExternalLeadController::store):
+cle X-API-Key, validation (422), doublon d'email sur 24h (409), creation (201),
+throttle par minute (429 + Retry-After). Peut injecter de la latence et des
+erreurs 500 pour tester les reessais.
+
+Usage:
+    python boxibox_stub.py --port 8765 --api-key test
+    python scraper_self_stockage.py ... --api-url http://127.0.0.1:8765 --api-key test
+
+    with BoxiBoxStub(api_key='test') as stub:
+        client = BoxiBoxClient(stub.url, 'test')
+"""
+
+import sys
+import io
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from boxibox_client import LEADS_PATH, PRIORITIES
+
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+DUPLICATE_WINDOW = 24 * 3600
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, comme derriere nginx
+    disable_nagle_algorithm = True  # en-tetes et corps ecrits separement
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+        status, body, headers = self.server.stub.handle(self.path, self.headers, raw)
+        self._reply(status, body, headers)
+
+
+class BoxiBoxStub:
+    """Serveur HTTP local (thread en arriere-plan) imitant l'API leads"""
+
+    def __init__(self, api_key: str = 'test', host: str = '127.0.0.1', port: int = 0,
+                 throttle_per_minute: int = 0, latency: float = 0.0, fail_rate: float = 0.0, seed: int = 42):
+        self.api_key = api_key
+        self.throttle_per_minute = throttle_per_minute
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self.leads = {}       # id -> lead recu
+        self._by_email = {}   # email -> (id, cree a)
+        self._window = []     # dates des requetes de la minute en cours
+
+        # Compteurs par code HTTP
+        self.requests = 0
+        self.responses = {}
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'BoxiBoxStub':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serveur au premier plan (ligne de commande)"""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle(self, path: str, headers, raw: bytes) -> tuple:
+        """(statut, corps JSON, en-tetes) pour une requete POST"""
+        status, body, extra = self._handle(path, headers, raw)
+        with self._lock:
+            self.requests += 1
+            self.responses[status] = self.responses.get(status, 0) + 1
+        return status, body, extra
+
+    def _handle(self, path: str, headers, raw: bytes) -> tuple:
+        if self.latency:
+            time.sleep(self.latency)
+        if path != LEADS_PATH:
+            return 404, {'message': 'Not Found'}, None
+
+        now = time.time()
+        with self._lock:
+            if self.throttle_per_minute:
+                self._window = [t for t in self._window if t > now - 60]
+                if len(self._window) >= self.throttle_per_minute:
+                    retry_after = max(1, int(self._window[0] + 60 - now) + 1)
+                    return 429, {'message': 'Too Many Attempts.'}, {'Retry-After': str(retry_after)}
+                self._window.append(now)
+            fail = self.fail_rate and self._random.random() < self.fail_rate
+
+        if headers.get('X-API-Key') != self.api_key:
+            return 401, {'success': False, 'error': 'Invalid or missing API key', 'code': 'UNAUTHORIZED'}, None
+        if fail:
+            return 500, {'success': False, 'error': 'Failed to create lead', 'code': 'SERVER_ERROR'}, None
+
+        try:
+            lead = json.loads(raw or b'{}')
+        except ValueError:
+            lead = {}
+        details = self._validate(lead)
+        if details:
+            return 422, {'success': False, 'error': 'Validation failed', 'code': 'VALIDATION_ERROR',
+                         'details': details}, None
+
+        with self._lock:
+            existing = self._by_email.get(lead['email'])
+            if existing and existing[1] > now - DUPLICATE_WINDOW:
+                return 409, {'success': False, 'error': 'Duplicate lead detected', 'code': 'DUPLICATE_LEAD',
+                             'existing_lead_id': existing[0]}, None
+            lead_id = len(self.leads) + 1
+            self.leads[lead_id] = lead
+            self._by_email[lead['email']] = (lead_id, now)
+
+        return 201, {
+            'success': True,
+            'message': 'Lead created successfully',
+            'data': {
+                'id': lead_id,
+                'email': lead['email'],
+                'score': lead.get('score', 50),
+                'priority': lead.get('priority', 'warm'),
+                'status': 'new',
+                'created_at': datetime.fromtimestamp(now).isoformat(),
+            },
+        }, None
+
+    @staticmethod
+    def _validate(lead: dict) -> dict:
+        """Memes regles que le Validator Laravel (sous-ensemble utilise par le scraper)"""
+        details = {}
+        email = lead.get('email')
+        if not email:
+            details['email'] = ['The email field is required.']
+        elif not isinstance(email, str) or not EMAIL_RE.match(email) or len(email) > 255:
+            details['email'] = ['The email field must be a valid email address.']
+        score = lead.get('score')
+        if score is not None and (not isinstance(score, int) or not 0 <= score <= 100):
+            details['score'] = ['The score field must be an integer between 0 and 100.']
+        priority = lead.get('priority')
+        if priority is not None and priority not in PRIORITIES:
+            details['priority'] = ['The selected priority is invalid.']
+        for field, limit in (('phone', 30), ('company', 255), ('source', 100), ('notes', 2000)):
+            value = lead.get(field)
+            if value is not None and len(str(value)) > limit:
+                details[field] = [f'The {field} field must not be greater than {limit} characters.']
+        return details
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'requests': self.requests, 'leads': len(self.leads), 'responses': dict(self.responses)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Faux serveur API BoxiBox (tests hors ligne)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--api-key', type=str, default='test')
+    parser.add_argument('--throttle', type=int, default=60, help='Requetes max par minute (0 = illimite)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Latence ajoutee par requete (s)')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Proportion de reponses 500')
+    args = parser.parse_args()
+
+    stub = BoxiBoxStub(api_key=args.api_key, port=args.port, throttle_per_minute=args.throttle,
+                       latency=args.latency, fail_rate=args.fail_rate)
+    print(f"[OK] Faux serveur BoxiBox sur {stub.url}{LEADS_PATH} (Ctrl+C pour arreter)")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{stub.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Journal des envois de campagne (SQLite)
+Chaque email envoye est enregistre immediatement sous la cle (email, template):
+relancer une campagne interrompue reprend la ou elle s'etait arretee, sans
+renvoyer les emails deja partis.
+
+Le journal sert aussi a planifier les relances ("leads a relancer avec
+followup_7j aujourd'hui") via un index sur (template, sent_at), sans relire
+les CSV.
+
+Usage:
+    ledger = CampaignLedger()
+    if not ledger.already_sent(email, 'intro'):
+        ...
+        ledger.record(email, 'intro', lead)
+    ledger.due('followup_3j', after='intro', days=3)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_LEDGER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.state', 'campaign.sqlite')
+
+DAY = 24 * 3600
+
+
+def normalize_email(email: str) -> str:
+    return (email or '').strip().lower()
+
+
+def start_of_day(now: float = None) -> float:
+    """Timestamp de minuit (heure locale) du jour de `now`"""
+    day = datetime.fromtimestamp(time.time() if now is None else now)
+    return day.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+class CampaignLedger:
+    """Journal SQLite des envois, partageable entre les workers d'envoi"""
+
+    def __init__(self, path: str = DEFAULT_LEDGER_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS sends (
+                email TEXT NOT NULL,
+                template TEXT NOT NULL,
+                sent_at REAL NOT NULL,
+                name TEXT,
+                score INTEGER,
+                PRIMARY KEY (email, template)
+            )
+        """)
+        self._db.execute('CREATE INDEX IF NOT EXISTS sends_template_sent_at ON sends (template, sent_at)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS sends_sent_at ON sends (sent_at)')
+        self._db.commit()
+
+        # Emails deja servis, par template (charges a la premiere consultation)
+        self._sent = {}
+
+    def _sent_set(self, template: str) -> set:
+        sent = self._sent.get(template)
+        if sent is None:
+            rows = self._db.execute('SELECT email FROM sends WHERE template = ?', (template,))
+            sent = self._sent[template] = {email for (email,) in rows}
+        return sent
+
+    def already_sent(self, email: str, template: str) -> bool:
+        """O(1): ce template a-t-il deja ete envoye a cet email ?"""
+        with self._lock:
+            return normalize_email(email) in self._sent_set(template)
+
+    def record(self, email: str, template: str, lead: dict = None, sent_at: float = None):
+        """Enregistre un envoi (ecrit tout de suite: survit a un crash juste apres)"""
+        email = normalize_email(email)
+        lead = lead or {}
+        try:
+            score = int(lead.get('score') or 0)
+        except (TypeError, ValueError):
+            score = 0
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO sends (email, template, sent_at, name, score) VALUES (?, ?, ?, ?, ?)',
+                (email, template, time.time() if sent_at is None else sent_at, lead.get('name'), score),
+            )
+            self._db.commit()
+            self._sent_set(template).add(email)
+
+    def sent_since(self, since: float) -> int:
+        """Nombre d'emails envoyes depuis `since` (tous templates)"""
+        with self._lock:
+            row = self._db.execute('SELECT COUNT(*) FROM sends WHERE sent_at >= ?', (since,)).fetchone()
+        return row[0]
+
+    def sent_today(self, now: float = None) -> int:
+        """Envois du jour: a deduire du plafond journalier"""
+        return self.sent_since(start_of_day(now))
+
+    def sends_since(self, since: float) -> list:
+        """Envois posterieurs a `since`: [(email, template, sent_at)] par date croissante"""
+        with self._lock:
+            return self._db.execute(
+                'SELECT email, template, sent_at FROM sends WHERE sent_at > ? ORDER BY sent_at', (since,)
+            ).fetchall()
+
+    def history(self, email: str) -> list:
+        """Envois d'un email: [(template, sent_at)] par date croissante"""
+        with self._lock:
+            return self._db.execute(
+                'SELECT template, sent_at FROM sends WHERE email = ? ORDER BY sent_at', (normalize_email(email),)
+            ).fetchall()
+
+    def due(self, template: str, after: str, days: float, now: float = None) -> list:
+        """
+        Emails qui ont recu `after` il y a au moins `days` jours et pas encore
+        `template`, du meilleur score au moins bon.
+        """
+        cutoff = (time.time() if now is None else now) - days * DAY
+        with self._lock:
+            rows = self._db.execute("""
+                SELECT prev.email FROM sends AS prev
+                WHERE prev.template = ? AND prev.sent_at <= ?
+                  AND NOT EXISTS (
+                      SELECT 1 FROM sends AS done WHERE done.email = prev.email AND done.template = ?
+                  )
+                ORDER BY prev.score DESC, prev.sent_at
+            """, (after, cutoff, template)).fetchall()
+        return [email for (email,) in rows]
+
+    def stats(self) -> dict:
+        """Nombre d'envois par template"""
+        with self._lock:
+            rows = self._db.execute('SELECT template, COUNT(*) FROM sends GROUP BY template').fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
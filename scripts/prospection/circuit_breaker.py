@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Circuit breaker par fournisseur (DuckDuckGo, Pappers...)
+Quand un fournisseur tombe, limite ou quota epuise, les leads suivants ne
+doivent pas payer chacun le timeout complet.
+
+  ferme     -> les appels passent; `failure_threshold` echecs consecutifs
+               (ou une erreur de quota) ouvrent le circuit
+  ouvert    -> les appels sont refuses sans requete pendant `reset_timeout`
+               (`quota_timeout` pour un quota epuise)
+  semi-ouvert -> un seul appel de test passe: succes = ferme, echec = rouvert
+
+Usage:
+    breaker = CircuitBreaker('pappers')
+    if breaker.allow():
+        try:
+            ...
+            breaker.record_success()
+        except requests.RequestException:
+            breaker.record_failure()
+"""
+
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Etat d'un fournisseur, partage par tous les workers"""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 60.0,
+                 quota_timeout: float = 3600.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.quota_timeout = quota_timeout
+
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+
+        # Compteurs
+        self.calls = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.opened = 0
+
+    def allow(self) -> bool:
+        """L'appel peut-il partir ? (False = circuit ouvert, ne pas appeler)"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() >= self._open_until:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self._probing):
+                self._probing = self.state == HALF_OPEN
+                self.calls += 1
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                print(f"  [OK] {self.name}: circuit referme")
+            self.state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self, quota: bool = False):
+        """Echec d'un appel (quota=True: quota epuise, ouverture immediate et longue)"""
+        with self._lock:
+            self.failures += 1
+            self._failures += 1
+            self._probing = False
+            if quota or self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                timeout = self.quota_timeout if quota else self.reset_timeout
+                if self.state != OPEN:
+                    self.opened += 1
+                    reason = 'quota epuise' if quota else f'{self._failures} echecs'
+                    print(f"  [!] {self.name}: circuit ouvert ({reason}), pause de {timeout:g}s")
+                self.state = OPEN
+                self._open_until = time.monotonic() + timeout
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'calls': self.calls,
+                'failures': self.failures,
+                'short_circuited': self.short_circuited,
+                'opened': self.opened,
+            }
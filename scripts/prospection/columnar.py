@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Format colonnes (Parquet) pour les fichiers de leads
+Alternative au CSV/JSON avec un schema type: score entier, lat/lon flottants,
+colonnes repetitives (priorite, source, ville) encodees en dictionnaire.
+  - ecriture en streaming: un row group tous les `row_group_size` leads
+  - lecture en memoire mappee, avec projection de colonnes (la campagne email
+    ne lit que email, score et les champs des templates)
+
+pyarrow est optionnel: sans lui, CSV et JSON restent disponibles.
+
+Usage:
+    write_leads(leads, 'leads.parquet')
+    for lead in iter_leads('leads.parquet', columns=['email', 'score']):
+        ...
+"""
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow est optionnel
+    pa = pq = None
+
+EXTENSIONS = ('.parquet', '.pq')
+
+DEFAULT_ROW_GROUP_SIZE = 50000
+DEFAULT_BATCH_SIZE = 10000
+COMPRESSION = 'zstd'
+
+# Type de chaque colonne connue (les autres colonnes sont des chaines)
+#   category: chaine a faible cardinalite, encodee en dictionnaire
+SCHEMA = {
+    'name': 'string',
+    'email': 'string',
+    'phone': 'string',
+    'website': 'string',
+    'address': 'string',
+    'city': 'category',
+    'postal_code': 'string',
+    'siren': 'string',
+    'osm_id': 'string',
+    'lat': 'float64',
+    'lon': 'float64',
+    'score': 'int16',
+    'priority': 'category',
+    'source': 'category',
+    'sources': 'category',
+    'ville_recherche': 'category',
+    'scraped_at': 'string',
+    'change': 'category',
+}
+
+# Colonnes ecrites par defaut ('change' n'existe que dans un delta incremental)
+LEAD_COLUMNS = [field for field in SCHEMA if field != 'change']
+
+
+def available() -> bool:
+    """pyarrow est-il installe ?"""
+    return pa is not None
+
+
+def is_columnar(filename: str) -> bool:
+    """Le fichier est-il au format Parquet (d'apres son extension) ?"""
+    return str(filename).lower().endswith(EXTENSIONS)
+
+
+def _require():
+    if pa is None:
+        raise ImportError("Format Parquet indisponible: pip install pyarrow")
+
+
+def _arrow_type(kind: str):
+    if kind == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    return getattr(pa, kind)()
+
+
+def _to_int(value):
+    if value is None or value == '':
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_str(value):
+    # Chaine vide plutot que null: les lecteurs font lead.get(champ, '')
+    return '' if value is None else str(value)
+
+
+_CONVERTERS = {'int16': _to_int, 'float64': _to_float}
+
+
+def schema_for(fields: list):
+    """Schema Arrow des colonnes donnees"""
+    _require()
+    return pa.schema([(field, _arrow_type(SCHEMA.get(field, 'string'))) for field in fields])
+
+
+class ParquetSink:
+    """Ecrit les leads dans un fichier Parquet au fur et a mesure (un row group par lot)"""
+
+    def __init__(self, filename: str, fields: list = None, row_group_size: int = DEFAULT_ROW_GROUP_SIZE):
+        _require()
+        self.filename = filename
+        self.fields = list(fields or LEAD_COLUMNS)
+        self.row_group_size = max(1, row_group_size)
+        self.schema = schema_for(self.fields)
+        self._converters = [_CONVERTERS.get(SCHEMA.get(field, 'string'), _to_str) for field in self.fields]
+        self._columns = [[] for _ in self.fields]
+        self._writer = pq.ParquetWriter(filename, self.schema, compression=COMPRESSION)
+        self.count = 0
+        self.row_groups = 0
+
+    def write(self, lead: dict):
+        for field, convert, values in zip(self.fields, self._converters, self._columns):
+            values.append(convert(lead.get(field)))
+        self.count += 1
+        if len(self._columns[0]) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._columns[0]:
+            return
+        arrays = [pa.array(values, type=column.type) for values, column in zip(self._columns, self.schema)]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self._columns = [[] for _ in self.fields]
+        self.row_groups += 1
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_leads(leads, filename: str, fields: list = None,
+                row_group_size: int = DEFAULT_ROW_GROUP_SIZE) -> int:
+    """Ecrit les leads (liste ou flux) en Parquet; retourne le nombre de leads"""
+    with ParquetSink(filename, fields, row_group_size) as sink:
+        for lead in leads:
+            sink.write(lead)
+    return sink.count
+
+
+def _projection(parquet_file, columns):
+    """Colonnes demandees presentes dans le fichier (None = toutes)"""
+    if columns is None:
+        return None
+    names = set(parquet_file.schema_arrow.names)
+    return [column for column in columns if column in names]
+
+
+def read_table(filename: str, columns: list = None, memory_map: bool = True):
+    """Table Arrow des colonnes demandees (les colonnes absentes du fichier sont ignorees)"""
+    _require()
+    parquet_file = pq.ParquetFile(filename, memory_map=memory_map)
+    return parquet_file.read(columns=_projection(parquet_file, columns))
+
+
+def _column_values(column) -> list:
+    """Valeurs Python d'une colonne (Array ou ChunkedArray)"""
+    if not pa.types.is_dictionary(column.type):
+        return column.to_pylist()
+    # Dictionnaire decode via les indices: bien plus rapide que to_pylist(),
+    # et chaque valeur distincte n'existe qu'une fois en memoire
+    values = []
+    for chunk in getattr(column, 'chunks', [column]):
+        dictionary = chunk.dictionary.to_pylist()
+        values.extend(None if index is None else dictionary[index] for index in chunk.indices.to_pylist())
+    return values
+
+
+def to_dicts(table) -> list:
+    """Lignes d'une table ou d'un lot Arrow, en dicts"""
+    names = table.schema.names
+    return [dict(zip(names, row)) for row in zip(*(_column_values(column) for column in table.columns))]
+
+
+def iter_leads(filename: str, columns: list = None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Lit les leads lot par lot (dicts types), sans charger tout le fichier"""
+    _require()
+    parquet_file = pq.ParquetFile(filename, memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=_projection(parquet_file, columns)):
+        yield from to_dicts(batch)
+
+
+def load_leads(filename: str, columns: list = None) -> list:
+    """Charge les leads d'un fichier Parquet (dicts types), un lot Arrow a la fois en memoire"""
+    return list(iter_leads(filename, columns))
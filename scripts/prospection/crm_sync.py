@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Synchronisation incrementale des leads vers le CRM BoxiBox
+Chaque lead envoye est memorise (SQLite) sous son identifiant stable
+(normalize.lead_key: SIREN, element OSM, sinon nom + code postal) avec une empreinte de
+ses champs normalises et l'id CRM obtenu. Au run suivant, seuls les leads
+nouveaux sont envoyes: apres le premier jour, un run national quotidien se
+reduit a un petit delta.
+
+L'API ne fait que creer des leads (pas de mise a jour, pas de cle
+d'idempotence): un lead deja present dans le CRM (cree, ou doublon 409) n'est
+jamais renvoye, meme modifie, il y serait duplique. Les leads modifies sont
+seulement comptes. Un lead refuse (invalide 422, sans email) n'a pas d'id CRM:
+il est renvoye des qu'il change.
+
+Un lead n'est memorise qu'une fois traite (cree, doublon, invalide, sans
+email): les erreurs sont reessayees au run suivant.
+
+Usage:
+    store = SyncStore()
+    results = sync_leads(client, store, leads)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from boxibox_client import BoxiBoxClient, MIN_SCORE, CREATED, DUPLICATE, INVALID, SKIPPED
+from normalize import lead_key, normalize_phone, normalize_text
+
+DEFAULT_SYNC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.state', 'boxibox_sync.sqlite')
+
+# Champs envoyes au CRM dont un changement est detecte
+FINGERPRINT_FIELDS = ('email', 'phone', 'name', 'website', 'address', 'score', 'priority')
+
+# Issues definitives: le lead n'est pas renvoye tant qu'il ne change pas
+SYNCED_STATUSES = (CREATED, DUPLICATE, INVALID, SKIPPED)
+
+
+def lead_fingerprint(lead: dict) -> str:
+    """Empreinte des champs normalises (casse, accents, format du telephone ignores)"""
+    values = []
+    for field in FINGERPRINT_FIELDS:
+        value = lead.get(field)
+        if field == 'phone':
+            value = normalize_phone(value) or normalize_text(value)
+        elif field == 'email':
+            value = str(value or '').strip().lower()
+        else:
+            value = normalize_text(value)
+        values.append(value)
+    return hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()[:16]
+
+
+class SyncStore:
+    """Empreinte et id CRM du dernier envoi de chaque lead"""
+
+    def __init__(self, path: str = DEFAULT_SYNC_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS synced (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                lead_id INTEGER,
+                status TEXT NOT NULL,
+                synced_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+        # Compteurs du dernier pending()
+        self.new = 0
+        self.retried = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.untracked = 0
+
+    def pending(self, leads) -> list:
+        """Leads a envoyer (un par identifiant): nouveaux, ou modifies sans id CRM (refuses avant)"""
+        with self._lock:
+            known = {key: (fingerprint, lead_id)
+                     for key, fingerprint, lead_id in self._db.execute('SELECT key, fingerprint, lead_id FROM synced')}
+
+        self.new = self.retried = self.changed = self.unchanged = self.untracked = 0
+        pending = []
+        seen = set()
+        for lead in leads:
+            key = lead_key(lead)
+            if not key:
+                # Pas d'identifiant stable: toujours envoye, jamais memorise
+                self.untracked += 1
+                pending.append(lead)
+                continue
+            if key in seen:
+                continue
+            seen.add(key)
+
+            if key not in known:
+                self.new += 1
+                pending.append(lead)
+                continue
+            fingerprint, lead_id = known[key]
+            if fingerprint == lead_fingerprint(lead):
+                self.unchanged += 1
+            elif lead_id is None:
+                self.retried += 1
+                pending.append(lead)
+            else:
+                # Deja dans le CRM: un renvoi creerait un second lead
+                self.changed += 1
+        return pending
+
+    def record(self, results: list, now: float = None) -> int:
+        """Memorise les leads traites par l'API; retourne le nombre de lignes ecrites"""
+        now = time.time() if now is None else now
+        rows = [
+            (result.key, lead_fingerprint(result.lead), result.lead_id, result.status, now)
+            for result in results
+            if result.key and result.status in SYNCED_STATUSES
+        ]
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO synced (key, fingerprint, lead_id, status, synced_at) '
+                'VALUES (?, ?, ?, ?, ?)', rows)
+            self._db.commit()
+        return len(rows)
+
+    def stats(self) -> dict:
+        """Leads memorises par statut du dernier envoi"""
+        with self._lock:
+            return dict(self._db.execute('SELECT status, COUNT(*) FROM synced GROUP BY status'))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def sync_leads(client: BoxiBoxClient, store: SyncStore, leads, min_score: int = MIN_SCORE,
+               verbose: bool = True) -> list:
+    """Envoie seulement les leads absents du CRM et memorise ceux traites"""
+    selected = [lead for lead in leads if _score(lead) >= min_score]
+    pending = store.pending(selected)
+    if verbose:
+        print(f"  Sync: {store.new} nouveaux, {store.retried} corriges (refuses avant), {store.unchanged} inchanges"
+              + (f", {store.untracked} sans identifiant" if store.untracked else ''))
+        if store.changed:
+            print(f"  [!] {store.changed} leads deja dans le CRM ont change: non renvoyes (l'API ne fait que creer)")
+
+    # Memorise lot par lot: un run interrompu ne renvoie que les lots non termines
+    return client.upload(pending, min_score=0, verbose=verbose, key_func=lead_key, on_chunk=store.record)
+
+
+def _score(lead: dict) -> int:
+    try:
+        return int(lead.get('score') or 0)
+    except (TypeError, ValueError):
+        return 0
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Deduplication des leads multi-sources
+Retrouve le meme centre de stockage remonte par plusieurs sources, meme avec
+un nom legerement different ("PARIS STOCKAGE" / "Paris Stockage SARL").
+
+Blocking (en temps quasi lineaire):
+  - cles exactes: SIREN, telephone normalise
+  - index spatial: leads a moins de 100 m les uns des autres
+  - MinHash LSH sur les trigrammes du nom normalise
+
+Chaque candidat est ensuite verifie (similarite de Jaccard des noms +
+compatibilite de localisation) et les doublons sont fusionnes champ par champ.
+"""
+
+import random
+import zlib
+
+from geo import GeoIndex, haversine_km
+from normalize import normalize_name, normalize_phone, normalize_postal_code, normalize_text
+
+# MinHash: NUM_BANDS bandes de ROWS_PER_BAND lignes
+# Seuil LSH ~ (1/bandes)^(1/lignes) = 0.67
+NUM_BANDS = 5
+ROWS_PER_BAND = 4
+
+# Permutations de l'espace des hash 32 bits: XOR avec un masque aleatoire fixe
+# (3x plus rapide qu'un hachage universel (a*h + b) mod p en Python pur)
+_PERMUTATION_MASKS = random.Random(0x5E1F).sample(range(1 << 32), NUM_BANDS * ROWS_PER_BAND)
+
+# Taille max d'un bucket LSH (noms tres generiques): borne le nombre de comparaisons
+MAX_BUCKET_SIZE = 64
+
+# Rayon (km) sous lequel deux leads sont consideres au meme emplacement
+GEO_MERGE_RADIUS_KM = 0.1
+
+# Champs qui ne sont pas completes lors d'une fusion
+MERGE_SKIP_FIELDS = {'source', 'sources', 'ville_recherche', 'scraped_at', 'score', 'priority'}
+
+
+def name_shingles(name: str) -> frozenset:
+    """Trigrammes de caracteres du nom normalise"""
+    text = f' {name} '
+    if len(text) < 3:
+        return frozenset((text,))
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def minhash_bands(shingles: frozenset) -> list:
+    """Signature MinHash decoupee en bandes (cles de blocking LSH)"""
+    hashes = [zlib.crc32(s.encode('utf-8')) for s in shingles]
+    signature = [min([h ^ mask for h in hashes]) for mask in _PERMUTATION_MASKS]
+    return [
+        (band, tuple(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]))
+        for band in range(NUM_BANDS)
+    ]
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def merge_leads(target: dict, other: dict) -> dict:
+    """Complete `target` avec les champs non vides de `other`"""
+    for field, value in other.items():
+        if field in MERGE_SKIP_FIELDS or value in (None, ''):
+            continue
+        if target.get(field) in (None, ''):
+            target[field] = value
+
+    sources = target.get('sources') or target.get('source', '')
+    other_source = other.get('source', '')
+    if other_source and other_source not in sources.split('|'):
+        sources = f'{sources}|{other_source}' if sources else other_source
+    target['sources'] = sources
+    return target
+
+
+class _Record:
+    """
+    Lead canonique + donnees de comparaison precalculees.
+    Une fois libere (lead = None), seules les donnees de comparaison restent.
+    """
+
+    __slots__ = ('lead', 'name', 'shingles', 'siren', 'postal_code', 'city', 'lat', 'lon')
+
+    def __init__(self, lead: dict, name: str, shingles: frozenset):
+        self.lead = lead
+        self.name = name
+        self.shingles = shingles
+        self.refresh()
+
+    def refresh(self):
+        self.siren = _siren(self.lead)
+        self.postal_code = normalize_postal_code(self.lead.get('postal_code'))
+        self.city = normalize_text(self.lead.get('city'))
+        self.lat, self.lon = _coords(self.lead)
+
+    def merge(self, other: dict):
+        """Fusionne un doublon: dans le lead, ou seulement dans les donnees de comparaison si libere"""
+        if self.lead is not None:
+            merge_leads(self.lead, other)
+            self.refresh()
+            return
+        self.siren = self.siren or _siren(other)
+        self.postal_code = self.postal_code or normalize_postal_code(other.get('postal_code'))
+        self.city = self.city or normalize_text(other.get('city'))
+        if self.lat is None:
+            self.lat, self.lon = _coords(other)
+
+
+def _siren(lead: dict) -> str:
+    siren = str(lead.get('siren') or '').strip()
+    return siren if len(siren) == 9 else ''
+
+
+def _coords(lead: dict) -> tuple:
+    try:
+        return float(lead['lat']), float(lead['lon'])
+    except (KeyError, TypeError, ValueError):
+        return None, None
+
+
+class LeadDeduplicator:
+    """
+    Deduplication incrementale: add() rattache chaque lead a un lead canonique
+    existant ou en cree un nouveau. Utilisable en batch (leads()) comme en
+    streaming (add() indique si le lead est nouveau).
+
+    En streaming, release() libere les leads canoniques deja emis: l'index ne
+    garde que leurs donnees de comparaison (nom, trigrammes, SIREN, code
+    postal, ville, coordonnees, cles de blocking), et un doublon tardif n'y
+    complete plus que ces donnees. La memoire croit toujours avec le nombre
+    de leads uniques, mais sans garder les leads eux-memes.
+    """
+
+    def __init__(self, name_threshold: float = 0.7, geo_name_threshold: float = 0.4,
+                 max_distance_km: float = 2.0):
+        self.name_threshold = name_threshold
+        self.geo_name_threshold = geo_name_threshold
+        self.max_distance_km = max_distance_km
+
+        self._records = []
+        # Records deja liberes: self._records[:self._released]
+        self._released = 0
+        self._index = {}
+        # Index spatial des leads canoniques geolocalises (item = id du record)
+        self._geo = GeoIndex(cell_km=1.0)
+        self._geo_ids = set()
+
+        # Compteurs
+        self.added = 0
+        self.merged = 0
+        self.comparisons = 0
+
+    def _keys(self, probe: _Record) -> list:
+        """Cles de blocking d'un lead: (type, valeur)"""
+        keys = []
+        if probe.siren:
+            keys.append(('siren', probe.siren))
+        phone = normalize_phone(probe.lead.get('phone'))
+        if phone:
+            keys.append(('phone', phone))
+        keys.extend(('band', band) for band in minhash_bands(probe.shingles))
+        return keys
+
+    def _same_place(self, record: _Record, probe: _Record) -> bool:
+        """Les deux leads peuvent-ils designer le meme site ?"""
+        if probe.lat is not None and record.lat is not None:
+            return haversine_km(probe.lat, probe.lon, record.lat, record.lon) <= self.max_distance_km
+        if probe.postal_code and record.postal_code:
+            return probe.postal_code == record.postal_code
+        if probe.city and record.city:
+            return probe.city == record.city
+        return None  # Localisation inconnue
+
+    def _is_duplicate(self, record: _Record, key_type: str, probe: _Record) -> bool:
+        self.comparisons += 1
+        if key_type == 'siren':
+            return True
+
+        # Deux SIREN differents = deux entreprises differentes
+        if probe.siren and record.siren and probe.siren != record.siren:
+            return False
+
+        same_place = self._same_place(record, probe)
+        if same_place is False:
+            return False
+
+        similarity = jaccard(record.shingles, probe.shingles)
+        if key_type in ('phone', 'geo'):
+            return similarity >= self.geo_name_threshold
+        if same_place is None:
+            # Sans localisation, seul un nom identique suffit
+            return probe.name == record.name
+        return similarity >= self.name_threshold
+
+    def add(self, lead: dict) -> tuple:
+        """
+        Ajoute un lead. Retourne (lead canonique, est_nouveau).
+        Les leads sans nom sont ignores: (None, False); un doublon d'un lead
+        libere renvoie (None, False).
+        """
+        name = normalize_name(lead.get('name'))
+        if not name:
+            return None, False
+        self.added += 1
+
+        probe = _Record(lead, name, name_shingles(name))
+        keys = self._keys(probe)
+
+        # Cles exactes d'abord (plus fiables), puis voisins GPS, puis bandes LSH
+        checked = set()
+        for key_type, record_ids in self._candidates(probe, keys):
+            for record_id in record_ids:
+                if record_id in checked:
+                    continue
+                checked.add(record_id)
+                record = self._records[record_id]
+                if self._is_duplicate(record, key_type, probe):
+                    record.merge(lead)
+                    self._register(record_id, keys)
+                    self.merged += 1
+                    return record.lead, False
+
+        record_id = len(self._records)
+        lead.setdefault('sources', lead.get('source', ''))
+        self._records.append(probe)
+        self._register(record_id, keys)
+        return lead, True
+
+    def _candidates(self, probe: _Record, keys: list):
+        """(type de cle, ids des records candidats), du plus fiable au moins fiable"""
+        for key in keys:
+            if key[0] != 'band':
+                yield key[0], self._index.get(key, ())
+        if probe.lat is not None:
+            yield 'geo', [self._geo.items[idx] for idx, _ in
+                          self._geo.within(probe.lat, probe.lon, GEO_MERGE_RADIUS_KM)]
+        for key in keys:
+            if key[0] == 'band':
+                yield key[0], self._index.get(key, ())
+
+    def _register(self, record_id: int, keys: list):
+        record = self._records[record_id]
+        if record.lat is not None and record_id not in self._geo_ids:
+            self._geo.add(record.lat, record.lon, record_id)
+            self._geo_ids.add(record_id)
+        for key in keys:
+            bucket = self._index.setdefault(key, [])
+            if record_id not in bucket and len(bucket) < MAX_BUCKET_SIZE:
+                bucket.append(record_id)
+
+    def leads(self) -> list:
+        """Leads canoniques (fusionnes, non liberes), dans l'ordre de premiere apparition"""
+        return [record.lead for record in self._records[self._released:]]
+
+    def release(self):
+        """Libere les leads canoniques ajoutes jusqu'ici (deja emis par l'appelant)"""
+        for record in self._records[self._released:]:
+            record.lead = None
+        self._released = len(self._records)
+
+    def dedupe(self, leads) -> list:
+        for lead in leads:
+            self.add(lead)
+        return self.leads()
+
+    def stats(self) -> dict:
+        return {
+            'added': self.added,
+            'unique': len(self._records),
+            'merged': self.merged,
+            'comparisons': self.comparisons,
+        }
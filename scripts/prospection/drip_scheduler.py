@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Sequence de relances automatique (drip)
+intro (J0) -> followup_3j (J+3) -> followup_7j (J+7) -> last_chance (J+14)
+
+Chaque lead a une position dans la sequence et une date de prochain envoi,
+calculee a partir des dates d'envoi du journal (campaign_ledger). Chaque jour,
+le quota d'emails est rempli avec les leads dus ayant le meilleur score.
+
+Le traitement est incremental, pour qu'un cron quotidien prenne quelques
+secondes meme avec beaucoup de leads:
+  - CSV inchange depuis le dernier passage (taille + date) -> pas relu
+  - lead inchange (empreinte des champs utiles) -> pas reecrit
+  - seuls les envois posterieurs au dernier passage font avancer la sequence
+  - les leads dus sont lus via un index sur la date de prochain envoi
+
+Etat stocke dans le meme fichier SQLite que le journal des envois.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from campaign_ledger import CampaignLedger, DAY, normalize_email
+
+# Sequence de prospection: (template, jours apres l'intro)
+SEQUENCE = (
+    ('intro', 0),
+    ('followup_3j', 3),
+    ('followup_7j', 7),
+    ('last_chance', 14),
+)
+
+# Champs dont un changement justifie de mettre a jour l'etat d'un lead
+FINGERPRINT_FIELDS = ('name', 'email', 'score', 'city', 'website', 'phone')
+
+
+def lead_fingerprint(lead: dict) -> str:
+    data = '\x1f'.join(str(lead.get(field) or '') for field in FINGERPRINT_FIELDS)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+
+def _score(lead: dict) -> int:
+    try:
+        return int(lead.get('score') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class DripScheduler:
+    """Position de chaque lead dans la sequence + file des envois dus"""
+
+    def __init__(self, ledger: CampaignLedger, sequence: tuple = SEQUENCE, min_score: int = 50):
+        self.ledger = ledger
+        self.sequence = sequence
+        self.steps = {template: step for step, (template, _) in enumerate(sequence)}
+        self.min_score = min_score
+
+        self._db = sqlite3.connect(ledger.path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS lead_state (
+                email TEXT PRIMARY KEY,
+                score INTEGER NOT NULL,
+                step INTEGER NOT NULL,
+                next_due_at REAL,
+                fingerprint TEXT NOT NULL,
+                lead TEXT NOT NULL
+            )
+        """)
+        # NULL = sequence terminee: ces leads ne sont jamais parcourus
+        self._db.execute('CREATE INDEX IF NOT EXISTS lead_state_due ON lead_state (next_due_at)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS scheduler_meta (key TEXT PRIMARY KEY, value TEXT)')
+        self._db.commit()
+
+        # Compteurs du dernier passage
+        self.ingested = 0
+        self.changed = 0
+        self.advanced = 0
+
+    def _meta(self, key: str, default: str = None) -> str:
+        row = self._db.execute('SELECT value FROM scheduler_meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: str):
+        self._db.execute('INSERT OR REPLACE INTO scheduler_meta (key, value) VALUES (?, ?)', (key, value))
+
+    def _position(self, step: int, sent_at: float) -> tuple:
+        """(etape suivante, date d'envoi due) apres l'envoi de l'etape `step` a `sent_at`"""
+        following = step + 1
+        if following >= len(self.sequence):
+            return following, None
+        delay = self.sequence[following][1] - self.sequence[step][1]
+        return following, sent_at + delay * DAY
+
+    def ingest_csv(self, filename: str, iter_leads) -> int:
+        """Integre un CSV de leads, sauf s'il n'a pas change depuis le dernier passage"""
+        info = os.stat(filename)
+        key = f'csv:{os.path.abspath(filename)}'
+        signature = f'{info.st_size}:{info.st_mtime_ns}'
+        if self._meta(key) == signature:
+            return 0
+        changed = self.ingest(iter_leads(filename))
+        self._set_meta(key, signature)
+        self._db.commit()
+        return changed
+
+    def ingest(self, leads, now: float = None) -> int:
+        """Ajoute les nouveaux leads qualifies et met a jour ceux qui ont change"""
+        now = time.time() if now is None else now
+        known = dict(self._db.execute('SELECT email, fingerprint FROM lead_state'))
+
+        inserts, updates = [], []
+        for lead in leads:
+            email = normalize_email(lead.get('email'))
+            if '@' not in email or _score(lead) < self.min_score:
+                continue
+            self.ingested += 1
+            fingerprint = lead_fingerprint(lead)
+            previous = known.get(email)
+            if previous == fingerprint:
+                continue
+            known[email] = fingerprint
+
+            payload = json.dumps(dict(lead), ensure_ascii=False)
+            if previous is None:
+                # Lead deja contacte avant le scheduler: reprendre la ou il en est
+                step, due_at = 0, now
+                for template, sent_at in self.ledger.history(email):
+                    if template in self.steps and self.steps[template] >= step:
+                        step, due_at = self._position(self.steps[template], sent_at)
+                inserts.append((email, _score(lead), step, due_at, fingerprint, payload))
+            else:
+                updates.append((_score(lead), fingerprint, payload, email))
+
+        self._db.executemany(
+            'INSERT OR REPLACE INTO lead_state (email, score, step, next_due_at, fingerprint, lead) '
+            'VALUES (?, ?, ?, ?, ?, ?)', inserts)
+        self._db.executemany(
+            'UPDATE lead_state SET score = ?, fingerprint = ?, lead = ? WHERE email = ?', updates)
+        self._db.commit()
+        self.changed += len(inserts) + len(updates)
+        return len(inserts) + len(updates)
+
+    def sync_sends(self) -> int:
+        """Fait avancer la sequence avec les envois journalises depuis le dernier passage"""
+        watermark = float(self._meta('sends_watermark', '0'))
+        moves = []
+        for email, template, sent_at in self.ledger.sends_since(watermark):
+            step = self.steps.get(template)
+            if step is not None:
+                following, due_at = self._position(step, sent_at)
+                moves.append((following, due_at, email, following))
+            watermark = max(watermark, sent_at)
+
+        # Une etape n'est jamais reculee (envoi manuel d'un template plus ancien)
+        self._db.executemany(
+            'UPDATE lead_state SET step = ?, next_due_at = ? WHERE email = ? AND step < ?', moves)
+        self._set_meta('sends_watermark', repr(watermark))
+        self._db.commit()
+        self.advanced += len(moves)
+        return len(moves)
+
+    def plan(self, quota: int, now: float = None) -> dict:
+        """
+        Envois du jour: les `quota` leads dus de meilleur score, groupes par
+        template dans l'ordre de la sequence. {template: [lead, ...]}
+        A score egal, une relance passe avant une intro (le rythme de la
+        sequence est tenu meme avec un gros stock de leads a contacter).
+        """
+        now = time.time() if now is None else now
+        rows = self._db.execute("""
+            SELECT step, lead FROM lead_state
+            WHERE next_due_at <= ?
+            ORDER BY score DESC, step DESC, next_due_at
+            LIMIT ?
+        """, (now, max(0, quota))).fetchall()
+
+        plan = {template: [] for template, _ in self.sequence}
+        for step, payload in rows:
+            plan[self.sequence[step][0]].append(json.loads(payload))
+        return {template: leads for template, leads in plan.items() if leads}
+
+    def stats(self) -> dict:
+        """Nombre de leads par etape ('termine' = sequence finie)"""
+        counts = {template: 0 for template, _ in self.sequence}
+        counts['termine'] = 0
+        for step, count in self._db.execute('SELECT step, COUNT(*) FROM lead_state GROUP BY step'):
+            label = self.sequence[step][0] if step < len(self.sequence) else 'termine'
+            counts[label] += count
+        return counts
+
+    def close(self):
+        self._db.close()
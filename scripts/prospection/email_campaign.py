@@ -6,6 +6,7 @@ Envoie des emails de prospection aux leads scrapes.
 
 Usage:
     python email_campaign.py --leads leads.csv --template intro
+    python email_campaign.py --leads leads.parquet --template intro
 
 Cout: 0 EUR (300 emails/jour gratuit avec Brevo)
 """
@@ -19,23 +20,33 @@ if sys.platform == 'win32':
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 import csv
-import json
 import time
 import argparse
-from datetime import datetime
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import os
 
+import columnar
+from campaign_ledger import CampaignLedger, DEFAULT_LEDGER_PATH, normalize_email
+from drip_scheduler import DripScheduler, SEQUENCE
+from leads import Lead
+from send_policy import SendGovernor, SendPolicy
+from smtp_pool import SMTPConnectionPool
+from template_engine import CompiledTemplate, compile_templates
+
 # Configuration SMTP (Brevo gratuit)
+# Host/port/STARTTLS surchargeables pour tester contre un serveur SMTP local
 SMTP_CONFIG = {
-    'host': 'smtp-relay.brevo.com',  # ou smtp-relay.sendinblue.com
-    'port': 587,
-    'username': os.getenv('BREVO_SMTP_USER', 'votre-email@example.com'),
+    'host': os.getenv('BREVO_SMTP_HOST', 'smtp-relay.brevo.com'),  # ou smtp-relay.sendinblue.com
+    'port': int(os.getenv('BREVO_SMTP_PORT', '587')),
+    'starttls': os.getenv('BREVO_SMTP_STARTTLS', '1') != '0',
+    'username': os.getenv('BREVO_SMTP_USER', 'votre-email@example.com'),  # vide = pas de LOGIN
     'password': os.getenv('BREVO_SMTP_KEY', 'votre-cle-smtp'),
 }
 
+# Colonnes lues d'un fichier Parquet: email, score et champs des templates / du drip
+CAMPAIGN_COLUMNS = ['email', 'score', 'name', 'city', 'ville_recherche', 'website', 'phone']
+
 # Email expéditeur
 FROM_EMAIL = 'contact@boxibox.fr'
 FROM_NAME = 'BoxiBox - Solutions Self-Stockage'
@@ -140,56 +151,63 @@ PS: Même si ce n'est pas le bon moment, n'hésitez pas à me répondre pour qu'
     }
 }
 
+# Relances: template -> (template precedent, jours d'attente apres celui-ci)
+# soit J+3, J+7 et J+14 apres l'intro (cf. SEQUENCE)
+FOLLOWUP_RULES = {
+    template: (previous, days - previous_days)
+    for (previous, previous_days), (template, days) in zip(SEQUENCE, SEQUENCE[1:])
+}
+
 
 class EmailCampaign:
-    def __init__(self, smtp_config: dict):
+    def __init__(self, smtp_config: dict, policy: SendPolicy = None, concurrency: int = 1,
+                 ledger: CampaignLedger = None):
         self.smtp_config = smtp_config
+        # Journal des envois (None = pas de reprise ni de suivi des relances)
+        self.ledger = ledger
+        # Cadence anti-spam (emails/minute, plafond journalier, pauses)
+        self.policy = policy or SendPolicy()
+        # Nombre d'envois SMTP en cours en parallele
+        self.concurrency = max(1, concurrency)
+        # Sessions SMTP authentifiees reutilisees d'un email a l'autre
+        self.smtp_pool = SMTPConnectionPool.from_config(smtp_config, size=self.concurrency)
+        self.governor = None
+        # Templates compiles et verifies une fois (placeholder inconnu = erreur au chargement)
+        self.templates = compile_templates(EMAIL_TEMPLATES, FROM_EMAIL, FROM_NAME)
         self.sent_count = 0
         self.error_count = 0
-
-    def load_leads(self, filename: str) -> list:
-        """Charge les leads depuis un fichier CSV"""
-        leads = []
-
+        self.skipped_count = 0
+        self._lock = threading.Lock()
+
+    def iter_leads(self, filename: str):
+        """Lit un par un les leads du CSV (ou Parquet) qui ont un email"""
+        if columnar.is_columnar(filename):
+            for row in columnar.iter_leads(filename, columns=CAMPAIGN_COLUMNS):
+                if row.get('email') and '@' in row['email']:
+                    yield Lead.from_dict(row)
+            return
         with open(filename, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
+            for row in csv.DictReader(f):
                 if row.get('email') and '@' in row.get('email', ''):
-                    leads.append(row)
+                    yield Lead.from_dict(row)
 
-        return leads
+    def load_leads(self, filename: str) -> list:
+        """Charge les leads depuis un fichier CSV (ou Parquet)"""
+        return list(self.iter_leads(filename))
 
-    def personalize_email(self, template: dict, lead: dict) -> tuple:
+    def personalize_email(self, template: CompiledTemplate, lead: dict) -> tuple:
         """Personnalise l'email avec les données du lead"""
-        subject = template['subject'].format(
-            company=lead.get('name', lead.get('company', 'votre centre')),
-            **lead
-        )
+        return template.render(lead)
 
-        body = template['body'].format(
-            company=lead.get('name', lead.get('company', 'votre centre')),
-            first_name=lead.get('first_name', ''),
-            **{k: v for k, v in lead.items() if v}
-        )
-
-        return subject, body
-
-    def send_email(self, to_email: str, subject: str, body: str) -> bool:
+    def send_email(self, to_email: str, subject: str, body: str, template: CompiledTemplate = None) -> bool:
         """Envoie un email via SMTP"""
         try:
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = f'{FROM_NAME} <{FROM_EMAIL}>'
-            msg['To'] = to_email
-
-            # Version texte
-            msg.attach(MIMEText(body, 'plain', 'utf-8'))
+            # Squelette MIME prepare une fois par template
+            template = template or self.templates['intro']
+            raw = template.build_message(to_email, subject, body)
 
-            # Connexion SMTP
-            with smtplib.SMTP(self.smtp_config['host'], self.smtp_config['port']) as server:
-                server.starttls()
-                server.login(self.smtp_config['username'], self.smtp_config['password'])
-                server.send_message(msg)
+            # Connexion SMTP reutilisee (reconnexion automatique si coupee)
+            self.smtp_pool.sendmail(FROM_EMAIL, [to_email], raw)
 
             return True
 
@@ -197,52 +215,114 @@ class EmailCampaign:
             print(f"    ✗ Erreur envoi à {to_email}: {str(e)[:50]}")
             return False
 
-    def run_campaign(self, leads: list, template_name: str, dry_run: bool = False):
-        """Lance une campagne email"""
-        template = EMAIL_TEMPLATES.get(template_name)
+    def _send_lead(self, template: CompiledTemplate, lead: dict, email: str, subject: str, body: str):
+        """Envoi execute par un worker"""
+        ok = self.send_email(email, subject, body, template)
+        if ok and self.ledger:
+            # Enregistre aussitot: un crash apres cet email ne le renverra pas
+            self.ledger.record(email, template.name, lead)
+        with self._lock:
+            if ok:
+                self.sent_count += 1
+            else:
+                self.error_count += 1
+        if ok:
+            print(f"    ✓ Envoyé: {lead.get('name', 'N/A')} ({email})")
+
+    def run_campaign(self, leads, template_name: str, dry_run: bool = False):
+        """Lance une campagne email (leads: liste ou generateur)"""
+        template = self.templates.get(template_name)
         if not template:
             print(f"❌ Template '{template_name}' non trouvé")
             return
 
         print(f"\n📧 Campagne: {template_name}")
-        print(f"   Leads: {len(leads)}")
-        print(f"   Mode: {'DRY RUN (pas d\'envoi)' if dry_run else 'ENVOI RÉEL'}")
+        total = len(leads) if hasattr(leads, '__len__') else '?'
+        print(f"   Leads: {total}")
+        mode = "DRY RUN (pas d'envoi)" if dry_run else 'ENVOI RÉEL'
+        print(f"   Mode: {mode}")
+        print(f"   Cadence: {self.policy}, {self.concurrency} envoi(s) en parallele")
         print("-" * 50)
 
-        for i, lead in enumerate(leads):
-            email = lead.get('email')
-            if not email:
-                continue
+        # Le governor cadence tous les workers (aucune attente en dry run).
+        # Le plafond journalier tient compte des envois deja faits aujourd'hui.
+        already_sent = self.ledger.sent_today() if self.ledger else 0
+        self.governor = SendGovernor(self.policy, already_sent=already_sent, pace=not dry_run)
+        max_pending = self.concurrency * 2
+        queued = set()
 
-            # Skip low score leads
-            score = int(lead.get('score', 50))
-            if score < 40:
-                continue
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = set()
+            for i, lead in enumerate(leads):
+                email = lead.get('email')
+                if not email:
+                    continue
 
-            subject, body = self.personalize_email(template, lead)
+                # Skip low score leads
+                score = int(lead.get('score', 50))
+                if score < 40:
+                    continue
 
-            print(f"[{i+1}/{len(leads)}] {lead.get('name', 'N/A')} ({email})")
+                # Reprise: email deja envoye (run precedent) ou deja en file (doublon du CSV)
+                key = normalize_email(email)
+                if key in queued or (self.ledger and self.ledger.already_sent(key, template_name)):
+                    self.skipped_count += 1
+                    continue
+                queued.add(key)
 
-            if dry_run:
-                print(f"    📝 Subject: {subject[:50]}...")
-            else:
-                if self.send_email(email, subject, body):
-                    self.sent_count += 1
-                    print(f"    ✓ Envoyé")
-                else:
-                    self.error_count += 1
+                if not self.governor.acquire():
+                    print(f"\n⚠️  Plafond journalier atteint ({self.policy.daily_cap} emails)")
+                    break
+
+                subject, body = self.personalize_email(template, lead)
+
+                print(f"[{i+1}/{total}] {lead.get('name', 'N/A')} ({email})")
+
+                if dry_run:
+                    print(f"    📝 Subject: {subject[:50]}...")
+                    continue
 
-            # Rate limiting (important pour éviter le spam flag)
-            time.sleep(3)  # 3 secondes entre chaque email
+                pending.add(executor.submit(self._send_lead, template, lead, email, subject, body))
+                # File d'envois bornee: les leads ne sont pas lus plus vite qu'envoyes
+                if len(pending) >= max_pending:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
 
-            # Pause plus longue tous les 50 emails
-            if (i + 1) % 50 == 0:
-                print(f"\n⏸️  Pause de 60 secondes (anti-spam)...")
-                time.sleep(60)
+        self.smtp_pool.close()
 
         print(f"\n📊 Résultat:")
         print(f"   Envoyés: {self.sent_count}")
         print(f"   Erreurs: {self.error_count}")
+        if self.skipped_count:
+            print(f"   Déjà envoyés (ignorés): {self.skipped_count}")
+        if not dry_run:
+            governor_stats = self.governor.stats()
+            pool_stats = self.smtp_pool.stats()
+            print(f"   Attente cadence: {governor_stats['waited_seconds']}s "
+                  f"({governor_stats['pauses']} pause(s))")
+            print(f"   Connexions SMTP: {pool_stats['connections']} "
+                  f"(reconnexions: {pool_stats['reconnects']})")
+
+
+def run_schedule(campaign: EmailCampaign, leads_file: str, dry_run: bool = False):
+    """Mode sequence: chaque lead recoit le prochain template du drip quand il est du"""
+    start = time.time()
+    scheduler = DripScheduler(campaign.ledger)
+    changed = scheduler.ingest_csv(leads_file, campaign.iter_leads)
+    scheduler.sync_sends()
+
+    quota = campaign.policy.daily_cap - campaign.ledger.sent_today()
+    plan = scheduler.plan(quota)
+    print(f"\n📅 Sequence: {changed} lead(s) nouveaux ou modifies, quota du jour: {max(0, quota)}")
+    for template, leads in plan.items():
+        print(f"   {template}: {len(leads)} envoi(s) du(s)")
+    print(f"   Preparation: {time.time() - start:.2f}s")
+
+    for template, leads in plan.items():
+        campaign.run_campaign(leads, template, dry_run=dry_run)
+
+    scheduler.sync_sends()
+    print(f"\n📊 Position des leads: {scheduler.stats()}")
+    scheduler.close()
 
 
 def setup_brevo_instructions():
@@ -277,13 +357,22 @@ def setup_brevo_instructions():
 
 def main():
     parser = argparse.ArgumentParser(description='Campagne email de prospection')
-    parser.add_argument('--leads', type=str, required=True, help='Fichier CSV des leads')
+    parser.add_argument('--leads', type=str, required=True, help='Fichier CSV (ou .parquet) des leads')
     parser.add_argument('--template', type=str, default='intro',
                         choices=['intro', 'followup_3j', 'followup_7j', 'last_chance'],
                         help='Template à utiliser')
     parser.add_argument('--dry-run', action='store_true', help='Mode test sans envoi')
     parser.add_argument('--setup', action='store_true', help='Afficher les instructions de config')
     parser.add_argument('--limit', type=int, default=300, help='Nombre max d\'emails à envoyer')
+    parser.add_argument('--rate', type=float, default=20, help='Emails par minute maximum')
+    parser.add_argument('--concurrency', type=int, default=2, help='Envois SMTP en parallele')
+    parser.add_argument('--due', action='store_true',
+                        help='Relances: uniquement les leads dont la relance est due (d\'apres le journal)')
+    parser.add_argument('--ledger', type=str, default=DEFAULT_LEDGER_PATH,
+                        help='Fichier SQLite du journal des envois')
+    parser.add_argument('--no-ledger', action='store_true', help='Ne pas journaliser les envois')
+    parser.add_argument('--schedule', action='store_true',
+                        help='Sequence automatique intro -> relances (ignore --template)')
 
     args = parser.parse_args()
 
@@ -301,19 +390,35 @@ def main():
         setup_brevo_instructions()
         print("\nUtilisez --dry-run pour tester sans envoyer.")
 
-    campaign = EmailCampaign(SMTP_CONFIG)
+    policy = SendPolicy(messages_per_minute=args.rate, daily_cap=args.limit)
+    ledger = None if args.no_ledger else CampaignLedger(args.ledger)
+    campaign = EmailCampaign(SMTP_CONFIG, policy=policy, concurrency=args.concurrency, ledger=ledger)
+
+    if args.schedule:
+        if not ledger:
+            print("❌ --schedule necessite le journal des envois (sans --no-ledger)")
+            return
+        run_schedule(campaign, args.leads, dry_run=args.dry_run)
+        return
 
     # Charger les leads
     leads = campaign.load_leads(args.leads)
     print(f"\n📊 {len(leads)} leads chargés")
 
-    # Limiter le nombre d'envois
-    leads = leads[:args.limit]
-
-    # Filtrer par score
-    qualified_leads = [l for l in leads if int(l.get('score', 0)) >= 50]
+    # Filtrer par score (le nombre d'envois est plafonne par la SendPolicy: --limit)
+    qualified_leads = [l for l in leads if int(l.get('score') or 0) >= 50]
     print(f"📊 {len(qualified_leads)} leads qualifiés (score >= 50)")
 
+    if args.due:
+        rule = FOLLOWUP_RULES.get(args.template)
+        if not rule or not ledger:
+            print(f"❌ --due: le template '{args.template}' n'est pas une relance ou le journal est desactive")
+            return
+        previous, days = rule
+        due = set(ledger.due(args.template, after=previous, days=days))
+        qualified_leads = [l for l in qualified_leads if normalize_email(l['email']) in due]
+        print(f"📊 {len(qualified_leads)} leads a relancer ({previous} il y a {days}j ou plus)")
+
     # Lancer la campagne
     campaign.run_campaign(qualified_leads, args.template, dry_run=args.dry_run)
 
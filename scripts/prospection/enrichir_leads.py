@@ -6,6 +6,7 @@ Enrichit les leads avec site web et email en utilisant des sources gratuites.
 
 Usage:
     python enrichir_leads.py --input leads.csv --output leads_enrichis.csv
+    python enrichir_leads.py --input leads.parquet --output leads_enrichis.parquet
 
 Cout: 0 EUR
 """
@@ -22,79 +23,182 @@ import csv
 import re
 import time
 import argparse
+import threading
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote_plus
-import json
+
+import columnar
+import http_cache
+import http_replay
+import rate_limiter
+from circuit_breaker import CircuitBreaker
+from leads import Lead
+from normalize import normalize_text
+from operator_kb import DEFAULT_KB_PATH, OperatorKB, get_kb
+from scoring import LeadScorer, ENRICHED_WEIGHTS
+
+# Requetes simultanees max par fournisseur (le debit reste borne par le rate limiter)
+PROVIDER_CONCURRENCY = {
+    'duckduckgo': 2,
+    'pappers': 1,
+}
+
+# Circuit breaker par fournisseur: (echecs consecutifs, pause en s, pause quota epuise en s)
+PROVIDER_BREAKERS = {
+    'duckduckgo': (3, 120, 600),
+    'pappers': (3, 300, 24 * 3600),
+}
+
+# Statuts comptes comme un echec (en plus des 5xx): statut -> quota epuise ?
+PROVIDER_ERRORS = {
+    'duckduckgo': {202: False, 403: False, 429: False},  # 202 = requete bridee par DDG
+    'pappers': {401: True, 402: True, 403: True, 429: False},
+}
+
+# Duree pendant laquelle un nom ou SIREN sans resultat n'est pas redemande (s)
+NEGATIVE_TTLS = {
+    'duckduckgo': 7 * http_cache.DAY,
+    'pappers': 30 * http_cache.DAY,
+}
+
 
 class LeadEnricher:
-    def __init__(self):
-        self.session = requests.Session()
+    # Colonnes du CSV enrichi
+    EXPORT_FIELDS = ['name', 'email', 'phone', 'website', 'address', 'city', 'postal_code',
+                     'score', 'priority', 'source', 'siren', 'ville_recherche', 'scraped_at']
+
+    def __init__(self, cache: http_cache.ResponseCache = None, concurrency: int = 1, kb: OperatorKB = None,
+                 negative_ttl: float = None):
+        # Nombre de leads enrichis en parallele
+        self.concurrency = max(1, concurrency)
+        # Cache HTTP persistant (None = desactive)
+        self.cache = cache
+        self.session = http_cache.CachedSession(cache)
         self.session.headers.update({
             'User-Agent': 'BoxiBox-Enrichment/1.0 (contact@boxibox.fr)'
         })
-
-        # Base de donnees de sites web connus des operateurs de self-stockage
-        self.known_operators = {
-            'shurgard': {'website': 'https://www.shurgard.fr', 'email': 'info.fr@shurgard.com'},
-            'une piece en plus': {'website': 'https://www.unepieceenplus.com', 'email': 'contact@unepieceenplus.com'},
-            'homebox': {'website': 'https://www.homebox.fr', 'email': 'contact@homebox.fr'},
-            'annexx': {'website': 'https://www.annexx.com', 'email': 'contact@annexx.com'},
-            'jestocke': {'website': 'https://www.jestocke.com', 'email': 'contact@jestocke.com'},
-            'a ta box': {'website': 'https://www.atabox.fr', 'email': 'contact@atabox.fr'},
-            'bluebox': {'website': 'https://www.bluebox.fr', 'email': 'contact@bluebox.fr'},
-            'locabox': {'website': 'https://www.locabox.fr', 'email': 'contact@locabox.fr'},
-            'ouistock': {'website': 'https://www.ouistock.fr', 'email': 'contact@ouistock.fr'},
-            'safestore': {'website': 'https://www.safestore.fr', 'email': 'info@safestore.fr'},
-            'lok\'nstore': {'website': 'https://www.loknstore.fr', 'email': 'contact@loknstore.fr'},
-            'access self storage': {'website': 'https://www.accessselfstorage.fr', 'email': 'contact@accessselfstorage.fr'},
-            'resotainer': {'website': 'https://www.resotainer.fr', 'email': 'contact@resotainer.fr'},
-            'box avenue': {'website': 'https://www.box-avenue.fr', 'email': 'contact@box-avenue.fr'},
-            'easy box': {'website': 'https://www.easybox.fr', 'email': 'contact@easybox.fr'},
-            'abcd box': {'website': 'https://www.abcdbox.fr', 'email': 'contact@abcdbox.fr'},
-            'stockage box': {'website': 'https://www.stockagebox.fr', 'email': 'contact@stockagebox.fr'},
+        # Rate limit par hote (DuckDuckGo, Pappers) au lieu de pauses fixes
+        self.rate_limiter = rate_limiter.mount(self.session, pool_maxsize=max(10, self.concurrency))
+        self.provider_slots = {
+            provider: threading.BoundedSemaphore(limit) for provider, limit in PROVIDER_CONCURRENCY.items()
         }
+        # Fournisseur en panne ou quota epuise: plus d'appels (ni de timeouts) pendant un moment
+        self.breakers = {
+            provider: CircuitBreaker(provider, threshold, reset, quota)
+            for provider, (threshold, reset, quota) in PROVIDER_BREAKERS.items()
+        }
+        # Cache negatif (dans le fichier du cache HTTP): secondes, 0 = desactive
+        self.negative_ttls = dict(NEGATIVE_TTLS)
+        if negative_ttl is not None:
+            self.negative_ttls = {provider: negative_ttl for provider in NEGATIVE_TTLS}
+        # Meme grille que le scraper, + bonus SIREN
+        self.scorer = LeadScorer(ENRICHED_WEIGHTS)
+        # Resume du dernier enrich_all (compteurs par priorite, histogramme)
+        self.score_summary = None
+
+        # Operateurs connus: index par marque, domaine et SIREN (operators.json)
+        self.kb = kb or get_kb()
+        # Leads resolus par la base operateurs (sans recherche DuckDuckGo)
+        self.kb_hits = 0
+        self._counter_lock = threading.Lock()
+
+    def iter_leads(self, filename: str):
+        """Lit les leads d'un CSV (ou Parquet) un par un"""
+        if columnar.is_columnar(filename):
+            for row in columnar.iter_leads(filename):
+                yield Lead.from_dict(row)
+            return
+        with open(filename, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                yield Lead.from_dict(row)
 
     def load_leads(self, filename: str) -> list:
-        """Charge les leads depuis un CSV"""
-        leads = []
-        with open(filename, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                leads.append(dict(row))
-        return leads
+        """Charge les leads depuis un CSV (ou Parquet)"""
+        return list(self.iter_leads(filename))
 
     def match_known_operator(self, name: str) -> dict:
-        """Verifie si le nom correspond a un operateur connu"""
-        name_lower = name.lower()
-        for key, data in self.known_operators.items():
-            if key in name_lower:
-                return data
-        return None
+        """Verifie si le nom correspond a un operateur connu (le plus long nom trouve)"""
+        return self.kb.match_name(name)
+
+    def _apply_known_operator(self, lead: dict, known: dict):
+        """Complete le lead avec les donnees d'un operateur connu"""
+        for field in ('website', 'email'):
+            if known.get(field) and not lead.get(field):
+                lead[field] = known[field]
+        lead['is_known_operator'] = True
+
+    def _is_negative(self, provider: str, key: str) -> bool:
+        """Ce fournisseur n'a-t-il rien trouve pour cette cle recemment ?"""
+        return bool(self.cache and key and self.negative_ttls.get(provider)
+                    and self.cache.is_negative(provider, key))
+
+    def _set_negative(self, provider: str, key: str):
+        if self.cache and key and self.negative_ttls.get(provider):
+            self.cache.set_negative(provider, key, self.negative_ttls[provider])
+
+    def _provider_get(self, provider: str, url: str):
+        """
+        GET vers un fournisseur, protege par son circuit breaker.
+        Retourne (statut, JSON ou None), ou None si le circuit est ouvert ou
+        si l'appel a echoue (erreur reseau, 5xx, quota, reponse illisible).
+        """
+        breaker = self.breakers[provider]
+        if not breaker.allow():
+            return None
 
-    def search_website_via_duckduckgo(self, company_name: str, city: str) -> str:
-        """Recherche le site web via DuckDuckGo (gratuit, pas d'API key)"""
         try:
-            # DuckDuckGo Instant Answer API (gratuit)
-            query = f"{company_name} {city} self stockage site officiel"
-            url = f"https://api.duckduckgo.com/?q={quote_plus(query)}&format=json&no_redirect=1"
+            with self.provider_slots[provider]:
+                response = self.session.get(url, timeout=10)
+        except requests.RequestException:
+            breaker.record_failure()
+            return None
 
-            response = self.session.get(url, timeout=10)
+        status = response.status_code
+        errors = PROVIDER_ERRORS.get(provider, {})
+        if status in errors or status >= 500:
+            breaker.record_failure(quota=errors.get(status, False))
+            return None
+        if status != 200:
+            breaker.record_success()  # 404 & co: le fournisseur repond normalement
+            return status, None
+
+        try:
             data = response.json()
+        except ValueError:
+            breaker.record_failure()
+            return None
+        breaker.record_success()
+        return status, data
 
-            # Extraire l'URL du resultat abstrait
-            abstract_url = data.get('AbstractURL', '')
-            if abstract_url and 'wikipedia' not in abstract_url.lower():
-                return abstract_url
+    def search_website_via_duckduckgo(self, company_name: str, city: str) -> str:
+        """Recherche le site web via DuckDuckGo (gratuit, pas d'API key)"""
+        negative_key = normalize_text(f"{company_name} {city}")
+        if self._is_negative('duckduckgo', negative_key):
+            return None
 
-            # Verifier les resultats relies
-            for result in data.get('Results', [])[:3]:
-                result_url = result.get('FirstURL', '')
-                if result_url and self._is_valid_company_url(result_url, company_name):
-                    return result_url
+        # DuckDuckGo Instant Answer API (gratuit)
+        query = f"{company_name} {city} self stockage site officiel"
+        url = f"https://api.duckduckgo.com/?q={quote_plus(query)}&format=json&no_redirect=1"
 
-        except Exception as e:
-            pass
+        result = self._provider_get('duckduckgo', url)
+        if result is None:
+            return None
+        data = result[1] if isinstance(result[1], dict) else {}
+
+        # Extraire l'URL du resultat abstrait
+        abstract_url = data.get('AbstractURL', '')
+        if abstract_url and 'wikipedia' not in abstract_url.lower():
+            return abstract_url
+
+        # Verifier les resultats relies
+        for related in data.get('Results', [])[:3]:
+            result_url = related.get('FirstURL', '')
+            if result_url and self._is_valid_company_url(result_url, company_name):
+                return result_url
 
+        self._set_negative('duckduckgo', negative_key)
         return None
 
     def search_website_via_google_cse(self, company_name: str, city: str) -> str:
@@ -168,59 +272,52 @@ class LeadEnricher:
         """
         if not siren or len(str(siren)) != 9:
             return {}
+        siren = str(siren)
+        if self._is_negative('pappers', siren):
+            return {}
 
-        try:
-            url = f"https://api.pappers.fr/v2/entreprise?siren={siren}"
-            response = self.session.get(url, timeout=10)
-
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    'website': data.get('site_web'),
-                    'phone': data.get('telephone'),
-                    'email': data.get('email'),
-                }
-        except Exception:
-            pass
+        url = f"https://api.pappers.fr/v2/entreprise?siren={siren}"
+        result = self._provider_get('pappers', url)
+        if result is None:
+            return {}
 
-        return {}
+        data = result[1] if isinstance(result[1], dict) else {}
+        found = {
+            'website': data.get('site_web'),
+            'phone': data.get('telephone'),
+            'email': data.get('email'),
+        }
+        if not any(found.values()):
+            # SIREN inconnu (404) ou sans coordonnees: ne pas reconsommer le quota
+            self._set_negative('pappers', siren)
+            return {}
+        return found
 
     def calculate_score(self, lead: dict) -> int:
         """Recalcule le score avec les nouvelles donnees"""
-        score = 40  # Base
-
-        if lead.get('phone'):
-            score += 20
-        if lead.get('website'):
-            score += 20
-        if lead.get('email'):
-            score += 15
-        if lead.get('address'):
-            score += 5
-        if lead.get('siren'):
-            score += 5
-
-        return min(score, 100)
-
-    def enrich_lead(self, lead: dict) -> dict:
-        """Enrichit un lead avec des donnees supplementaires"""
+        return self.scorer.score(lead)
+
+    def enrich_lead(self, lead: dict, score: bool = True) -> dict:
+        """Enrichit un lead avec des donnees supplementaires (score=False: scoring fait en batch)"""
         name = lead.get('name', '')
         city = lead.get('city', lead.get('ville_recherche', ''))
 
-        # 1. Verifier si c'est un operateur connu
-        known = self.match_known_operator(name)
+        # 1. Verifier si c'est un operateur connu (SIREN, domaine du site/email, nom)
+        known = self.kb.lookup(lead)
         if known:
-            if not lead.get('website'):
-                lead['website'] = known.get('website')
-            if not lead.get('email'):
-                lead['email'] = known.get('email')
-            lead['is_known_operator'] = True
+            self._apply_known_operator(lead, known)
+            with self._counter_lock:
+                self.kb_hits += 1
 
         # 2. Rechercher le site web si pas trouve
         if not lead.get('website'):
             website = self.search_website_via_duckduckgo(name, city)
             if website:
                 lead['website'] = website
+                # Site d'un operateur connu: email de contact connu
+                known = self.kb.by_domain(website)
+                if known:
+                    self._apply_known_operator(lead, known)
 
         # 3. Deviner l'email depuis le site web
         if lead.get('website') and not lead.get('email'):
@@ -238,30 +335,44 @@ class LeadEnricher:
                     lead['email'] = pappers_data['email']
 
         # 5. Recalculer le score
-        lead['score'] = self.calculate_score(lead)
-        lead['priority'] = 'hot' if lead['score'] >= 70 else 'warm' if lead['score'] >= 50 else 'cold'
+        if score:
+            self.scorer.score_lead(lead)
 
         return lead
 
+    def iter_enriched(self, leads, score: bool = True):
+        """
+        Enrichit un flux de leads avec `concurrency` workers. Les leads sortent
+        dans l'ordre d'entree; ceux qui n'ont besoin d'aucun appel reseau
+        (operateur connu, site deja trouve) sont traites sans aucune attente.
+        """
+        if self.concurrency == 1:
+            for lead in leads:
+                yield self.enrich_lead(lead, score)
+            return
+
+        # Fenetre bornee de leads en cours: memoire stable sur un gros fichier
+        window = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for lead in leads:
+                window.append(executor.submit(self.enrich_lead, lead, score))
+                if len(window) >= self.concurrency * 4:
+                    yield window.popleft().result()
+            while window:
+                yield window.popleft().result()
+
     def enrich_all(self, leads: list) -> list:
-        """Enrichit tous les leads"""
+        """Enrichit tous les leads (en parallele), puis les score en une seule passe"""
         enriched = []
 
-        for i, lead in enumerate(leads):
-            print(f"[{i+1}/{len(leads)}] Enrichissement: {lead.get('name', 'N/A')[:40]}...")
-
-            enriched_lead = self.enrich_lead(lead)
+        for i, enriched_lead in enumerate(self.iter_enriched(leads, score=False)):
             enriched.append(enriched_lead)
 
             status = 'OK' if enriched_lead.get('website') or enriched_lead.get('email') else '---'
-            score = enriched_lead.get('score', 0)
-            priority = enriched_lead.get('priority', 'cold')
-
-            print(f"    {status} Score: {score} ({priority})")
-
-            # Rate limiting
-            time.sleep(0.5)
+            print(f"[{i+1}/{len(leads)}] {status} {enriched_lead.get('name', 'N/A')[:40]} "
+                  f"{enriched_lead.get('website') or ''}")
 
+        self.score_summary = self.scorer.score_batch(enriched)
         return enriched
 
     def export_csv(self, leads: list, filename: str):
@@ -270,21 +381,37 @@ class LeadEnricher:
             print("Aucun lead a exporter")
             return
 
-        fieldnames = ['name', 'email', 'phone', 'website', 'address', 'city', 'postal_code',
-                      'score', 'priority', 'source', 'siren', 'ville_recherche', 'scraped_at']
-
         with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+            writer = csv.DictWriter(f, fieldnames=self.EXPORT_FIELDS, extrasaction='ignore')
             writer.writeheader()
             writer.writerows(leads)
 
         print(f"\n[OK] {len(leads)} leads enrichis exportes vers {filename}")
 
+    def export_parquet(self, leads: list, filename: str):
+        """Exporte les leads enrichis en Parquet (schema type)"""
+        count = columnar.write_leads(leads, filename)
+        print(f"\n[OK] {count} leads enrichis exportes vers {filename}")
+
 
 def main():
     parser = argparse.ArgumentParser(description='Enrichisseur de leads')
-    parser.add_argument('--input', type=str, required=True, help='Fichier CSV des leads')
-    parser.add_argument('--output', type=str, default='leads_enrichis.csv', help='Fichier de sortie')
+    parser.add_argument('--input', type=str, required=True, help='Fichier CSV (ou .parquet) des leads')
+    parser.add_argument('--output', type=str, default='leads_enrichis.csv',
+                        help='Fichier de sortie (.parquet: format colonnes, necessite pyarrow)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Leads enrichis en parallele')
+    parser.add_argument('--cache', type=str, default=http_cache.DEFAULT_CACHE_PATH,
+                        help='Fichier SQLite du cache HTTP')
+    parser.add_argument('--no-cache', action='store_true', help='Desactiver le cache HTTP')
+    replay_group = parser.add_mutually_exclusive_group()
+    replay_group.add_argument('--record', type=str, metavar='FICHIER',
+                              help='Enregistrer les reponses HTTP (complete le fichier du scraper)')
+    replay_group.add_argument('--replay', type=str, metavar='FICHIER',
+                              help='Rejouer un enregistrement au lieu d\'appeler le reseau')
+    parser.add_argument('--negative-ttl', type=float, default=None,
+                        help='Jours avant de redemander un nom/SIREN sans resultat (0 = toujours)')
+    parser.add_argument('--operators', type=str, default=DEFAULT_KB_PATH,
+                        help='Base des operateurs connus (JSON)')
 
     args = parser.parse_args()
 
@@ -292,31 +419,62 @@ def main():
     print("BoxiBox - Enrichisseur de Leads (GRATUIT)")
     print("=" * 50)
 
-    enricher = LeadEnricher()
+    if (columnar.is_columnar(args.input) or columnar.is_columnar(args.output)) and not columnar.available():
+        print("[!] Fichiers .parquet: pyarrow requis (pip install pyarrow)")
+        return
+
+    # Enregistrement/rejeu: ni cache HTTP ni cache negatif, chaque requete est enregistree ou rejouee
+    use_cache = not (args.no_cache or args.record or args.replay)
+    cache = http_cache.ResponseCache(args.cache) if use_cache else None
+    negative_ttl = None if args.negative_ttl is None else args.negative_ttl * http_cache.DAY
+    enricher = LeadEnricher(cache=cache, concurrency=args.concurrency, kb=get_kb(args.operators),
+                            negative_ttl=negative_ttl)
+    cassette = None
+    if args.replay:
+        cassette = http_replay.mount_replay(enricher.session, http_replay.Cassette.load(args.replay))
+    elif args.record:
+        cassette = http_replay.mount_recorder(enricher.session, http_replay.open_recording(args.record))
 
     # Charger les leads
     leads = enricher.load_leads(args.input)
     print(f"\n{len(leads)} leads charges depuis {args.input}")
 
     # Enrichir
+    start = time.time()
     enriched = enricher.enrich_all(leads)
+    elapsed = time.time() - start
 
-    # Stats
-    hot = len([l for l in enriched if l.get('priority') == 'hot'])
-    warm = len([l for l in enriched if l.get('priority') == 'warm'])
-    cold = len([l for l in enriched if l.get('priority') == 'cold'])
-    with_email = len([l for l in enriched if l.get('email')])
-    with_website = len([l for l in enriched if l.get('website')])
+    # Stats (calculees pendant le scoring, sans re-parcourir les leads)
+    summary = enricher.score_summary
 
     print(f"\nResultat:")
-    print(f"  HOT (score >= 70):  {hot}")
-    print(f"  WARM (score 50-69): {warm}")
-    print(f"  COLD (score < 50):  {cold}")
-    print(f"  Avec email:         {with_email}")
-    print(f"  Avec site web:      {with_website}")
+    print(f"  HOT (score >= 70):  {summary['hot']}")
+    print(f"  WARM (score 50-69): {summary['warm']}")
+    print(f"  COLD (score < 50):  {summary['cold']}")
+    print(f"  Avec email:         {summary['with_email']}")
+    print(f"  Avec site web:      {summary['with_website']}")
+    print(f"  Operateurs connus:  {enricher.kb_hits} (base v{enricher.kb.version}, sans recherche web)")
+    print(f"  Duree:              {elapsed:.1f}s ({len(enriched) / max(elapsed, 0.001):.1f} leads/s)")
+    if cache:
+        cache_stats = cache.stats()
+        print(f"  Cache HTTP:         {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['negative_hits']} resultats negatifs reutilises")
+    if args.replay:
+        replay_stats = cassette.stats()
+        print(f"  Rejeu:              {replay_stats['hits']} reponses rejouees, {replay_stats['misses']} absentes")
+    elif args.record:
+        cassette.save(args.record)
+        print(f"  Enregistrement:     {cassette.recorded} reponses -> {args.record}")
+    for provider, breaker in enricher.breakers.items():
+        stats = breaker.stats()
+        print(f"  {provider + ':':<20}{stats['calls']} appels, {stats['failures']} echecs, "
+              f"{stats['short_circuited']} evites (circuit {stats['state']}, ouvert {stats['opened']}x)")
 
     # Exporter
-    enricher.export_csv(enriched, args.output)
+    if columnar.is_columnar(args.output):
+        enricher.export_parquet(enriched, args.output)
+    else:
+        enricher.export_csv(enriched, args.output)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Outils geographiques pour les leads (lat/lon)
+Distances, departements et index spatial (rayon, plus proches voisins).
+
+Usage:
+    index = GeoIndex.from_leads(leads)
+    index.within(48.85, 2.35, radius_km=10)     # operateurs a moins de 10 km
+    index.nearest(48.85, 2.35, k=1, exclude=i)  # concurrent le plus proche
+"""
+
+import math
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.195
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distance en km entre deux points GPS"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (float(lat1), float(lon1), float(lat2), float(lon2)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * math.asin(math.sqrt(a))
+
+
+def departement(postal_code: str) -> str:
+    """Code departement a partir du code postal ('' si inconnu)"""
+    code = str(postal_code or '').strip()
+    if len(code) == 4 and code.isdigit():
+        code = '0' + code
+    if len(code) != 5 or not code.isdigit():
+        return ''
+    if code.startswith('20'):
+        # Corse: 200xx-201xx = Corse-du-Sud, 202xx-206xx = Haute-Corse
+        return '2A' if code < '20200' else '2B'
+    if code.startswith('97') or code.startswith('98'):
+        return code[:3]  # Outre-mer
+    return code[:2]
+
+
+def count_by_departement(leads) -> Counter:
+    """Nombre de leads par departement ('??' si code postal inconnu)"""
+    return Counter(departement(lead.get('postal_code')) or '??' for lead in leads)
+
+
+class GeoIndex:
+    """
+    Index spatial en grille (cellules de `cell_km`), coordonnees stockees dans
+    des array('d'). Ajout incremental, requetes par rayon et plus proches
+    voisins en ne parcourant que les cellules utiles.
+    """
+
+    def __init__(self, cell_km: float = 5.0, ref_lat: float = 46.5):
+        self.cell_km = cell_km
+        # Taille des cellules en degres (longitude calee sur la latitude de reference)
+        self._dlat = cell_km / 111.0
+        self._dlon = cell_km / (111.0 * math.cos(math.radians(ref_lat)))
+        self.lats = array('d')
+        self.lons = array('d')
+        self.items = []
+        self._cells = {}
+        self._bounds = None  # (min_i, min_j, max_i, max_j) des cellules occupees
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return int(math.floor(lat / self._dlat)), int(math.floor(lon / self._dlon))
+
+    def add(self, lat: float, lon: float, item=None) -> int:
+        """Ajoute un point; retourne son identifiant"""
+        lat, lon = float(lat), float(lon)
+        idx = len(self.items)
+        self.lats.append(lat)
+        self.lons.append(lon)
+        self.items.append(item)
+
+        cell = self._cell(lat, lon)
+        ids = self._cells.get(cell)
+        if ids is None:
+            ids = self._cells[cell] = array('l')
+        ids.append(idx)
+
+        i, j = cell
+        if self._bounds is None:
+            self._bounds = (i, j, i, j)
+        else:
+            min_i, min_j, max_i, max_j = self._bounds
+            self._bounds = (min(min_i, i), min(min_j, j), max(max_i, i), max(max_j, j))
+        return idx
+
+    @classmethod
+    def from_leads(cls, leads, cell_km: float = 5.0) -> 'GeoIndex':
+        """Index des leads ayant des coordonnees (item = le lead)"""
+        index = cls(cell_km=cell_km)
+        for lead in leads:
+            try:
+                index.add(float(lead['lat']), float(lead['lon']), lead)
+            except (KeyError, TypeError, ValueError):
+                continue
+        return index
+
+    def _lon_cell_km(self, lat: float) -> float:
+        """Largeur reelle (km) d'une cellule a cette latitude"""
+        return self._dlon * 111.0 * max(0.01, math.cos(math.radians(min(89.0, abs(lat)))))
+
+    def _scan(self, cells, lat: float, lon: float, radius_km: float, exclude) -> list:
+        """Points des cellules a moins de radius_km: liste de (distance, id)"""
+        found = []
+        lats, lons = self.lats, self.lons
+        # Pre-filtre equirectangulaire (exact a ~1% pres en France), haversine ensuite
+        kx = KM_PER_DEGREE * math.cos(math.radians(lat))
+        bound = (radius_km * 1.02 + 0.1) ** 2 if radius_km != float('inf') else float('inf')
+        for cell in cells:
+            for idx in self._cells.get(cell, ()):
+                if idx == exclude:
+                    continue
+                dy = (lats[idx] - lat) * KM_PER_DEGREE
+                dx = (lons[idx] - lon) * kx
+                if dx * dx + dy * dy > bound:
+                    continue
+                distance = haversine_km(lat, lon, lats[idx], lons[idx])
+                if distance <= radius_km:
+                    found.append((distance, idx))
+        return found
+
+    def within(self, lat: float, lon: float, radius_km: float, exclude: int = None) -> list:
+        """Points a moins de `radius_km`: liste de (id, distance) triee par distance"""
+        if not self.items:
+            return []
+        lat, lon = float(lat), float(lon)
+        ci, cj = self._cell(lat, lon)
+        span_i = int(math.ceil(radius_km / self.cell_km))
+        # Les cellules sont plus etroites vers le nord: marge sur la latitude la plus haute
+        span_j = int(math.ceil(radius_km / self._lon_cell_km(abs(lat) + radius_km / 111.0)))
+        cells = ((i, j) for i in range(ci - span_i, ci + span_i + 1)
+                 for j in range(cj - span_j, cj + span_j + 1))
+        return [(idx, distance) for distance, idx in sorted(self._scan(cells, lat, lon, radius_km, exclude))]
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_km: float = None,
+                exclude: int = None) -> list:
+        """
+        Les `k` plus proches voisins: liste de (id, distance).
+        Recherche en anneaux de cellules autour du point, arretee des que
+        l'anneau suivant ne peut plus contenir de point plus proche.
+        """
+        if not self.items:
+            return []
+        lat, lon = float(lat), float(lon)
+        ci, cj = self._cell(lat, lon)
+        min_i, min_j, max_i, max_j = self._bounds
+        max_ring = max(abs(ci - min_i), abs(ci - max_i), abs(cj - min_j), abs(cj - max_j))
+        # Taille minimale d'une cellule (km) autour du point
+        cell_min_km = min(self.cell_km, self._lon_cell_km(abs(lat) + 1.0))
+        limit = float('inf') if max_km is None else max_km
+
+        best = []
+        occupied = None
+        for ring in range(max_ring + 1):
+            if occupied is None and (2 * ring + 1) ** 2 > len(self._cells):
+                # Zone peu dense: parcourir les cellules occupees plutot que les anneaux vides
+                occupied = sorted(
+                    (max(abs(i - ci), abs(j - cj)), (i, j)) for i, j in self._cells
+                    if max(abs(i - ci), abs(j - cj)) >= ring
+                )
+                position = 0
+
+            if occupied is not None:
+                cells = []
+                while position < len(occupied) and occupied[position][0] == ring:
+                    cells.append(occupied[position][1])
+                    position += 1
+            elif ring == 0:
+                cells = [(ci, cj)]
+            else:
+                cells = [(ci + di, cj + dj) for di in range(-ring, ring + 1)
+                         for dj in (-ring, ring)]
+                cells += [(ci + di, cj + dj) for di in (-ring, ring)
+                          for dj in range(-ring + 1, ring)]
+            # Inutile de chercher plus loin que le k-ieme meilleur deja trouve
+            radius = best[-1][0] if len(best) == k else limit
+            best.extend(self._scan(cells, lat, lon, radius, exclude))
+            best.sort()
+            del best[k:]
+
+            # Tout point hors des anneaux deja vus est a plus de ring * cell_min_km
+            reach = ring * cell_min_km
+            if len(best) == k and best[-1][0] <= reach:
+                break
+            if reach > limit:
+                break
+
+        return [(idx, distance) for distance, idx in best]
+
+    def count_by_departement(self) -> Counter:
+        """Nombre de points par departement (items = leads)"""
+        return count_by_departement(item for item in self.items if isinstance(item, Mapping))
+
+    def nearest_competitor(self, idx: int) -> tuple:
+        """Plus proche autre point d'un point de l'index: (id, distance) ou None"""
+        found = self.nearest(self.lats[idx], self.lons[idx], k=1, exclude=idx)
+        return found[0] if found else None
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Parsing HTML des pages de resultats (Pages Jaunes, Societe.com)
+Backend choisi une fois par run, du plus rapide au plus lent:
+  - selectolax (parseur C lexbor, selecteurs CSS natifs)
+  - BeautifulSoup + lxml
+  - BeautifulSoup + html.parser (toujours disponible)
+
+Avec BeautifulSoup, seuls les blocs de resultats sont construits (strainer
+deduit du selecteur des blocs: le reste de la page, scripts et menus, n'est
+jamais transforme en objets) et les selecteurs sont compiles une fois
+(soupsieve) au lieu d'etre re-analyses pour chaque bloc.
+
+Usage:
+    parser = ListingParser('.bi-bloc, .pj-list-item', {'name': 'h3 a', 'phone': '.tel'})
+    for listing in parser.listings(html):
+        name = parser.text(parser.first(listing, 'name'))
+"""
+
+import re
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax est optionnel
+    LexborHTMLParser = None
+
+try:
+    import lxml  # noqa: F401 (builder BeautifulSoup 'lxml')
+    HAS_LXML = True
+except ImportError:  # lxml est optionnel
+    HAS_LXML = False
+
+SELECTOLAX = 'selectolax'
+LXML = 'lxml'
+HTML_PARSER = 'html.parser'
+
+# Du plus rapide au plus lent
+BACKENDS = (SELECTOLAX, LXML, HTML_PARSER)
+
+# Parties de selecteur utilisables pour le parsing partiel: tag, .classe, [attribut]
+_SIMPLE_PART = re.compile(r'^(?P<tag>[a-zA-Z][\w-]*)?(?:\.(?P<cls>[\w-]+))?(?:\[(?P<attr>[\w-]+)\])?$')
+
+
+def available_backends() -> list:
+    """Backends installes, du plus rapide au plus lent"""
+    installed = {SELECTOLAX: LexborHTMLParser is not None, LXML: HAS_LXML, HTML_PARSER: True}
+    return [backend for backend in BACKENDS if installed[backend]]
+
+
+def default_backend() -> str:
+    return available_backends()[0]
+
+
+class BlockStrainer(SoupStrainer):
+    """
+    Ne construit que les elements dont le tag, une classe ou un attribut est
+    attendu (avec tout leur contenu). Contrairement a SoupStrainer(class_=...),
+    reconnait un bloc a plusieurs classes ("bi-bloc premium").
+    """
+
+    def __init__(self, tags=(), classes=(), attributes=()):
+        super().__init__()
+        self.tags = frozenset(tags)
+        self.classes = frozenset(classes)
+        self.attributes = frozenset(attributes)
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        if name in self.tags:
+            return True
+        if not attrs:
+            return False
+        if self.attributes and not self.attributes.isdisjoint(attrs):
+            return True
+        classes = attrs.get('class')
+        if classes and self.classes:
+            if isinstance(classes, str):
+                classes = classes.split()
+            return not self.classes.isdisjoint(classes)
+        return False
+
+    def allow_string_creation(self, string) -> bool:
+        # Texte hors des blocs (entre deux blocs): inutile
+        return False
+
+    # bs4 < 4.13
+    def search_tag(self, name, attrs=None):
+        return self.allow_tag_creation(None, name, dict(attrs or {}))
+
+
+def block_strainer(selector: str):
+    """Strainer des blocs d'un selecteur simple ('.a, .b, [data-x]'), None si non deductible"""
+    tags, classes, attributes = set(), set(), set()
+    for part in selector.split(','):
+        match = _SIMPLE_PART.match(part.strip())
+        if not match or not any(match.groups()):
+            return None
+        # Le strainer peut garder un peu trop (tag.classe -> classe): le selecteur filtre ensuite
+        if match.group('attr'):
+            attributes.add(match.group('attr'))
+        elif match.group('cls'):
+            classes.add(match.group('cls'))
+        else:
+            tags.add(match.group('tag'))
+    return BlockStrainer(tags, classes, attributes)
+
+
+class ListingParser:
+    """Blocs de resultats d'une page et premier element de chaque champ d'un bloc"""
+
+    def __init__(self, listing: str, fields: dict, backend: str = None):
+        self.backend = backend or default_backend()
+        if self.backend not in available_backends():
+            raise ValueError(f"Backend HTML indisponible: {self.backend} (installes: {available_backends()})")
+        self.listing_selector = listing
+        self.field_selectors = dict(fields)
+
+        if self.backend == SELECTOLAX:
+            # Selecteurs passes tels quels au moteur CSS de lexbor
+            self._listing = listing
+            self._fields = self.field_selectors
+            self._strainer = None
+        else:
+            # Compiles une fois pour tout le run
+            self._listing = soupsieve.compile(listing)
+            self._fields = {field: soupsieve.compile(selector) for field, selector in fields.items()}
+            self._strainer = block_strainer(listing)
+
+    def listings(self, html: str) -> list:
+        """Blocs de resultats de la page"""
+        if self.backend == SELECTOLAX:
+            # lexbor renvoie un element une fois par groupe du selecteur qu'il satisfait
+            seen = set()
+            nodes = []
+            for node in LexborHTMLParser(html).css(self._listing):
+                if node.mem_id not in seen:
+                    seen.add(node.mem_id)
+                    nodes.append(node)
+            return nodes
+        soup = BeautifulSoup(html, self.backend, parse_only=self._strainer)
+        return self._listing.select(soup)
+
+    def first(self, listing, field: str):
+        """Premier element du champ dans le bloc (None si absent)"""
+        if self.backend == SELECTOLAX:
+            return listing.css_first(self._fields[field])
+        return self._fields[field].select_one(listing)
+
+    def text(self, node) -> str:
+        """Texte de l'element, chaque morceau sans espaces autour ('' si None)"""
+        if node is None:
+            return ''
+        if self.backend == SELECTOLAX:
+            return node.text(strip=True)
+        return node.get_text(strip=True)
+
+    def attr(self, node, name: str) -> str:
+        """Valeur d'un attribut ('' si absent)"""
+        if node is None:
+            return ''
+        if self.backend == SELECTOLAX:
+            return node.attributes.get(name) or ''
+        value = node.get(name)
+        return ' '.join(value) if isinstance(value, list) else (value or '')
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Cache HTTP persistant (SQLite)
+Evite de re-telecharger les memes reponses d'un run a l'autre (API Gouv,
+Nominatim, Overpass, DuckDuckGo, Pappers).
+
+La cle est un hash de methode + URL (parametres tries) + corps de la requete.
+Chaque source a sa propre duree de vie (TTL); seules les reponses 200 sont
+mises en cache. Les entrees expirees sont supprimees a l'ouverture du cache
+(leurs pages sont reutilisees: le fichier ne grossit plus sans fin).
+
+Usage:
+    cache = ResponseCache()
+    session = CachedSession(cache)
+    session.get(url, params=params)                   # TTL de l'hote
+    session.get(url, params=params, cache_ttl=GEOCODE_TTL)  # TTL explicite
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlparse, urlencode, parse_qsl, urlunparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'http_cache.sqlite')
+
+DAY = 24 * 3600
+
+# TTL par hote (secondes). Hote absent = pas de cache.
+SOURCE_TTLS = {
+    'recherche-entreprises.api.gouv.fr': 1 * DAY,
+    'nominatim.openstreetmap.org': 1 * DAY,
+    'overpass-api.de': 1 * DAY,
+    'api.duckduckgo.com': 7 * DAY,
+    'api.pappers.fr': 30 * DAY,  # Quota gratuit de 100 req/mois
+}
+
+# Coordonnees d'une ville: ne changent (quasiment) jamais
+GEOCODE_TTL = 30 * DAY
+
+
+def canonical_url(url: str) -> str:
+    """URL avec parametres tries, pour que l'ordre des params ne change pas la cle"""
+    parts = urlparse(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunparse(parts._replace(query=query, fragment=''))
+
+
+def request_key(method: str, url: str, body=None) -> str:
+    """Cle de cache: sha256(methode + URL canonique + corps)"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    digest = hashlib.sha256()
+    digest.update(method.upper().encode('ascii'))
+    digest.update(b'\n')
+    digest.update(canonical_url(url).encode('utf-8'))
+    digest.update(b'\n')
+    digest.update(body or b'')
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Stockage SQLite des reponses HTTP, partageable entre threads"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                content BLOB NOT NULL,
+                encoding TEXT,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        # Resultats negatifs par fournisseur (nom ou SIREN sans resultat)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS negatives (
+                provider TEXT NOT NULL,
+                key TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (provider, key)
+            )
+        """)
+        self._db.commit()
+
+        # Compteurs
+        self.purged = self.purge_expired()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.negative_hits = 0
+        self.negative_stores = 0
+
+    def get(self, key: str):
+        """Retourne la requests.Response en cache, ou None si absente/expiree"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT url, status, headers, content, encoding FROM responses '
+                'WHERE key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        url, status, headers, content, encoding = row
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response._content = content
+        response.encoding = encoding
+        response.url = url
+        response.reason = 'OK'
+        response.elapsed = timedelta(0)
+        response.from_cache = True
+        return response
+
+    def set(self, key: str, response, ttl: float):
+        """Stocke une reponse pour `ttl` secondes"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, response.url, response.status_code, json.dumps(dict(response.headers)),
+                 response.content, response.encoding, now, now + ttl)
+            )
+            self._db.commit()
+            self.stores += 1
+
+    def is_negative(self, provider: str, key: str) -> bool:
+        """Ce fournisseur n'a-t-il rien trouve pour cette cle recemment ?"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT 1 FROM negatives WHERE provider = ? AND key = ? AND expires_at > ?',
+                (provider, key, time.time())
+            ).fetchone()
+            if row is not None:
+                self.negative_hits += 1
+            return row is not None
+
+    def set_negative(self, provider: str, key: str, ttl: float):
+        """Memorise une absence de resultat pour `ttl` secondes"""
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO negatives VALUES (?, ?, ?)', (provider, key, time.time() + ttl)
+            )
+            self._db.commit()
+            self.negative_stores += 1
+
+    def purge_expired(self) -> int:
+        """Supprime les entrees expirees; retourne le nombre de lignes supprimees"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute('DELETE FROM responses WHERE expires_at <= ?', (now,))
+            purged = cursor.rowcount
+            cursor = self._db.execute('DELETE FROM negatives WHERE expires_at <= ?', (now,))
+            self._db.commit()
+            return purged + cursor.rowcount
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'purged': self.purged,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'negative_hits': self.negative_hits,
+            'negative_stores': self.negative_stores,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CachedSession(requests.Session):
+    """requests.Session qui consulte le ResponseCache avant le reseau"""
+
+    def __init__(self, cache: ResponseCache = None, ttls: dict = None):
+        super().__init__()
+        self.cache = cache
+        self.ttls = SOURCE_TTLS if ttls is None else ttls
+
+    def ttl_for(self, url: str) -> float:
+        return self.ttls.get(urlparse(url).hostname or '')
+
+    def request(self, method, url, params=None, data=None, headers=None, json=None,
+                cache_ttl=None, **kwargs):
+        ttl = cache_ttl if cache_ttl is not None else self.ttl_for(url)
+        if self.cache is None or not ttl:
+            return super().request(method, url, params=params, data=data,
+                                   headers=headers, json=json, **kwargs)
+
+        # URL finale + corps encode, sans les headers de session (User-Agent aleatoire)
+        prepared = requests.Request(method.upper(), url, params=params, data=data, json=json).prepare()
+        key = request_key(prepared.method, prepared.url, prepared.body)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            cached.request = prepared
+            return cached
+
+        response = super().request(method, url, params=params, data=data,
+                                   headers=headers, json=json, **kwargs)
+        if response.status_code == 200:
+            self.cache.set(key, response, ttl)
+        return response
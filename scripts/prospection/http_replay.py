@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Enregistrement et rejeu des reponses HTTP (hors ligne)
+Un enregistrement ("cassette") est un fichier JSON des reponses des sources
+(API Gouv, Nominatim, Overpass, DuckDuckGo, Pappers), indexees par la meme
+cle que le cache HTTP: methode + URL canonique + corps.
+
+  - RecordingAdapter: envoie la requete via l'adapter existant (rate limit
+    compris) et enregistre la reponse, quel que soit son statut
+  - ReplayAdapter: repond depuis l'enregistrement, sans reseau ni rate limit;
+    une requete absente leve ReplayMiss (une ConnectionError, traitee par les
+    scripts comme une panne reseau)
+
+Usage:
+    cassette = Cassette()
+    http_replay.mount_recorder(scraper.session, cassette)
+    scraper.scrape_all(['Paris'])
+    cassette.save('fixtures/http/paris.json')
+
+    http_replay.mount_replay(scraper.session, Cassette.load('fixtures/http/paris.json'))
+
+    python http_replay.py info fixtures/http/paris.json
+"""
+
+import sys
+import io
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+import argparse
+import base64
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from http_cache import request_key
+
+CASSETTE_VERSION = 1
+
+# Headers qui n'ont plus de sens une fois le corps decompresse et stocke
+DROPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie')
+
+
+class ReplayMiss(requests.ConnectionError):
+    """Requete absente de l'enregistrement"""
+
+
+def key_for(request) -> str:
+    """Cle d'une requete preparee (identique a celle du cache HTTP)"""
+    return request_key(request.method, request.url, request.body)
+
+
+class Cassette:
+    """Reponses enregistrees, indexees par cle de requete, partageables entre threads"""
+
+    def __init__(self, entries: dict = None, meta: dict = None):
+        self.entries = dict(entries or {})
+        # Contexte de l'enregistrement (villes, date)
+        self.meta = dict(meta or {})
+        self._lock = threading.Lock()
+
+        # Compteurs
+        self.recorded = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: str) -> 'Cassette':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Version d'enregistrement non supportee: {data.get('version')} ({path})")
+        return cls(data.get('entries'), data.get('meta'))
+
+    def save(self, path: str):
+        """Ecrit l'enregistrement (cles triees: diff lisible d'un enregistrement a l'autre)"""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            data = {'version': CASSETTE_VERSION, 'meta': self.meta, 'entries': self.entries}
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+    def record(self, request, response):
+        """Enregistre la reponse d'une requete preparee"""
+        content = response.content or b''
+        entry = {
+            'method': request.method,
+            'url': request.url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS},
+            'encoding': response.encoding,
+        }
+        # Texte tel quel (fixtures lisibles), binaire en base64
+        try:
+            entry['text'] = content.decode('utf-8')
+        except UnicodeDecodeError:
+            entry['base64'] = base64.b64encode(content).decode('ascii')
+        with self._lock:
+            self.entries[key_for(request)] = entry
+            self.recorded += 1
+
+    def response_for(self, request):
+        """requests.Response enregistree pour cette requete, None si absente"""
+        with self._lock:
+            entry = self.entries.get(key_for(request))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = entry.get('reason') or ''
+        response.headers = CaseInsensitiveDict(entry.get('headers') or {})
+        if 'text' in entry:
+            response._content = entry['text'].encode('utf-8')
+        else:
+            response._content = base64.b64decode(entry.get('base64', ''))
+        response.encoding = entry.get('encoding')
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(0)
+        return response
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self.entries),
+            'recorded': self.recorded,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+class RecordingAdapter(BaseAdapter):
+    """Adapter qui delegue a l'adapter existant et enregistre chaque reponse"""
+
+    def __init__(self, cassette: Cassette, inner: BaseAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        response = self.inner.send(request, **kwargs)
+        self.cassette.record(request, response)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Adapter qui repond depuis l'enregistrement (latency: delai simule par requete)"""
+
+    def __init__(self, cassette: Cassette, latency: float = 0.0):
+        super().__init__()
+        self.cassette = cassette
+        self.latency = latency
+
+    def send(self, request, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        response = self.cassette.response_for(request)
+        if response is None:
+            raise ReplayMiss(f"Requete non enregistree: {request.method} {request.url}", request=request)
+        return response
+
+    def close(self):
+        pass
+
+
+def mount_recorder(session, cassette: Cassette) -> Cassette:
+    """Enregistre les reponses de la session (par-dessus ses adapters: rate limit conserve)"""
+    for prefix in ('https://', 'http://'):
+        session.mount(prefix, RecordingAdapter(cassette, session.get_adapter(prefix)))
+    return cassette
+
+
+def mount_replay(session, cassette: Cassette, latency: float = 0.0) -> Cassette:
+    """Remplace le reseau de la session par l'enregistrement"""
+    adapter = ReplayAdapter(cassette, latency)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return cassette
+
+
+def open_recording(path: str, **meta) -> Cassette:
+    """Enregistrement a completer: le scraper puis l'enrichisseur ecrivent dans le meme fichier"""
+    cassette = Cassette.load(path) if os.path.exists(path) else Cassette()
+    cassette.meta.update(meta, recorded_at=datetime.now().isoformat(timespec='seconds'))
+    return cassette
+
+
+def summarize(cassette: Cassette) -> Counter:
+    """Nombre de reponses par (hote, statut)"""
+    return Counter((urlparse(entry['url']).hostname, entry['status']) for entry in cassette.entries.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Enregistrements HTTP des scripts de prospection')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    info_parser = subparsers.add_parser('info', help='Contenu d\'un enregistrement')
+    info_parser.add_argument('cassette', type=str, help='Fichier JSON de l\'enregistrement')
+
+    args = parser.parse_args()
+
+    cassette = Cassette.load(args.cassette)
+    print(f"📼 {args.cassette}: {len(cassette.entries)} reponses")
+    for key, value in sorted(cassette.meta.items()):
+        print(f"   {key}: {value}")
+    print(f"\n   {'hote':<40} {'statut':>6} {'reponses':>9}")
+    for (host, status), count in sorted(summarize(cassette).items()):
+        print(f"   {host:<40} {status:>6} {count:>9}")
+
+
+if __name__ == '__main__':
+    main()
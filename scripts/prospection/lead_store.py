@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Stock local des leads pour le scraping incremental
+Chaque lead scrape est conserve (SQLite) sous un identifiant stable
+(normalize.lead_key: SIREN, element OSM, sinon nom + code postal). A chaque
+run, le stock indique ce qui a change depuis le dernier passage:
+  - new: identifiant jamais vu (ou revenu apres avoir disparu)
+  - changed: champs utiles modifies (empreinte differente)
+  - gone: lead connu d'une ville/source re-scrapee ce run, mais absent
+Un filigrane par (ville, source) memorise la date du dernier scraping reussi:
+la rotation quotidienne peut sauter les villes rafraichies recemment.
+
+Une source qui ne renvoie rien pour une ville ou elle avait des leads est
+consideree en echec (API en panne): ni son filigrane ni ses leads ne bougent.
+
+Usage:
+    store = LeadStore()
+    todo = [v for v in villes if v not in store.fresh_cities(villes, sources, max_age)]
+    ... scraping de todo: counts = {(ville, source): nombre de leads bruts} ...
+    scopes = store.successful_scopes(todo, sources, counts)
+    delta = store.apply(leads, scopes)
+    store.record_runs(scopes, counts)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from normalize import lead_key, normalize_phone, normalize_text
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.state', 'leads.sqlite')
+
+# Une ville scrapee il y a moins de 20 h est sautee par la rotation quotidienne
+DEFAULT_REFRESH_HOURS = 20
+
+# Champs dont un changement fait d'un lead un lead "modifie"
+FINGERPRINT_FIELDS = ('name', 'email', 'phone', 'website', 'address', 'postal_code', 'siren')
+
+# Statuts d'un lead du delta (colonne 'change')
+NEW = 'new'
+CHANGED = 'changed'
+GONE = 'gone'
+
+
+def lead_fingerprint(lead: dict) -> str:
+    """Empreinte des champs normalises (casse, accents, format du telephone ignores)"""
+    values = []
+    for field in FINGERPRINT_FIELDS:
+        value = lead.get(field)
+        if field == 'phone':
+            values.append(normalize_phone(value) or normalize_text(value))
+        else:
+            values.append(normalize_text(value))
+    return hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()[:16]
+
+
+def lead_sources(lead: dict) -> set:
+    """Sources d'un lead (fusionne ou non par la deduplication)"""
+    return {source for source in (lead.get('sources') or lead.get('source') or '').split('|') if source}
+
+
+class LeadDelta:
+    """Resultat d'un run incremental"""
+
+    def __init__(self):
+        self.new = []
+        self.changed = []
+        self.gone = []
+        self.unchanged = 0
+
+    def leads(self) -> list:
+        """Leads du delta, marques dans la colonne 'change'"""
+        delta = []
+        for change, leads in ((NEW, self.new), (CHANGED, self.changed), (GONE, self.gone)):
+            for lead in leads:
+                lead['change'] = change
+                delta.append(lead)
+        return delta
+
+    def __len__(self):
+        return len(self.new) + len(self.changed) + len(self.gone)
+
+    def summary(self) -> dict:
+        return {NEW: len(self.new), CHANGED: len(self.changed), GONE: len(self.gone), 'unchanged': self.unchanged}
+
+
+class LeadStore:
+    """Dernier etat connu de chaque lead + filigranes par ville et source"""
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS leads (
+                key TEXT PRIMARY KEY,
+                city TEXT NOT NULL,
+                sources TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                lead TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                gone_at REAL
+            )
+        """)
+        self._db.execute('CREATE INDEX IF NOT EXISTS leads_city ON leads (city)')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                city TEXT NOT NULL,
+                source TEXT NOT NULL,
+                last_run REAL NOT NULL,
+                leads INTEGER NOT NULL,
+                PRIMARY KEY (city, source)
+            )
+        """)
+        self._db.commit()
+
+    def fresh_cities(self, villes: list, sources, max_age: float, now: float = None) -> set:
+        """Villes dont toutes les sources ont ete scrapees il y a moins de `max_age` secondes"""
+        now = time.time() if now is None else now
+        sources = set(sources)
+        refreshed = {}
+        for city, source in self._db.execute(
+                'SELECT city, source FROM watermarks WHERE last_run >= ?', (now - max_age,)):
+            refreshed.setdefault(city, set()).add(source)
+        return {ville for ville in villes if sources <= refreshed.get(ville, set())}
+
+    def active_counts(self, villes: list) -> dict:
+        """{(ville, source): nombre de leads actifs} pour les villes donnees"""
+        counts = {}
+        if not villes:
+            return counts
+        placeholders = ','.join('?' * len(villes))
+        rows = self._db.execute(
+            f'SELECT city, sources FROM leads WHERE gone_at IS NULL AND city IN ({placeholders})', list(villes))
+        for city, sources in rows:
+            for source in sources.split('|'):
+                counts[(city, source)] = counts.get((city, source), 0) + 1
+        return counts
+
+    def successful_scopes(self, villes: list, sources, counts: dict) -> dict:
+        """
+        {ville: sources reussies} d'apres le nombre de leads bruts par
+        (ville, source) de ce run: 0 lead la ou le stock en avait = echec.
+        """
+        active = self.active_counts(villes)
+        scopes = {}
+        for ville in villes:
+            scopes[ville] = {
+                source for source in sources
+                if counts.get((ville, source)) or not active.get((ville, source))
+            }
+        return scopes
+
+    def record_runs(self, scopes: dict, counts: dict, now: float = None):
+        """Avance les filigranes des (ville, source) reussis"""
+        now = time.time() if now is None else now
+        self._db.executemany(
+            'INSERT OR REPLACE INTO watermarks (city, source, last_run, leads) VALUES (?, ?, ?, ?)',
+            [(ville, source, now, counts.get((ville, source), 0))
+             for ville, sources in scopes.items() for source in sources])
+        self._db.commit()
+
+    def apply(self, leads, scopes: dict, now: float = None) -> LeadDelta:
+        """
+        Compare les leads de ce run au stock et l'enregistre. Un lead absent
+        n'est "gone" que si toutes ses sources ont reussi pour sa ville.
+        """
+        now = time.time() if now is None else now
+        delta = LeadDelta()
+
+        villes = list(scopes)
+        placeholders = ','.join('?' * len(villes))
+        in_scope = []
+        known = {}
+        if villes:
+            in_scope = self._db.execute(
+                f'SELECT key, city, sources, fingerprint, gone_at FROM leads WHERE city IN ({placeholders})',
+                villes).fetchall()
+            known = {key: (fingerprint, gone_at) for key, _, _, fingerprint, gone_at in in_scope}
+
+        seen = set()
+        upserts = []
+        touches = []
+        for lead in leads:
+            key = lead_key(lead)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            fingerprint = lead_fingerprint(lead)
+            previous = known.get(key)
+            if previous is None:
+                # Peut-etre connu sous une autre ville (ville voisine rescrapee)
+                row = self._db.execute('SELECT fingerprint, gone_at FROM leads WHERE key = ?', (key,)).fetchone()
+                previous = tuple(row) if row else None
+
+            if previous is None or previous[1] is not None:
+                delta.new.append(lead)
+            elif previous[0] != fingerprint:
+                delta.changed.append(lead)
+            else:
+                delta.unchanged += 1
+                touches.append((now, '|'.join(sorted(lead_sources(lead))), key))
+                continue
+            upserts.append((key, lead.get('ville_recherche') or lead.get('city') or '',
+                            '|'.join(sorted(lead_sources(lead))), fingerprint,
+                            json.dumps(dict(lead), ensure_ascii=False), now, now))
+
+        # Leads non revus dans une ville/source rescrapee avec succes
+        gone = []
+        for key, city, sources, _, gone_at in in_scope:
+            if key in seen or gone_at is not None:
+                continue
+            if set(sources.split('|')) <= scopes.get(city, set()):
+                payload = self._db.execute('SELECT lead FROM leads WHERE key = ?', (key,)).fetchone()[0]
+                delta.gone.append(json.loads(payload))
+                gone.append((now, key))
+
+        # Conserve first_seen d'un lead deja connu
+        self._db.executemany("""
+            INSERT INTO leads (key, city, sources, fingerprint, lead, first_seen, last_seen, gone_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, NULL)
+            ON CONFLICT(key) DO UPDATE SET city = excluded.city, sources = excluded.sources,
+                fingerprint = excluded.fingerprint, lead = excluded.lead,
+                last_seen = excluded.last_seen, gone_at = NULL
+        """, upserts)
+        self._db.executemany('UPDATE leads SET last_seen = ?, sources = ? WHERE key = ?', touches)
+        self._db.executemany('UPDATE leads SET gone_at = ? WHERE key = ?', gone)
+        self._db.commit()
+        return delta
+
+    def stats(self) -> dict:
+        active, gone = self._db.execute(
+            'SELECT COUNT(*) - COUNT(gone_at), COUNT(gone_at) FROM leads').fetchone()
+        cities = self._db.execute('SELECT COUNT(DISTINCT city) FROM watermarks').fetchone()[0]
+        return {'active': active, 'gone': gone, 'cities': cities}
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Representation compacte d'un lead
+Un lead est un objet a slots (pas de dict par lead) partage par le scraper,
+l'enrichisseur, le pipeline et la campagne:
+  - champs connus en slots, champs rares (colonne 'change', ...) dans `extra`
+  - valeurs repetitives (source, priorite, ville) internees: une seule chaine
+    en memoire pour tous les leads de la meme ville
+  - scraped_at: une horodate par reponse HTTP, partagee par ses leads (batch_timestamp)
+
+Lead se manipule comme un dict (lead.get('email'), lead['score'] = 80,
+dict(lead), csv.DictWriter): un champ a None est considere absent.
+
+Usage:
+    scraped_at = batch_timestamp()
+    lead = Lead(name='Box Paris', source=SOURCE_OVERPASS, ville_recherche='Paris', scraped_at=scraped_at)
+    lead['email'] = 'contact@box.fr'
+"""
+
+import sys
+from collections.abc import MutableMapping
+from dataclasses import dataclass, fields
+from datetime import datetime
+
+# Sources des leads (valeurs de 'source')
+SOURCE_ANNUAIRE = 'annuaire_entreprises'
+SOURCE_OPENSTREETMAP = 'openstreetmap'
+SOURCE_OVERPASS = 'overpass'
+SOURCE_PAGESJAUNES = 'pagesjaunes'
+SOURCE_SOCIETE = 'societe.com'
+
+
+def batch_timestamp() -> str:
+    """Horodate partagee par tous les leads d'une meme reponse"""
+    return datetime.now().isoformat()
+
+
+@dataclass(slots=True, eq=False)
+class Lead(MutableMapping):
+    """Lead a slots, accessible comme un dict"""
+
+    name: str = None
+    email: str = None
+    phone: str = None
+    website: str = None
+    address: str = None
+    city: str = None
+    postal_code: str = None
+    siren: str = None
+    osm_id: str = None
+    lat: float = None
+    lon: float = None
+    score: int = None
+    priority: str = None
+    source: str = None
+    sources: str = None
+    ville_recherche: str = None
+    scraped_at: str = None
+    is_known_operator: bool = None
+    # Champs hors schema (crees a la demande)
+    extra: dict = None
+
+    def __post_init__(self):
+        # Deroule (appele pour chaque lead): pas de getattr/setattr en boucle
+        intern = sys.intern
+        if type(self.city) is str:
+            self.city = intern(self.city)
+        if type(self.ville_recherche) is str:
+            self.ville_recherche = intern(self.ville_recherche)
+        if type(self.source) is str:
+            self.source = intern(self.source)
+        if type(self.sources) is str:
+            self.sources = intern(self.sources)
+        if type(self.priority) is str:
+            self.priority = intern(self.priority)
+
+    @classmethod
+    def from_dict(cls, data) -> 'Lead':
+        """Lead depuis un dict (ligne CSV, JSON, Parquet): score et lat/lon convertis"""
+        lead = cls()
+        for key, value in data.items():
+            lead[key] = value
+        for field in ('score', 'lat', 'lon'):
+            value = getattr(lead, field)
+            if isinstance(value, str) and value:
+                try:
+                    setattr(lead, field, int(float(value)) if field == 'score' else float(value))
+                except ValueError:
+                    pass
+        lead.__post_init__()
+        return lead
+
+    def get(self, key, default=None):
+        if key in _SLOTS:
+            value = getattr(self, key)
+        elif self.extra is not None:
+            value = self.extra.get(key)
+        else:
+            value = None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in _SLOTS:
+            setattr(self, key, value)
+        elif self.extra is None:
+            self.extra = {key: value}
+        else:
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if self.get(key) is None:
+            raise KeyError(key)
+        if key in _SLOTS:
+            setattr(self, key, None)
+        else:
+            del self.extra[key]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        for field in FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+        if self.extra:
+            yield from (key for key, value in self.extra.items() if value is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def copy(self) -> 'Lead':
+        lead = Lead(*(getattr(self, field) for field in FIELDS))
+        if self.extra:
+            lead.extra = dict(self.extra)
+        return lead
+
+
+# Champs en slots (hors `extra`), dans l'ordre des colonnes
+FIELDS = tuple(field.name for field in fields(Lead) if field.name != 'extra')
+_SLOTS = frozenset(FIELDS)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Normalisation des champs de leads
+Fonctions partagees pour comparer des noms, telephones et adresses provenant
+de sources differentes (API Gouv en majuscules, OSM en casse libre, etc.).
+"""
+
+import re
+import unicodedata
+
+# Formes juridiques ignorees dans la comparaison des noms
+LEGAL_FORMS = {
+    'sarl', 'sas', 'sasu', 'eurl', 'sa', 'sci', 'snc', 'eirl', 'ei', 'sca', 'scs', 'selarl',
+}
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_PARENTHESES = re.compile(r'\([^)]*\)')
+
+
+def strip_accents(text: str) -> str:
+    """'Entrepôt Genève' -> 'Entrepot Geneve'"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize_text(text: str) -> str:
+    """Minuscules, sans accents, ponctuation remplacee par des espaces"""
+    if not text:
+        return ''
+    text = str(text)
+    if not text.isascii():
+        text = strip_accents(text)
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def normalize_name(name: str) -> str:
+    """Nom comparable: sans sigle entre parentheses ni forme juridique"""
+    if not name:
+        return ''
+    tokens = normalize_text(_PARENTHESES.sub(' ', str(name))).split()
+    return ' '.join(t for t in tokens if t not in LEGAL_FORMS)
+
+
+def normalize_phone(phone: str) -> str:
+    """Telephone au format national a 10 chiffres ('' si invalide)"""
+    if not phone:
+        return ''
+    digits = re.sub(r'\D', '', str(phone))
+    if digits.startswith('0033'):
+        digits = '0' + digits[4:]
+    elif digits.startswith('33') and len(digits) == 11:
+        digits = '0' + digits[2:]
+    return digits if len(digits) == 10 else ''
+
+
+def normalize_postal_code(postal_code: str) -> str:
+    """Code postal a 5 chiffres ('' si absent)"""
+    digits = re.sub(r'\D', '', str(postal_code or ''))
+    return digits.zfill(5) if 4 <= len(digits) <= 5 else ''
+
+
+def lead_key(lead: dict) -> str:
+    """
+    Identifiant stable d'un lead d'un run a l'autre ('' si impossible):
+    SIREN, sinon element OSM ('node/123'), sinon nom normalise + code postal (ou ville).
+    """
+    siren = re.sub(r'\D', '', str(lead.get('siren') or ''))
+    if len(siren) == 9:
+        return f'siren:{siren}'
+    if lead.get('osm_id'):
+        return f"osm:{lead['osm_id']}"
+    name = normalize_name(lead.get('name'))
+    if not name:
+        return ''
+    where = normalize_postal_code(lead.get('postal_code')) or normalize_text(
+        lead.get('city') or lead.get('ville_recherche'))
+    return f'name:{name}|{where}'
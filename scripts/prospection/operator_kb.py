@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Base de connaissance des operateurs de self-stockage
+Les marques connues (site, email, SIREN, alias) et les termes de recherche
+Nominatim sont dans un fichier versionne, operators.json, partage par le
+scraper et l'enrichisseur.
+
+Le fichier est charge dans des index en memoire:
+  - par marque normalisee (+ alias): nom exact d'abord, puis marque contenue
+    dans le nom via un KeywordMatcher compile
+  - par domaine (site web et champ "domains"): "https://www.homebox.fr/x" -> homebox.fr
+  - par SIREN
+Une modification du fichier est prise en compte sans redemarrer le pipeline:
+la date du fichier est verifiee au plus toutes les quelques secondes et les
+index sont reconstruits puis remplaces d'un bloc. Un fichier invalide est
+ignore (les index precedents restent en place).
+
+Format:
+    {"version": 1,
+     "storage_keywords": ["stockage", ...],
+     "search_terms": ["self stockage {ville} France", ...],
+     "operators": [{"brand": "homebox", "aliases": [...], "website": "...",
+                    "email": "...", "siren": "...", "domains": [...],
+                    "search": true}, ...]}
+("search": la marque est aussi cherchee ville par ville sur Nominatim)
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from normalize import normalize_text
+from operator_matcher import KeywordMatcher
+
+DEFAULT_KB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'operators.json')
+
+# Version de format la plus recente comprise par ce module
+SUPPORTED_VERSION = 1
+
+# Intervalle min entre deux verifications de la date du fichier
+RELOAD_CHECK_SECONDS = 2.0
+
+
+def domain_of(value: str) -> str:
+    """Domaine d'une URL, d'un hote ou d'un email, sans 'www.': 'https://www.Homebox.fr/x' -> 'homebox.fr'"""
+    value = (value or '').strip().lower()
+    if not value:
+        return ''
+    if '@' in value and '/' not in value:
+        host = value.rsplit('@', 1)[1]
+    else:
+        host = urlparse(value if '//' in value else f'//{value}').hostname or ''
+    host = host.rstrip('.')
+    return host[4:] if host.startswith('www.') else host
+
+
+def normalize_siren(value) -> str:
+    """SIREN a 9 chiffres (un SIRET est tronque), sinon ''"""
+    digits = re.sub(r'\D', '', str(value or ''))
+    return digits[:9] if len(digits) in (9, 14) else ''
+
+
+class KBIndex:
+    """Index immuables d'une version du fichier"""
+
+    def __init__(self, data: dict, signature: tuple = None):
+        version = data.get('version')
+        if not isinstance(version, int) or version > SUPPORTED_VERSION:
+            raise ValueError(f"version de base operateurs non supportee: {version!r}")
+        self.version = version
+        self.signature = signature
+
+        self.operators = []
+        self.by_brand = {}
+        self.by_domain = {}
+        self.by_siren = {}
+        names = {}
+        for entry in data.get('operators', []):
+            brand = (entry.get('brand') or '').strip()
+            if not brand:
+                raise ValueError(f"operateur sans 'brand': {entry!r}")
+            operator = {
+                'brand': brand,
+                'website': entry.get('website') or None,
+                'email': entry.get('email') or None,
+                'siren': normalize_siren(entry.get('siren')) or None,
+            }
+            self.operators.append(operator)
+
+            for name in [brand] + list(entry.get('aliases', [])):
+                names.setdefault(name, operator)
+                self.by_brand.setdefault(normalize_text(name), operator)
+            for domain in [operator['website']] + list(entry.get('domains', [])):
+                if domain_of(domain):
+                    self.by_domain.setdefault(domain_of(domain), operator)
+            if operator['siren']:
+                self.by_siren.setdefault(operator['siren'], operator)
+
+        # Marques et alias -> operateur (le nom le plus long trouve l'emporte)
+        self.matcher = KeywordMatcher(names)
+        # Filtre des resultats OSM: mots-cles generiques + marques connues
+        self.result_matcher = KeywordMatcher(list(data.get('storage_keywords', [])) + list(names))
+
+        self.search_terms = list(data.get('search_terms', []))
+        self.search_terms += [
+            f'{entry["brand"]} {{ville}}' for entry in data.get('operators', []) if entry.get('search')
+        ]
+
+    def match_name(self, name: str) -> dict:
+        """Nom egal a une marque (ou un alias), sinon marque contenue dans le nom"""
+        return self.by_brand.get(normalize_text(name)) or self.matcher.match(name)
+
+
+class OperatorKB:
+    """Base operateurs rechargee a chaud, partageable entre threads"""
+
+    def __init__(self, path: str = DEFAULT_KB_PATH, check_interval: float = RELOAD_CHECK_SECONDS):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+        self.reloads = 0
+        # Premier chargement: un fichier invalide doit faire echouer tout de suite
+        self._index = self._load()
+
+    def _signature(self) -> tuple:
+        info = os.stat(self.path)
+        return info.st_mtime_ns, info.st_size
+
+    def _load(self) -> KBIndex:
+        signature = self._signature()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return KBIndex(json.load(f), signature)
+
+    def reload(self, force: bool = False) -> bool:
+        """Recharge le fichier s'il a change (ou toujours avec force). True si recharge."""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                if not force and self._signature() == self._index.signature:
+                    return False
+                index = self._load()
+            except (OSError, ValueError) as e:
+                print(f"  [!] Base operateurs non rechargee ({self.path}): {e}")
+                return False
+            self._index = index
+            self.reloads += 1
+            return True
+
+    @property
+    def index(self) -> KBIndex:
+        """Index courant (verifie au passage si le fichier a change)"""
+        if time.monotonic() - self._checked >= self.check_interval:
+            self.reload()
+        return self._index
+
+    @property
+    def version(self) -> int:
+        return self.index.version
+
+    @property
+    def operators(self) -> list:
+        return self.index.operators
+
+    @property
+    def result_matcher(self) -> KeywordMatcher:
+        return self.index.result_matcher
+
+    def match_name(self, name: str) -> dict:
+        """Operateur dont la marque (ou un alias) apparait dans le nom"""
+        return self.index.match_name(name)
+
+    def by_domain(self, value: str) -> dict:
+        """Operateur a partir d'une URL, d'un domaine ou d'un email"""
+        return self.index.by_domain.get(domain_of(value))
+
+    def by_siren(self, siren) -> dict:
+        return self.index.by_siren.get(normalize_siren(siren))
+
+    def lookup(self, lead: dict) -> dict:
+        """Operateur d'un lead: SIREN, puis domaine du site ou de l'email, puis nom"""
+        index = self.index
+        siren = normalize_siren(lead.get('siren'))
+        if siren and siren in index.by_siren:
+            return index.by_siren[siren]
+        for field in ('website', 'email'):
+            operator = index.by_domain.get(domain_of(lead.get(field)))
+            if operator:
+                return operator
+        return index.match_name(lead.get('name', ''))
+
+    def nominatim_terms(self, ville: str) -> list:
+        """Requetes Nominatim d'une ville (termes generiques + marques cherchees)"""
+        return [term.format(ville=ville) for term in self.index.search_terms]
+
+
+_shared_kbs = {}
+_shared_lock = threading.Lock()
+
+
+def get_kb(path: str = DEFAULT_KB_PATH) -> OperatorKB:
+    """OperatorKB partagee par tous les scripts d'un meme processus (une par fichier)"""
+    path = os.path.abspath(path)
+    with _shared_lock:
+        if path not in _shared_kbs:
+            _shared_kbs[path] = OperatorKB(path)
+        return _shared_kbs[path]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Detection des operateurs et mots-cles de self-stockage
+Un seul matcher multi-motifs, construit une fois, partage par le scraper
+(filtre des resultats Nominatim) et l'enrichisseur (operateurs connus).
+Les marques et mots-cles viennent de la base operateurs (operator_kb.py).
+
+Les mots-cles et le texte sont normalises (minuscules, sans accents ni
+ponctuation): "Lok'nStore", "LOK-NSTORE" et "lok nstore" se valent.
+La recherche est une seule regex compilee: les mots-cles sont factorises en
+arbre de prefixes ("box", "box avenue", "bluebox" -> b(?:ox(?: avenue)?|luebox))
+pour que le moteur ne teste qu'une branche par caractere, et un lookahead
+teste chaque position du texte. Le mot-cle le plus long trouve l'emporte
+("box avenue" plutot que "box").
+"""
+
+import re
+
+from normalize import normalize_text
+
+
+def _trie_pattern(node: dict) -> str:
+    """Regex d'un noeud de l'arbre de prefixes ('' = fin de mot-cle)"""
+    branches = []
+    chars = []
+    for char in sorted(key for key in node if key):
+        child = node[char]
+        if len(child) == 1 and '' in child:
+            chars.append(re.escape(char))
+        else:
+            branches.append(re.escape(char) + _trie_pattern(child))
+    if chars:
+        branches.append(chars[0] if len(chars) == 1 else f"[{''.join(chars)}]")
+
+    pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    if '' in node:
+        # Suite optionnelle et gloutonne: le mot-cle le plus long d'abord
+        pattern = f'(?:{pattern})?'
+    return pattern
+
+
+def keywords_pattern(keywords) -> str:
+    """Alternation factorisee de tous les mots-cles"""
+    root = {}
+    for keyword in keywords:
+        node = root
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = True
+    return _trie_pattern(root)
+
+
+class KeywordMatcher:
+    """
+    Recherche de nombreux mots-cles en une passe. `keywords` est soit un
+    dict {mot-cle: valeur}, soit une liste (valeur = mot-cle).
+    """
+
+    def __init__(self, keywords):
+        if not isinstance(keywords, dict):
+            keywords = {keyword: keyword for keyword in keywords}
+
+        # Mot-cle normalise -> (mot-cle d'origine, valeur); le premier l'emporte
+        self._values = {}
+        for keyword, value in keywords.items():
+            normalized = normalize_text(keyword)
+            if normalized:
+                self._values.setdefault(normalized, (keyword, value))
+
+        if self._values:
+            alternation = keywords_pattern(self._values)
+            self._any = re.compile(alternation)
+            self._every = re.compile(f'(?=({alternation}))')
+        else:
+            self._any = self._every = None
+
+    def __len__(self):
+        return len(self._values)
+
+    def matches(self, text: str) -> bool:
+        """Le texte contient-il au moins un mot-cle ?"""
+        if self._any is None or not text:
+            return False
+        return self._any.search(normalize_text(text)) is not None
+
+    def search(self, text: str) -> tuple:
+        """(mot-cle, valeur) du plus long mot-cle present dans le texte, sinon None"""
+        if self._every is None or not text:
+            return None
+        best = None
+        for match in self._every.finditer(normalize_text(text)):
+            found = match.group(1)
+            if best is None or len(found) > len(best):
+                best = found
+        return self._values[best] if best is not None else None
+
+    def match(self, text: str):
+        """Valeur associee au plus long mot-cle present, sinon None"""
+        found = self.search(text)
+        return found[1] if found else None
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Pipeline de prospection en streaming
+Scraping -> deduplication -> enrichissement -> scoring -> export (-> emails)
+
+Les leads circulent un par un entre les etapes: l'enrichissement des premiers
+leads commence pendant que les villes suivantes sont encore scrapees. Les
+leads d'une ville ne sortent de la deduplication qu'une fois toutes ses
+sources terminees: ils sont exportes avec les memes champs fusionnes qu'en
+batch. Les fichiers intermediaires (leads bruts, leads enrichis) sont optionnels.
+
+Memoire: seuls les leads bruts des villes en cours sont retenus en entier.
+Le deduplicateur garde, pour chaque lead unique deja emis, ses donnees de
+comparaison (quelques Ko): la memoire croit donc avec le nombre de leads
+uniques, bien moins vite qu'en batch.
+
+Usage:
+    python pipeline.py --villes Paris,Lyon,Marseille --output leads_enrichis.csv
+    python pipeline.py --villes Paris --no-enrich --jsonl leads.jsonl
+    python pipeline.py --villes Paris,Lyon --parquet leads_enrichis.parquet
+    python pipeline.py --villes Paris,Lyon --campaign intro --dry-run
+
+Cout: 0 EUR
+"""
+
+import sys
+import io
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+import argparse
+import csv
+import json
+from collections import Counter
+
+import columnar
+import http_cache
+from scraper_self_stockage import SelfStorageScraper
+from enrichir_leads import LeadEnricher
+
+
+class CsvSink:
+    """Ecrit les leads dans un CSV au fur et a mesure"""
+
+    def __init__(self, filename: str, fieldnames: list):
+        self.filename = filename
+        self._file = open(filename, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction='ignore')
+        self._writer.writeheader()
+        self.count = 0
+
+    def write(self, lead: dict):
+        self._writer.writerow(lead)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+class JsonLinesSink:
+    """Ecrit un lead JSON par ligne (importable en streaming, contrairement a un tableau JSON)"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._file = open(filename, 'w', encoding='utf-8')
+        self.count = 0
+
+    def write(self, lead: dict):
+        self._file.write(json.dumps(dict(lead), ensure_ascii=False))
+        self._file.write('\n')
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+def enrich_stream(enricher: LeadEnricher, leads):
+    """Etape d'enrichissement: leads enrichis en parallele, ordre conserve"""
+    return enricher.iter_enriched(leads)
+
+
+def tee_to_sinks(leads, sinks: list, stats: Counter):
+    """Ecrit chaque lead dans les sinks et compte les priorites, sans re-parcourir"""
+    for lead in leads:
+        for sink in sinks:
+            sink.write(lead)
+        stats['total'] += 1
+        stats[lead.get('priority', 'cold')] += 1
+        if lead.get('email'):
+            stats['with_email'] += 1
+        if lead.get('website'):
+            stats['with_website'] += 1
+        yield lead
+
+
+def qualified_for_campaign(leads, min_score: int = 50, limit: int = None):
+    """
+    Filtre du script email: email valide et score >= min_score.
+    Une fois la limite atteinte, le flux continue (pour l'export) sans emails.
+    """
+    count = 0
+    for lead in leads:
+        if limit is not None and count >= limit:
+            continue
+        if lead.get('email') and '@' in lead['email'] and int(lead.get('score', 0)) >= min_score:
+            count += 1
+            yield lead
+
+
+def run_pipeline(villes: list, scraper: SelfStorageScraper, enricher: LeadEnricher = None,
+                 sinks: list = None, campaign=None, template: str = 'intro',
+                 dry_run: bool = True, limit: int = None) -> Counter:
+    """Branche les etapes entre elles et consomme le flux; retourne les compteurs"""
+    stats = Counter()
+
+    # Leads emis ville par ville, une fois tous leurs doublons fusionnes
+    leads = scraper.iter_unique(scraper.stream_all(villes, scope_marks=True))
+    if enricher is not None:
+        leads = enrich_stream(enricher, leads)
+    leads = tee_to_sinks(leads, sinks or [], stats)
+
+    if campaign is not None:
+        campaign.run_campaign(qualified_for_campaign(leads, limit=limit), template, dry_run=dry_run)
+
+    # Consommer la fin du flux (export) meme si la campagne s'est arretee avant
+    for _ in leads:
+        pass
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipeline de prospection en streaming')
+    parser.add_argument('--villes', type=str, default='Paris,Lyon,Marseille,Toulouse,Bordeaux',
+                        help='Villes a scraper (separees par des virgules)')
+    parser.add_argument('--output', type=str, help='CSV de sortie (optionnel)')
+    parser.add_argument('--jsonl', type=str, help='Export JSON Lines (optionnel)')
+    parser.add_argument('--parquet', type=str, help='Export Parquet, un row group par lot (necessite pyarrow)')
+    parser.add_argument('--no-enrich', action='store_true', help='Sauter l\'enrichissement')
+    parser.add_argument('--concurrency', type=int, default=2,
+                        help='Nombre de villes scrapees en parallele par source')
+    parser.add_argument('--enrich-concurrency', type=int, default=4,
+                        help='Leads enrichis en parallele')
+    parser.add_argument('--overpass-batch', action='store_true',
+                        help='Overpass: une requete par groupe de villes')
+    parser.add_argument('--campaign', type=str, help='Template email a envoyer en fin de pipeline')
+    parser.add_argument('--dry-run', action='store_true', help='Campagne email sans envoi')
+    parser.add_argument('--limit', type=int, default=300, help='Nombre max d\'emails a envoyer')
+    parser.add_argument('--cache', type=str, default=http_cache.DEFAULT_CACHE_PATH,
+                        help='Fichier SQLite du cache HTTP')
+    parser.add_argument('--no-cache', action='store_true', help='Desactiver le cache HTTP')
+
+    args = parser.parse_args()
+
+    villes = [v.strip() for v in args.villes.split(',')]
+    if args.parquet and not columnar.available():
+        print("[!] --parquet necessite pyarrow (pip install pyarrow)")
+        return
+
+    print("=" * 50)
+    print("BoxiBox - Pipeline de Prospection (streaming)")
+    print("=" * 50)
+    print(f"Villes: {', '.join(villes)}")
+
+    cache = None if args.no_cache else http_cache.ResponseCache(args.cache)
+    scraper = SelfStorageScraper(concurrency=args.concurrency, cache=cache,
+                                 overpass_batch=args.overpass_batch)
+    enricher = None if args.no_enrich else LeadEnricher(cache=cache, concurrency=args.enrich_concurrency)
+
+    fieldnames = SelfStorageScraper.EXPORT_FIELDS if args.no_enrich else LeadEnricher.EXPORT_FIELDS
+    sinks = []
+    if args.output:
+        sinks.append(CsvSink(args.output, fieldnames))
+    if args.jsonl:
+        sinks.append(JsonLinesSink(args.jsonl))
+    if args.parquet:
+        sinks.append(columnar.ParquetSink(args.parquet))
+
+    campaign = None
+    if args.campaign:
+        # Import tardif: le module email n'est utile qu'avec --campaign
+        from email_campaign import EmailCampaign, SMTP_CONFIG
+        from campaign_ledger import CampaignLedger
+        from send_policy import SendPolicy
+        campaign = EmailCampaign(SMTP_CONFIG, policy=SendPolicy(daily_cap=args.limit),
+                                 ledger=CampaignLedger())
+
+    try:
+        stats = run_pipeline(villes, scraper, enricher, sinks, campaign=campaign,
+                             template=args.campaign, dry_run=args.dry_run, limit=args.limit)
+    finally:
+        for sink in sinks:
+            sink.close()
+
+    print(f"\nResultat:")
+    print(f"  Total leads uniques: {stats['total']}")
+    print(f"  HOT (score >= 70):   {stats['hot']}")
+    print(f"  WARM (score 50-69):  {stats['warm']}")
+    print(f"  COLD (score < 50):   {stats['cold']}")
+    print(f"  Avec email:          {stats['with_email']}")
+    print(f"  Avec site web:       {stats['with_website']}")
+    for sink in sinks:
+        print(f"  [OK] {sink.count} leads exportes vers {sink.filename}")
+    if cache:
+        cache_stats = cache.stats()
+        print(f"  Cache HTTP:          {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Rate limiting par hote (token bucket)
+Composant partage par le scraper, l'enrichisseur et l'envoi vers l'API BoxiBox.
+
+Chaque hote a son propre budget (jetons par seconde + burst). On n'attend que
+le temps encore du: si la requete precedente a deja pris plus longtemps que la
+limite, la suivante part immediatement. Les reponses 429 (et 503 avec
+Retry-After) bloquent l'hote pendant la duree demandee puis sont rejouees.
+
+Usage:
+    session = requests.Session()
+    rate_limiter.mount(session)
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+
+# Limites par hote: (jetons par seconde, burst)
+HOST_LIMITS = {
+    'nominatim.openstreetmap.org': (1.0, 1),        # Politique d'usage OSM: 1 req/s max
+    'overpass-api.de': (0.5, 1),
+    'recherche-entreprises.api.gouv.fr': (7.0, 7),  # 7 req/s max
+    'api.duckduckgo.com': (2.0, 2),
+    'api.pappers.fr': (2.0, 1),
+    'www.pagesjaunes.fr': (0.5, 1),
+    'www.societe.com': (0.5, 1),
+}
+
+# Hotes inconnus (dont l'API BoxiBox: throttle:60,1 = 1 req/s)
+DEFAULT_LIMIT = (1.0, 1)
+
+# Attente par defaut sur un 429 sans Retry-After (doublee a chaque essai)
+DEFAULT_BACKOFF = 2.0
+
+
+class TokenBucket:
+    """Token bucket thread-safe: reserve un jeton et indique l'attente restante"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self) -> float:
+        """Reserve un jeton et retourne le delai (secondes) avant de pouvoir l'utiliser"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            ready_at = self._updated + max(0.0, -self._tokens) / self.rate
+            return max(0.0, ready_at - now)
+
+    def acquire(self) -> float:
+        """Attend un jeton; retourne le temps effectivement attendu"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def penalize(self, seconds: float):
+        """Bloque le bucket pendant `seconds` (Retry-After, 429)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Un seul jeton disponible a la levee du blocage, les reservations
+            # en cours sont decalees d'autant
+            self._tokens = min(self._tokens, 1.0)
+            self._updated = max(self._updated, now + seconds)
+
+
+class RateLimiter:
+    """Un token bucket par hote, configure via HOST_LIMITS"""
+
+    def __init__(self, limits: dict = None, default: tuple = DEFAULT_LIMIT):
+        self.limits = dict(HOST_LIMITS if limits is None else limits)
+        self.default = default
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+        # Compteurs
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self.limits.get(host, self.default)
+                bucket = self._buckets[host] = TokenBucket(rate, burst)
+            return bucket
+
+    def configure(self, host: str, rate: float, burst: int = 1):
+        """Fixe (ou change) la limite d'un hote"""
+        with self._lock:
+            self.limits[host] = (rate, burst)
+            self._buckets.pop(host, None)
+
+    def wait(self, url: str) -> float:
+        """Attend le prochain jeton disponible pour l'hote de l'URL"""
+        waited = self.bucket(urlparse(url).hostname or '').acquire()
+        with self._lock:
+            self.requests += 1
+            self.waited += waited
+        return waited
+
+    def penalize(self, url: str, seconds: float):
+        self.bucket(urlparse(url).hostname or '').penalize(seconds)
+        with self._lock:
+            self.throttled += 1
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'waited_seconds': round(self.waited, 2),
+        }
+
+
+def parse_retry_after(value: str) -> float:
+    """Retry-After en secondes ou en date HTTP; None si absent/invalide"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """Adapter requests qui applique le RateLimiter avant chaque envoi"""
+
+    def __init__(self, limiter: RateLimiter, max_throttle_retries: int = 3, **kwargs):
+        self.limiter = limiter
+        self.max_throttle_retries = max_throttle_retries
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        for attempt in range(self.max_throttle_retries + 1):
+            self.limiter.wait(request.url)
+            response = super().send(request, **kwargs)
+
+            if response.status_code not in (429, 503):
+                return response
+
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+            if delay is None:
+                if response.status_code == 503:
+                    return response
+                delay = DEFAULT_BACKOFF * (2 ** attempt)
+
+            self.limiter.penalize(request.url, delay)
+            if attempt == self.max_throttle_retries:
+                return response
+            response.close()
+
+        return response
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter:
+    """RateLimiter partage par tous les scripts d'un meme processus"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
+
+
+def mount(session, limiter: RateLimiter = None, pool_maxsize: int = 10,
+          max_throttle_retries: int = 3) -> RateLimiter:
+    """
+    Branche le rate limiting sur une requests.Session.
+    max_throttle_retries=0: un 429 bloque l'hote (Retry-After) mais n'est pas
+    rejoue, pour un appelant qui gere lui-meme ses reessais.
+    """
+    limiter = limiter or get_limiter()
+    adapter = RateLimitedAdapter(limiter, max_throttle_retries=max_throttle_retries, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return limiter
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Scoring des leads
+Regles declarees comme donnees et partagees par le scraper et l'enrichisseur.
+
+score_batch() calcule en une seule passe vectorisee (NumPy si installe) les
+scores, priorites et compteurs d'un lot de leads: masques de presence par
+champ -> produit matriciel par les poids -> seuils de priorite -> histogrammes.
+Sans NumPy, le meme calcul est fait en Python pur, toujours en une passe.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel
+    np = None
+
+SCORE_BASE = 40
+SCORE_MAX = 100
+
+# Points ajoutes quand le champ est renseigne
+SCRAPER_WEIGHTS = {
+    'phone': 20,
+    'website': 20,
+    'email': 15,
+    'address': 5,
+}
+
+# Apres enrichissement, un SIREN connu rapporte 5 points de plus
+ENRICHED_WEIGHTS = dict(SCRAPER_WEIGHTS, siren=5)
+
+# Score minimum de chaque priorite, du plus haut au plus bas
+PRIORITY_THRESHOLDS = (
+    ('hot', 70),
+    ('warm', 50),
+    ('cold', 0),
+)
+
+# Largeur des tranches de l'histogramme des scores
+HISTOGRAM_BIN = 10
+
+
+class LeadScorer:
+    """Applique une grille de poids a un lead ou a un lot de leads"""
+
+    def __init__(self, weights: dict = SCRAPER_WEIGHTS, base: int = SCORE_BASE,
+                 maximum: int = SCORE_MAX, thresholds: tuple = PRIORITY_THRESHOLDS):
+        self.fields = list(weights)
+        self.weights = [weights[f] for f in self.fields]
+        self.base = base
+        self.maximum = maximum
+        self.thresholds = thresholds
+
+    def score(self, lead: dict) -> int:
+        score = self.base + sum(w for f, w in zip(self.fields, self.weights) if lead.get(f))
+        return min(score, self.maximum)
+
+    def priority(self, score: int) -> str:
+        for name, minimum in self.thresholds:
+            if score >= minimum:
+                return name
+        return self.thresholds[-1][0]
+
+    def score_lead(self, lead: dict) -> dict:
+        """Score et priorite d'un seul lead (mode streaming)"""
+        lead['score'] = self.score(lead)
+        lead['priority'] = self.priority(lead['score'])
+        return lead
+
+    def score_batch(self, leads: list) -> dict:
+        """
+        Score tout un lot en une passe et renseigne 'score'/'priority' sur
+        chaque lead. Retourne le resume: total, compte par priorite,
+        nombre de leads avec chaque champ, histogramme des scores.
+        """
+        if np is not None and leads:
+            return self._score_batch_numpy(leads)
+        return self._score_batch_python(leads)
+
+    def _summary(self, total: int, priority_counts: list, field_counts: list, histogram: list) -> dict:
+        summary = {'total': total, 'histogram': histogram}
+        for (name, _), count in zip(self.thresholds, priority_counts):
+            summary[name] = count
+        for field, count in zip(self.fields, field_counts):
+            summary[f'with_{field}'] = count
+        return summary
+
+    def _score_batch_numpy(self, leads: list) -> dict:
+        n = len(leads)
+        # Masques de presence en colonnes: une ligne par champ
+        masks = np.empty((len(self.fields), n), dtype=np.bool_)
+        for row, field in enumerate(self.fields):
+            masks[row] = np.fromiter((bool(lead.get(field)) for lead in leads), dtype=np.bool_, count=n)
+
+        scores = np.minimum(self.base + np.asarray(self.weights, dtype=np.int64) @ masks, self.maximum)
+
+        # Indice de priorite: nombre de seuils (du plus haut) non atteints
+        minimums = np.asarray([minimum for _, minimum in self.thresholds], dtype=np.int64)
+        levels = np.minimum((scores[:, None] < minimums[None, :]).sum(axis=1), len(minimums) - 1)
+        names = [name for name, _ in self.thresholds]
+
+        for lead, score, level in zip(leads, scores.tolist(), levels.tolist()):
+            lead['score'] = score
+            lead['priority'] = names[level]
+
+        histogram = np.bincount(scores // HISTOGRAM_BIN, minlength=self.maximum // HISTOGRAM_BIN + 1)
+        return self._summary(
+            n,
+            np.bincount(levels, minlength=len(names)).tolist(),
+            masks.sum(axis=1).tolist(),
+            histogram.tolist(),
+        )
+
+    def _score_batch_python(self, leads: list) -> dict:
+        priority_counts = [0] * len(self.thresholds)
+        field_counts = [0] * len(self.fields)
+        histogram = [0] * (self.maximum // HISTOGRAM_BIN + 1)
+        names = [name for name, _ in self.thresholds]
+
+        for lead in leads:
+            score = self.base
+            for i, (field, weight) in enumerate(zip(self.fields, self.weights)):
+                if lead.get(field):
+                    score += weight
+                    field_counts[i] += 1
+            score = min(score, self.maximum)
+            priority = self.priority(score)
+
+            lead['score'] = score
+            lead['priority'] = priority
+            priority_counts[names.index(priority)] += 1
+            histogram[score // HISTOGRAM_BIN] += 1
+
+        return self._summary(len(leads), priority_counts, field_counts, histogram)
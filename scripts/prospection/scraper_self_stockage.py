@@ -6,6 +6,7 @@ Scrape les Pages Jaunes et autres sources gratuites pour trouver des prospects.
 
 Usage:
     python scraper_self_stockage.py --villes Paris,Lyon,Marseille --output leads.csv
+    python scraper_self_stockage.py --villes Paris,Lyon --format parquet --output leads.parquet
 
 Cout: 0 EUR
 """
@@ -19,16 +20,34 @@ if sys.platform == 'win32':
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 import requests
-from bs4 import BeautifulSoup
 import csv
 import json
-import time
+import math
+import queue
+import threading
 import re
 import argparse
-from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote_plus
 import random
 
+import columnar
+import html_parsing
+import http_cache
+import http_replay
+import rate_limiter
+from boxibox_client import (BoxiBoxClient, DEFAULT_CHUNK_SIZE, DEFAULT_CONCURRENCY,
+                            CREATED, DUPLICATE, INVALID, ERROR, SKIPPED)
+from crm_sync import DEFAULT_SYNC_PATH, SyncStore, sync_leads
+from dedup import LeadDeduplicator
+from geo import GeoIndex, count_by_departement
+from lead_store import DEFAULT_REFRESH_HOURS, DEFAULT_STORE_PATH, LeadDelta, LeadStore
+from leads import (Lead, batch_timestamp, SOURCE_ANNUAIRE, SOURCE_OPENSTREETMAP, SOURCE_OVERPASS,
+                   SOURCE_PAGESJAUNES, SOURCE_SOCIETE)
+from operator_kb import get_kb
+from scoring import LeadScorer, SCRAPER_WEIGHTS
+
 # User agents pour éviter le blocage
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -36,10 +55,105 @@ USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
 ]
 
+ANNUAIRE_URL = "https://recherche-entreprises.api.gouv.fr/search"
+ANNUAIRE_PER_PAGE = 25  # Maximum accepte par l'API
+ANNUAIRE_MAX_PAGES = 400  # L'API refuse au-dela de 10 000 resultats
+
+# Taille de la file entre les workers de scraping et le pipeline
+STREAM_QUEUE_SIZE = 500
+
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+OVERPASS_RADIUS_KM = 30
+OVERPASS_NAME_REGEX = "stockage|storage|garde-meuble|box"
+# Cote max (km) d'une tuile du mode batch Overpass: deux zones de recherche cote a cote
+OVERPASS_TILE_MAX_KM = 4 * OVERPASS_RADIUS_KM
+
+# Pages de resultats HTML: selecteur des blocs + selecteur de chaque champ
+PAGESJAUNES_LISTING = '.bi-bloc, .pj-list-item, [data-pjblock]'
+PAGESJAUNES_FIELDS = {
+    'name': '.bi-denomination, .denomination-link, h3 a, .company-name',
+    'address': '.bi-address, .address, .adresse',
+    'phone': '.bi-phone, .phone, .tel, [href^="tel:"]',
+    'website': 'a[href*="http"]:not([href*="pagesjaunes"])',
+}
+SOCIETE_LISTING = '.ResultSociete, .company-item'
+SOCIETE_FIELDS = {
+    'name': 'a.txt-no-style, .company-name',
+}
+SOCIETE_MAX_RESULTS = 20
+
+
+class ScopeComplete:
+    """Marque de stream_all(scope_marks=True): toutes les sources de la ville ont termine"""
+
+    __slots__ = ('ville',)
+
+    def __init__(self, ville: str):
+        self.ville = ville
+
+    def __repr__(self):
+        return f'ScopeComplete({self.ville!r})'
+
+
+def osm_element_id(osm_type: str, osm_id) -> str:
+    """Identifiant stable d'un element OSM: 'node/123' ('' si inconnu)"""
+    if not osm_type or not osm_id:
+        return ''
+    return f'{osm_type}/{osm_id}'
+
+
 class SelfStorageScraper:
-    def __init__(self):
-        self.session = requests.Session()
+    # Sources interrogees pour chaque ville (dans l'ordre)
+    SOURCES = (
+        'scrape_annuaire_entreprises',  # API Gouvernementale (la plus fiable)
+        'scrape_google_maps_export',    # OpenStreetMap Nominatim (marques connues)
+        'scrape_overpass_api',          # Overpass API (POI)
+    )
+
+    # Valeur du champ 'source' des leads de chaque source (filigranes du mode incremental)
+    SOURCE_LABELS = {
+        'scrape_annuaire_entreprises': SOURCE_ANNUAIRE,
+        'scrape_google_maps_export': SOURCE_OPENSTREETMAP,
+        'scrape_overpass_api': SOURCE_OVERPASS,
+    }
+
+    # Colonnes du CSV exporte
+    EXPORT_FIELDS = ['name', 'email', 'phone', 'website', 'address', 'score', 'priority', 'source', 'ville_recherche', 'scraped_at']
+
+    # Variantes generateur des sources (streaming lead par lead)
+    STREAMING_SOURCES = {
+        'scrape_annuaire_entreprises': 'iter_annuaire_entreprises',
+    }
+
+    def __init__(self, concurrency: int = 1, cache: http_cache.ResponseCache = None,
+                 overpass_batch: bool = False, html_backend: str = None):
+        self.concurrency = max(1, concurrency)
+        # Overpass: une requete par tuile de villes au lieu d'une par ville
+        self.overpass_batch = overpass_batch
+        # Cache HTTP persistant (None = desactive)
+        self.cache = cache
+        self.session = http_cache.CachedSession(cache)
+        # Rate limit par hote + pool de connexions assez grand pour tous les workers
+        self.rate_limiter = rate_limiter.mount(
+            self.session, pool_maxsize=max(10, self.concurrency * len(self.SOURCES))
+        )
         self.leads = []
+        self.dedup = None
+        self.scorer = LeadScorer(SCRAPER_WEIGHTS)
+        # Resume du dernier scoring batch (compteurs par priorite, histogramme)
+        self.score_summary = None
+        # Marques et termes de recherche (operators.json, recharge a chaud)
+        self.kb = get_kb()
+        # Parseurs HTML: backend et selecteurs prepares une fois pour le run
+        self.pagesjaunes_parser = html_parsing.ListingParser(PAGESJAUNES_LISTING, PAGESJAUNES_FIELDS, html_backend)
+        self.societe_parser = html_parsing.ListingParser(SOCIETE_LISTING, SOCIETE_FIELDS, html_backend)
+
+    @property
+    def city_sources(self) -> tuple:
+        """Sources interrogees ville par ville (sans Overpass en mode batch)"""
+        if self.overpass_batch:
+            return tuple(s for s in self.SOURCES if s != 'scrape_overpass_api')
+        return self.SOURCES
 
     def get_headers(self):
         return {
@@ -60,18 +174,7 @@ class SelfStorageScraper:
             response = self.session.get(base_url, headers=self.get_headers(), timeout=15)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Trouver tous les résultats
-            listings = soup.select('.bi-bloc, .pj-list-item, [data-pjblock]')
-
-            for listing in listings:
-                try:
-                    lead = self._parse_pagesjaunes_listing(listing, ville)
-                    if lead and lead.get('name'):
-                        leads.append(lead)
-                except Exception as e:
-                    continue
+            leads = self.parse_pagesjaunes(response.text, ville)
 
             print(f"    ✓ {len(leads)} résultats trouvés")
 
@@ -80,35 +183,45 @@ class SelfStorageScraper:
 
         return leads
 
-    def _parse_pagesjaunes_listing(self, listing, ville: str) -> dict:
+    def parse_pagesjaunes(self, html: str, ville: str) -> list:
+        """Leads d'une page de resultats Pages Jaunes"""
+        leads = []
+        scraped_at = batch_timestamp()
+        for listing in self.pagesjaunes_parser.listings(html):
+            try:
+                lead = self._parse_pagesjaunes_listing(listing, ville, scraped_at)
+                if lead and lead.get('name'):
+                    leads.append(lead)
+            except Exception as e:
+                continue
+        return leads
+
+    def _parse_pagesjaunes_listing(self, listing, ville: str, scraped_at: str = None) -> Lead:
         """Parse un listing Pages Jaunes"""
-        lead = {
-            'source': 'pagesjaunes',
-            'ville_recherche': ville,
-            'scraped_at': datetime.now().isoformat(),
-        }
+        parser = self.pagesjaunes_parser
+        lead = Lead(source=SOURCE_PAGESJAUNES, ville_recherche=ville, scraped_at=scraped_at or batch_timestamp())
 
         # Nom de l'entreprise
-        name_el = listing.select_one('.bi-denomination, .denomination-link, h3 a, .company-name')
+        name_el = parser.first(listing, 'name')
         if name_el:
-            lead['name'] = name_el.get_text(strip=True)
+            lead['name'] = parser.text(name_el)
 
         # Adresse
-        addr_el = listing.select_one('.bi-address, .address, .adresse')
+        addr_el = parser.first(listing, 'address')
         if addr_el:
-            lead['address'] = addr_el.get_text(strip=True)
+            lead['address'] = parser.text(addr_el)
 
         # Téléphone
-        phone_el = listing.select_one('.bi-phone, .phone, .tel, [href^="tel:"]')
+        phone_el = parser.first(listing, 'phone')
         if phone_el:
-            phone = phone_el.get('href', '') or phone_el.get_text(strip=True)
+            phone = parser.attr(phone_el, 'href') or parser.text(phone_el)
             phone = re.sub(r'[^\d+]', '', phone.replace('tel:', ''))
             lead['phone'] = phone
 
         # Site web
-        website_el = listing.select_one('a[href*="http"]:not([href*="pagesjaunes"])')
+        website_el = parser.first(listing, 'website')
         if website_el:
-            lead['website'] = website_el.get('href')
+            lead['website'] = parser.attr(website_el, 'href')
 
         return lead
 
@@ -122,19 +235,11 @@ class SelfStorageScraper:
         print(f"  [OSM] Recherche OpenStreetMap: {ville}...")
 
         # Recherche via Nominatim (gratuit, 1 req/sec)
-        search_terms = [
-            f'self stockage {ville} France',
-            f'garde meuble {ville} France',
-            f'box stockage {ville} France',
-            f'shurgard {ville}',
-            f'une piece en plus {ville}',
-            f'homebox {ville}',
-            f'annexx {ville}',
-            f'a ta box {ville}',
-            f'jestocke {ville}',
-            f'lok\'nstore {ville}',
-        ]
+        search_terms = self.kb.nominatim_terms(ville)
+        # Filtre des resultats: mots-cles generiques + marques connues
+        result_matcher = self.kb.result_matcher
 
+        # Le rate limit Nominatim (1 req/s) est applique par la session
         for term in search_terms:
             url = f"https://nominatim.openstreetmap.org/search"
             params = {
@@ -146,12 +251,12 @@ class SelfStorageScraper:
             }
 
             try:
-                time.sleep(1.2)  # Rate limit Nominatim
                 response = self.session.get(url, params=params, headers={
                     'User-Agent': 'BoxiBox-Prospection/1.0 (contact@boxibox.fr)'
                 }, timeout=10)
 
                 data = response.json()
+                scraped_at = batch_timestamp()
 
                 for item in data:
                     display = item.get('display_name', '').lower()
@@ -159,69 +264,162 @@ class SelfStorageScraper:
                     item_class = item.get('class', '').lower()
 
                     # Filtrer les résultats pertinents
-                    keywords = ['stockage', 'storage', 'garde', 'box', 'entrepos', 'shurgard', 'homebox', 'annexx', 'jestocke']
-                    if any(kw in display or kw in item_type for kw in keywords):
-                        leads.append({
-                            'name': item.get('display_name', '').split(',')[0].strip(),
-                            'address': item.get('display_name'),
-                            'city': item.get('address', {}).get('city') or item.get('address', {}).get('town') or ville,
-                            'postal_code': item.get('address', {}).get('postcode', ''),
-                            'lat': item.get('lat'),
-                            'lon': item.get('lon'),
-                            'source': 'openstreetmap',
-                            'ville_recherche': ville,
-                            'scraped_at': datetime.now().isoformat(),
-                        })
+                    if result_matcher.matches(display) or result_matcher.matches(item_type):
+                        leads.append(Lead(
+                            name=item.get('display_name', '').split(',')[0].strip(),
+                            address=item.get('display_name'),
+                            city=item.get('address', {}).get('city') or item.get('address', {}).get('town') or ville,
+                            postal_code=item.get('address', {}).get('postcode', ''),
+                            lat=item.get('lat'),
+                            lon=item.get('lon'),
+                            osm_id=osm_element_id(item.get('osm_type'), item.get('osm_id')),
+                            source=SOURCE_OPENSTREETMAP,
+                            ville_recherche=ville,
+                            scraped_at=scraped_at,
+                        ))
 
             except Exception as e:
                 print(f"    [!] Erreur: {str(e)[:40]}")
 
-        print(f"    [OK] {len(leads)} resultats OSM")
+        print(f"    [OK] {len(leads)} resultats OSM ({ville})")
         return leads
 
-    def scrape_annuaire_entreprises(self, ville: str) -> list:
+    def _fetch_annuaire_page(self, ville: str, page: int) -> dict:
+        """Recupere une page de resultats de l'API recherche-entreprises"""
+        params = {
+            'q': f'stockage {ville}',
+            'activite_principale': '52.10B',  # Code NAF entreposage
+            'page': page,
+            'per_page': ANNUAIRE_PER_PAGE,
+        }
+        response = self.session.get(ANNUAIRE_URL, params=params, timeout=15)
+        return response.json()
+
+    def iter_annuaire_entreprises(self, ville: str):
         """
-        Scrape l'annuaire-entreprises.data.gouv.fr (API gratuite officielle)
-        Code NAF 5210B = Entreposage et stockage non frigorifique
+        Parcourt toutes les pages de l'annuaire-entreprises et yield chaque lead
+        des qu'il est parse. La page N+1 est telechargee pendant le parsing de
+        la page N; arret des qu'une page n'apporte aucun nouveau SIREN.
         """
-        leads = []
         print(f"  [GOUV] Recherche annuaire-entreprises.data.gouv.fr: {ville}...")
 
-        try:
-            # Recherche par activite et localisation
-            url = "https://recherche-entreprises.api.gouv.fr/search"
-            params = {
-                'q': f'stockage {ville}',
-                'activite_principale': '52.10B',  # Code NAF entreposage
-                'page': 1,
-                'per_page': 25,
-            }
+        count = 0
+        page = 1
+        seen_sirens = set()
 
-            response = self.session.get(url, params=params, timeout=15)
-            data = response.json()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='annuaire-prefetch') as prefetcher:
+            pending = prefetcher.submit(self._fetch_annuaire_page, ville, page)
 
-            for result in data.get('results', []):
-                siege = result.get('siege', {})
-                name = result.get('nom_complet', result.get('nom_raison_sociale', ''))
+            while pending is not None:
+                try:
+                    data = pending.result()
+                except Exception as e:
+                    print(f"    [!] Erreur API Gouv (page {page}): {str(e)[:40]}")
+                    break
+
+                total_pages = min(data.get('total_pages') or 1, ANNUAIRE_MAX_PAGES)
+                pending = None
+                if page < total_pages:
+                    pending = prefetcher.submit(self._fetch_annuaire_page, ville, page + 1)
+
+                new_sirens = 0
+                scraped_at = batch_timestamp()
+                for result in data.get('results', []):
+                    siren = result.get('siren', '')
+                    if siren:
+                        if siren in seen_sirens:
+                            continue
+                        seen_sirens.add(siren)
+                        new_sirens += 1
+
+                    siege = result.get('siege', {})
+                    name = result.get('nom_complet', result.get('nom_raison_sociale', ''))
+
+                    if name:
+                        count += 1
+                        yield Lead(
+                            name=name,
+                            address=f"{siege.get('numero_voie', '')} {siege.get('type_voie', '')} {siege.get('libelle_voie', '')}, {siege.get('code_postal', '')} {siege.get('libelle_commune', '')}".strip(),
+                            city=siege.get('libelle_commune', ville),
+                            postal_code=siege.get('code_postal', ''),
+                            siren=siren,
+                            source=SOURCE_ANNUAIRE,
+                            ville_recherche=ville,
+                            scraped_at=scraped_at,
+                        )
+
+                if not new_sirens:
+                    if pending is not None:
+                        pending.cancel()
+                    break
+                page += 1
+
+        print(f"    [OK] {count} entreprises trouvees (API Gouv, {ville}, {page} page(s))")
 
-                if name:
-                    leads.append({
-                        'name': name,
-                        'address': f"{siege.get('numero_voie', '')} {siege.get('type_voie', '')} {siege.get('libelle_voie', '')}, {siege.get('code_postal', '')} {siege.get('libelle_commune', '')}".strip(),
-                        'city': siege.get('libelle_commune', ville),
-                        'postal_code': siege.get('code_postal', ''),
-                        'siren': result.get('siren', ''),
-                        'source': 'annuaire_entreprises',
-                        'ville_recherche': ville,
-                        'scraped_at': datetime.now().isoformat(),
-                    })
+    def scrape_annuaire_entreprises(self, ville: str) -> list:
+        """
+        Scrape l'annuaire-entreprises.data.gouv.fr (API gratuite officielle)
+        Code NAF 5210B = Entreposage et stockage non frigorifique
+        """
+        return list(self.iter_annuaire_entreprises(ville))
+
+    def geocode_city(self, ville: str) -> tuple:
+        """Coordonnees (lat, lon) d'une ville via Nominatim, None si introuvable"""
+        geo_url = "https://nominatim.openstreetmap.org/search"
+        geo_response = self.session.get(geo_url, params={
+            'q': f'{ville}, France',
+            'format': 'json',
+            'limit': 1
+        }, headers={'User-Agent': 'BoxiBox-Prospection/1.0'}, timeout=10,
+            cache_ttl=http_cache.GEOCODE_TTL)
+
+        geo_data = geo_response.json()
+        if not geo_data:
+            return None
 
-            print(f"    [OK] {len(leads)} entreprises trouvees (API Gouv)")
+        return float(geo_data[0]['lat']), float(geo_data[0]['lon'])
 
-        except Exception as e:
-            print(f"    [!] Erreur API Gouv: {str(e)[:40]}")
+    def _parse_overpass_element(self, element: dict, ville: str, scraped_at: str = None) -> Lead:
+        """Convertit un element Overpass en lead (None si sans nom)"""
+        tags = element.get('tags', {})
+        name = tags.get('name', '')
+        if not name:
+            return None
 
-        return leads
+        # Coordonnees: soit directement, soit depuis 'center' pour les ways
+        elem_lat = element.get('lat') or element.get('center', {}).get('lat')
+        elem_lon = element.get('lon') or element.get('center', {}).get('lon')
+
+        return Lead(
+            name=name,
+            address=f"{tags.get('addr:housenumber', '')} {tags.get('addr:street', '')}, {tags.get('addr:postcode', '')} {tags.get('addr:city', ville)}".strip().strip(',').strip(),
+            city=tags.get('addr:city', ville),
+            postal_code=tags.get('addr:postcode', ''),
+            phone=tags.get('phone', tags.get('contact:phone', '')),
+            website=tags.get('website', tags.get('contact:website', '')),
+            email=tags.get('email', tags.get('contact:email', '')),
+            lat=elem_lat,
+            lon=elem_lon,
+            osm_id=osm_element_id(element.get('type'), element.get('id')),
+            source=SOURCE_OVERPASS,
+            ville_recherche=ville,
+            scraped_at=scraped_at or batch_timestamp(),
+        )
+
+    def _post_overpass(self, query: str, timeout: int = 45) -> dict:
+        """Envoie une requete Overpass; None si le serveur repond une erreur"""
+        response = self.session.post(
+            OVERPASS_URL,
+            data={'data': query},
+            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+            timeout=timeout
+        )
+
+        if response.status_code != 200:
+            print(f"    [!] Overpass HTTP {response.status_code}")
+            return None
+
+        return response.json()
 
     def scrape_overpass_api(self, ville: str) -> list:
         """
@@ -233,79 +431,42 @@ class SelfStorageScraper:
 
         # D'abord, obtenir les coordonnees de la ville
         try:
-            time.sleep(1)
-            geo_url = "https://nominatim.openstreetmap.org/search"
-            geo_response = self.session.get(geo_url, params={
-                'q': f'{ville}, France',
-                'format': 'json',
-                'limit': 1
-            }, headers={'User-Agent': 'BoxiBox-Prospection/1.0'}, timeout=10)
-
-            geo_data = geo_response.json()
-            if not geo_data:
+            coords = self.geocode_city(ville)
+            if not coords:
                 print(f"    [!] Coordonnees non trouvees pour {ville}")
                 return leads
 
-            lat = float(geo_data[0]['lat'])
-            lon = float(geo_data[0]['lon'])
+            lat, lon = coords
             print(f"    Coordonnees: {lat}, {lon}")
 
             # Requete Overpass pour trouver les self-stockages dans un rayon de 30km
-            overpass_url = "https://overpass-api.de/api/interpreter"
+            radius = OVERPASS_RADIUS_KM * 1000
 
             # Query Overpass simplifiee et robuste
             query = f"""[out:json][timeout:30];
 (
-  node["amenity"="storage_rental"](around:30000,{lat},{lon});
-  way["amenity"="storage_rental"](around:30000,{lat},{lon});
-  node["shop"="storage_rental"](around:30000,{lat},{lon});
-  way["shop"="storage_rental"](around:30000,{lat},{lon});
-  node["landuse"="commercial"]["name"~"stockage|storage|garde-meuble|box",i](around:30000,{lat},{lon});
-  way["landuse"="commercial"]["name"~"stockage|storage|garde-meuble|box",i](around:30000,{lat},{lon});
-  node["building"]["name"~"stockage|storage|garde-meuble|box",i](around:30000,{lat},{lon});
-  way["building"]["name"~"stockage|storage|garde-meuble|box",i](around:30000,{lat},{lon});
+  node["amenity"="storage_rental"](around:{radius},{lat},{lon});
+  way["amenity"="storage_rental"](around:{radius},{lat},{lon});
+  node["shop"="storage_rental"](around:{radius},{lat},{lon});
+  way["shop"="storage_rental"](around:{radius},{lat},{lon});
+  node["landuse"="commercial"]["name"~"{OVERPASS_NAME_REGEX}",i](around:{radius},{lat},{lon});
+  way["landuse"="commercial"]["name"~"{OVERPASS_NAME_REGEX}",i](around:{radius},{lat},{lon});
+  node["building"]["name"~"{OVERPASS_NAME_REGEX}",i](around:{radius},{lat},{lon});
+  way["building"]["name"~"{OVERPASS_NAME_REGEX}",i](around:{radius},{lat},{lon});
 );
 out body center;"""
 
-            time.sleep(2)  # Respecter le rate limit
-            response = self.session.post(
-                overpass_url,
-                data={'data': query},
-                headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                timeout=45
-            )
-
-            if response.status_code != 200:
-                print(f"    [!] Overpass HTTP {response.status_code}")
+            data = self._post_overpass(query)
+            if data is None:
                 return leads
 
-            data = response.json()
-
+            scraped_at = batch_timestamp()
             for element in data.get('elements', []):
-                tags = element.get('tags', {})
-                name = tags.get('name', '')
-
-                if name:
-                    # Coordonnees: soit directement, soit depuis 'center' pour les ways
-                    elem_lat = element.get('lat') or element.get('center', {}).get('lat')
-                    elem_lon = element.get('lon') or element.get('center', {}).get('lon')
-
-                    leads.append({
-                        'name': name,
-                        'address': f"{tags.get('addr:housenumber', '')} {tags.get('addr:street', '')}, {tags.get('addr:postcode', '')} {tags.get('addr:city', ville)}".strip().strip(',').strip(),
-                        'city': tags.get('addr:city', ville),
-                        'postal_code': tags.get('addr:postcode', ''),
-                        'phone': tags.get('phone', tags.get('contact:phone', '')),
-                        'website': tags.get('website', tags.get('contact:website', '')),
-                        'email': tags.get('email', tags.get('contact:email', '')),
-                        'lat': elem_lat,
-                        'lon': elem_lon,
-                        'source': 'overpass',
-                        'ville_recherche': ville,
-                        'scraped_at': datetime.now().isoformat(),
-                    })
-
-            print(f"    [OK] {len(leads)} resultats Overpass")
+                lead = self._parse_overpass_element(element, ville, scraped_at)
+                if lead:
+                    leads.append(lead)
+
+            print(f"    [OK] {len(leads)} resultats Overpass ({ville})")
 
         except requests.exceptions.Timeout:
             print(f"    [!] Timeout Overpass (serveur charge)")
@@ -316,6 +477,159 @@ out body center;"""
 
         return leads
 
+    def _overpass_tiles(self, cities: dict) -> list:
+        """
+        Regroupe les villes geocodees en tuiles (bbox), rayon de recherche inclus.
+        Une ville ne rejoint une tuile que si sa zone de recherche la touche
+        presque: la tuile agrandie ne doit pas couvrir plus que la somme des
+        zones de ses villes (pas d'elements sans rapport avec les villes
+        demandees), ni depasser OVERPASS_TILE_MAX_KM de cote.
+        Retourne une liste de (bbox [sud, ouest, nord, est], villes de la tuile).
+        """
+        tiles = []  # [bbox, villes, surface des zones de recherche]
+        for ville, (lat, lon) in sorted(cities.items(), key=lambda item: item[1]):
+            km_per_deg_lon = 111.0 * max(0.1, math.cos(math.radians(lat)))
+            dlat = OVERPASS_RADIUS_KM / 111.0
+            dlon = OVERPASS_RADIUS_KM / km_per_deg_lon
+            box = [lat - dlat, lon - dlon, lat + dlat, lon + dlon]
+            area = 4 * dlat * dlon
+
+            for tile in tiles:
+                bbox, members, covered = tile
+                merged = [min(bbox[0], box[0]), min(bbox[1], box[1]),
+                          max(bbox[2], box[2]), max(bbox[3], box[3])]
+                height, width = merged[2] - merged[0], merged[3] - merged[1]
+                if (height * width <= covered + area
+                        and height * 111.0 <= OVERPASS_TILE_MAX_KM
+                        and width * km_per_deg_lon <= OVERPASS_TILE_MAX_KM):
+                    bbox[:] = merged
+                    members.append(ville)
+                    tile[2] = covered + area
+                    break
+            else:
+                tiles.append([box, [ville], area])
+
+        return [(bbox, members) for bbox, members, _ in tiles]
+
+    def _overpass_plan(self, villes: list) -> tuple:
+        """
+        Geocode les villes et les regroupe par tuile Overpass.
+        Retourne (groupes, index des villes): un groupe (bbox, villes) par tuile,
+        place a sa premiere ville dans `villes`; une ville non geocodee forme
+        un groupe sans bbox.
+        """
+        cities = {}
+        for ville in villes:
+            try:
+                coords = self.geocode_city(ville)
+            except Exception as e:
+                print(f"    [!] Geocodage {ville}: {type(e).__name__}")
+                continue
+            if coords:
+                cities[ville] = coords
+            else:
+                print(f"    [!] Coordonnees non trouvees pour {ville}")
+
+        # Index des villes: rattachement de chaque resultat a la plus proche
+        city_index = GeoIndex(cell_km=OVERPASS_RADIUS_KM)
+        for ville, (lat, lon) in cities.items():
+            city_index.add(lat, lon, ville)
+
+        tiles = self._overpass_tiles(cities)
+        print(f"    {len(cities)} villes geocodees -> {len(tiles)} requete(s) Overpass")
+
+        tile_of = {ville: tile for tile in tiles for ville in tile[1]}
+        groups = []
+        for ville in villes:
+            tile = tile_of.pop(ville, None)
+            if tile is not None:
+                members = set(tile[1])
+                groups.append((tile[0], [v for v in villes if v in members]))
+                for member in members:
+                    tile_of.pop(member, None)
+            elif ville not in cities:
+                groups.append((None, [ville]))
+        return groups, city_index
+
+    def _scrape_overpass_tile(self, bbox: list, villes: list, city_index: GeoIndex, seen: set) -> list:
+        """
+        Une requete Overpass pour une tuile. Chaque resultat est rattache a la
+        ville demandee la plus proche (< 30 km); s'il s'agit d'une ville d'une
+        autre tuile, il est laisse a la requete de cette tuile, qui le contient
+        aussi: une ville est complete des que sa tuile a repondu.
+        """
+        south, west, north, east = bbox
+        query = f"""[out:json][timeout:180][bbox:{south:.4f},{west:.4f},{north:.4f},{east:.4f}];
+(
+  nwr["amenity"="storage_rental"];
+  nwr["shop"="storage_rental"];
+  nwr["landuse"="commercial"]["name"~"{OVERPASS_NAME_REGEX}",i];
+  nwr["building"]["name"~"{OVERPASS_NAME_REGEX}",i];
+);
+out body center;"""
+
+        leads = []
+        try:
+            data = self._post_overpass(query, timeout=200)
+        except requests.exceptions.Timeout:
+            print(f"    [!] Timeout Overpass (serveur charge)")
+            return leads
+        except (json.JSONDecodeError, requests.exceptions.RequestException) as e:
+            print(f"    [!] Erreur Overpass: {type(e).__name__}: {str(e)[:40]}")
+            return leads
+        if data is None:
+            return leads
+
+        members = set(villes)
+        scraped_at = batch_timestamp()
+        for element in data.get('elements', []):
+            # Une tuile peut recouvrir une autre
+            element_id = (element.get('type'), element.get('id'))
+            if element_id in seen:
+                continue
+
+            lat = element.get('lat') or element.get('center', {}).get('lat')
+            lon = element.get('lon') or element.get('center', {}).get('lon')
+            if lat is None or lon is None:
+                continue
+
+            nearest = city_index.nearest(lat, lon, k=1, max_km=OVERPASS_RADIUS_KM)
+            if not nearest:
+                continue
+            ville = city_index.items[nearest[0][0]]
+            if ville not in members:
+                continue
+            seen.add(element_id)
+
+            lead = self._parse_overpass_element(element, ville, scraped_at)
+            if lead:
+                leads.append(lead)
+
+        print(f"    [OK] {len(leads)} resultats Overpass ({', '.join(villes)})")
+        return leads
+
+    def iter_overpass_batch(self, villes: list):
+        """
+        Mode batch Overpass: geocode toutes les villes, puis une requete par
+        tuile (bbox) au lieu d'une requete `around:` par ville.
+        Generateur: yield les leads de chaque tuile, puis un ScopeComplete par
+        ville de la tuile (Overpass termine pour cette ville).
+        """
+        print(f"  [OVERPASS] Mode batch: {len(villes)} villes...")
+        groups, city_index = self._overpass_plan(villes)
+        seen = set()
+        for bbox, group in groups:
+            if bbox is not None:
+                yield from self._scrape_overpass_tile(bbox, group, city_index, seen)
+            for ville in group:
+                yield ScopeComplete(ville)
+
+    def scrape_overpass_batch(self, villes: list) -> list:
+        """Leads du mode batch Overpass, toutes villes confondues"""
+        leads = [item for item in self.iter_overpass_batch(villes) if not isinstance(item, ScopeComplete)]
+        print(f"    [OK] {len(leads)} resultats Overpass (batch)")
+        return leads
+
     def scrape_societe_com(self, ville: str) -> list:
         """
         Scrape Societe.com pour le code NAF 5210B (entreposage)
@@ -330,18 +644,7 @@ out body center;"""
 
         try:
             response = self.session.get(url, headers=self.get_headers(), timeout=15)
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            results = soup.select('.ResultSociete, .company-item')
-
-            for result in results[:20]:
-                name_el = result.select_one('a.txt-no-style, .company-name')
-                if name_el:
-                    leads.append({
-                        'name': name_el.get_text(strip=True),
-                        'source': 'societe.com',
-                        'ville_recherche': ville,
-                    })
+            leads = self.parse_societe_com(response.text, ville)
 
             print(f"    ✓ {len(leads)} entreprises trouvées")
 
@@ -350,6 +653,20 @@ out body center;"""
 
         return leads
 
+    def parse_societe_com(self, html: str, ville: str) -> list:
+        """Leads d'une page de resultats Societe.com"""
+        parser = self.societe_parser
+        leads = []
+        for result in parser.listings(html)[:SOCIETE_MAX_RESULTS]:
+            name_el = parser.first(result, 'name')
+            if name_el:
+                leads.append(Lead(
+                    name=parser.text(name_el),
+                    source=SOURCE_SOCIETE,
+                    ville_recherche=ville,
+                ))
+        return leads
+
     def guess_email(self, lead: dict) -> str:
         """
         Devine l'email à partir du site web (patterns communs)
@@ -389,74 +706,250 @@ out body center;"""
 
     def calculate_score(self, lead: dict) -> int:
         """Calcule un score de qualité du lead"""
-        score = 40  # Base
-
-        if lead.get('phone'):
-            score += 20
-        if lead.get('website'):
-            score += 20
-        if lead.get('email'):
-            score += 15
-        if lead.get('address'):
-            score += 5
-
-        return min(score, 100)
+        return self.scorer.score(lead)
 
     def scrape_all(self, villes: list) -> list:
         """Scrape toutes les sources pour toutes les villes"""
-        all_leads = []
-
-        for ville in villes:
-            print(f"\n>>> Ville: {ville}")
-            print("-" * 40)
+        return self._dedupe_and_score(self._fetch_all(villes))
 
-            # 1. API Gouvernementale (la plus fiable, 100% gratuite)
-            gouv_leads = self.scrape_annuaire_entreprises(ville)
-            all_leads.extend(gouv_leads)
-            time.sleep(random.uniform(1, 2))
+    def scrape_incremental(self, villes: list, store: LeadStore,
+                           refresh_hours: float = DEFAULT_REFRESH_HOURS) -> tuple:
+        """
+        Scrape seulement les villes pas rafraichies depuis `refresh_hours` et
+        compare au stock local. Retourne (leads scrapes, LeadDelta).
+        """
+        labels = [self.SOURCE_LABELS[source] for source in self.SOURCES]
+        fresh = store.fresh_cities(villes, labels, refresh_hours * 3600)
+        todo = [ville for ville in villes if ville not in fresh]
+        if fresh:
+            print(f"\n⏭️  {len(fresh)} ville(s) rafraichie(s) il y a moins de {refresh_hours:g}h: "
+                  f"{', '.join(v for v in villes if v in fresh)}")
+        if not todo:
+            self.score_summary = self.scorer.score_batch([])
+            return [], LeadDelta()
+
+        all_leads = self._fetch_all(todo)
+        counts = Counter((lead.get('ville_recherche'), lead.get('source')) for lead in all_leads)
+        unique_leads = self._dedupe_and_score(all_leads)
+
+        # Une source muette la ou elle avait des leads = en echec: rien n'y est marque disparu
+        scopes = store.successful_scopes(todo, labels, counts)
+        for ville, sources in scopes.items():
+            failed = set(labels) - sources
+            if failed:
+                print(f"    [!] {ville}: aucun resultat de {', '.join(sorted(failed))}, stock conserve")
+        delta = store.apply(unique_leads, scopes)
+        store.record_runs(scopes, counts)
+        return unique_leads, delta
+
+    def _fetch_all(self, villes: list) -> list:
+        """Leads bruts de toutes les sources (avant deduplication), ville par ville"""
+        if self.concurrency > 1:
+            return self._scrape_concurrent(villes)
+        # Meme ordre que le streaming: la deduplication fusionne les memes leads
+        return list(self.stream_all(villes))
+
+    def _dedupe_and_score(self, all_leads: list) -> list:
+        # Deduplication floue multi-sources, doublons fusionnes champ par champ
+        self.dedup = LeadDeduplicator()
+        unique_leads = self.dedup.dedupe(all_leads)
+        for lead in unique_leads:
+            self._guess_missing_email(lead)
+
+        # Scores, priorites et compteurs en une seule passe sur tout le lot
+        self.score_summary = self.scorer.score_batch(unique_leads)
+        return unique_leads
 
-            # 2. OpenStreetMap Nominatim (recherche de marques connues)
-            osm_leads = self.scrape_google_maps_export(ville)
-            all_leads.extend(osm_leads)
-            time.sleep(random.uniform(1, 2))
+    def _guess_missing_email(self, lead: dict):
+        if lead.get('website') and not lead.get('email'):
+            lead['email'] = self.guess_email(lead)
 
-            # 3. Overpass API (si disponible)
-            overpass_leads = self.scrape_overpass_api(ville)
-            all_leads.extend(overpass_leads)
+    def _finalize_lead(self, lead: dict) -> dict:
+        """Devine l'email et calcule le score d'un lead dedoublonne"""
+        self._guess_missing_email(lead)
+        return self.scorer.score_lead(lead)
 
-            # Pause entre villes
-            time.sleep(random.uniform(2, 4))
+    def iter_unique(self, leads):
+        """
+        Deduplique, devine l'email et score les leads au fil de l'eau, ville par ville.
+        Les leads bruts d'une ville sont retenus jusqu'a la fin de toutes ses
+        sources (ScopeComplete de stream_all(scope_marks=True)), ou du flux,
+        puis deduits dans l'ordre du batch (sources dans l'ordre de SOURCES):
+        memes leads fusionnes qu'avec scrape_all, meme en mode concurrent.
+        Une fois emis, un lead est libere par le deduplicateur: un doublon
+        tardif (ville suivante) ne complete jamais un lead en cours
+        d'enrichissement ou deja exporte.
+        """
+        self.dedup = LeadDeduplicator()
+        source_order = {self.SOURCE_LABELS[source]: rank for rank, source in enumerate(self.SOURCES)}
+        # Leads bruts en attente par ville: (rang de la source, ordre d'arrivee, lead)
+        pending = {}
+        for arrival, item in enumerate(leads):
+            if isinstance(item, ScopeComplete):
+                yield from self._dedupe_scope(sorted(pending.pop(item.ville, ()), key=lambda entry: entry[:2]))
+                continue
+            rank = source_order.get(item.get('source'), len(source_order))
+            pending.setdefault(item.get('ville_recherche'), []).append((rank, arrival, item))
+        # Fin du flux: villes sans marque, dans l'ordre d'arrivee
+        for entries in pending.values():
+            yield from self._dedupe_scope(sorted(entries, key=lambda entry: entry[:2]))
+
+    def _dedupe_scope(self, entries: list) -> list:
+        """Ajoute les leads d'une ville au deduplicateur; retourne ses nouveaux leads, finalises"""
+        new_leads = []
+        for _, _, lead in entries:
+            canonical, is_new = self.dedup.add(lead)
+            if is_new:
+                new_leads.append(canonical)
+        # Le deduplicateur ne garde que les donnees de comparaison des leads emis
+        self.dedup.release()
+        return [self._finalize_lead(lead) for lead in new_leads]
+
+    def _iter_source(self, source: str, ville: str):
+        """Leads d'une source pour une ville, en streaming si la source le permet"""
+        return getattr(self, self.STREAMING_SOURCES.get(source, source))(ville)
+
+    def stream_all(self, villes: list, scope_marks: bool = False):
+        """
+        Generateur: yield chaque lead brut des qu'il est scrape.
+        En mode concurrent, les workers alimentent une file bornee; les etapes
+        suivantes (enrichissement, export) avancent pendant que les autres
+        villes sont encore scrapees.
+        scope_marks: yield aussi un ScopeComplete(ville) des que toutes les
+        sources d'une ville ont termine (en mode Overpass batch, des que la
+        tuile Overpass de la ville a repondu).
+        """
+        if self.concurrency == 1:
+            # Sequentiel: tuile par tuile en mode Overpass batch (villes de la tuile, puis sa requete)
+            if self.overpass_batch:
+                print(f"\n>>> Overpass (batch): geocodage de {len(villes)} villes")
+                groups, city_index = self._overpass_plan(villes)
+            else:
+                groups, city_index = [(None, [ville]) for ville in villes], None
+            seen = set()
+            for bbox, group in groups:
+                for ville in group:
+                    print(f"\n>>> Ville: {ville}")
+                    print("-" * 40)
+                    # Le rate limit par hote remplace les pauses fixes
+                    for source in self.city_sources:
+                        yield from self._iter_source(source, ville)
+                if bbox is not None:
+                    print(f"  [OVERPASS] Tuile: {', '.join(group)}")
+                    yield from self._scrape_overpass_tile(bbox, group, city_index, seen)
+                if scope_marks:
+                    for ville in group:
+                        yield ScopeComplete(ville)
+            return
 
-        # Dédupliquer par nom
-        seen = set()
-        unique_leads = []
-        for lead in all_leads:
-            name_key = lead.get('name', '').lower().strip()
-            if name_key and name_key not in seen:
-                seen.add(name_key)
+        print(f"\n>>> {len(villes)} villes, {self.concurrency} workers par source (streaming)")
+        print("-" * 40)
 
-                # Deviner l'email
-                if lead.get('website') and not lead.get('email'):
-                    lead['email'] = self.guess_email(lead)
+        out = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        stop = threading.Event()
+        done = object()
 
-                # Calculer le score
-                lead['score'] = self.calculate_score(lead)
-                lead['priority'] = 'hot' if lead['score'] >= 70 else 'warm' if lead['score'] >= 50 else 'cold'
+        def put(item):
+            # Ne bloque pas indefiniment si le consommateur s'est arrete
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.2)
+                    return True
+                except queue.Full:
+                    continue
+            return False
 
-                unique_leads.append(lead)
+        def run(scope, fn, *args):
+            try:
+                for lead in fn(*args):
+                    if not put(lead):
+                        return
+            except Exception as e:
+                print(f"    [!] Erreur {fn.__name__}: {type(e).__name__}: {str(e)[:40]}")
+            finally:
+                put((done, scope))
 
-        return unique_leads
+        executors = {
+            source: ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=source)
+            for source in self.SOURCES
+        }
+        try:
+            tasks = 0
+            # Sources restantes par ville (taches par ville, plus sa tuile en mode Overpass batch)
+            remaining = Counter()
+            for ville in villes:
+                for source in self.city_sources:
+                    executors[source].submit(run, ville, self._iter_source, source, ville)
+                    remaining[ville] += 1
+                    tasks += 1
+            if self.overpass_batch:
+                # Tuile par tuile: un ScopeComplete par ville des que sa tuile a repondu
+                executors['scrape_overpass_api'].submit(run, None, self.iter_overpass_batch, villes)
+                remaining.update(villes)
+                tasks += 1
+
+            while tasks:
+                item = out.get()
+                if type(item) is tuple and item[0] is done:
+                    tasks -= 1
+                    ville = item[1]
+                elif isinstance(item, ScopeComplete):
+                    ville = item.ville
+                else:
+                    yield item
+                    continue
+                if ville is not None:
+                    remaining[ville] -= 1
+                    if scope_marks and not remaining[ville]:
+                        yield ScopeComplete(ville)
+        finally:
+            stop.set()
+            for executor in executors.values():
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def _scrape_concurrent(self, villes: list) -> list:
+        """
+        Scrape les villes en parallele: un pool de workers par source, pour
+        qu'une source lente (Nominatim a 1 req/s) ne bloque pas les autres.
+        Le rate limit de chaque hote reste garanti par le RateLimiter partage.
+        """
+        print(f"\n>>> {len(villes)} villes, {self.concurrency} workers par source")
+        print("-" * 40)
 
-    def export_csv(self, leads: list, filename: str):
+        executors = {
+            source: ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=source)
+            for source in self.SOURCES
+        }
+        try:
+            futures = [
+                (ville, [executors[source].submit(getattr(self, source), ville) for source in self.city_sources])
+                for ville in villes
+            ]
+            overpass = {}
+            if self.overpass_batch:
+                for lead in executors['scrape_overpass_api'].submit(self.scrape_overpass_batch, villes).result():
+                    overpass.setdefault(lead.get('ville_recherche'), []).append(lead)
+            # Resultats ville par ville dans l'ordre de soumission (deduplication deterministe),
+            # Overpass batch apres les autres sources de la ville, comme en streaming
+            all_leads = []
+            for ville, city_futures in futures:
+                for future in city_futures:
+                    all_leads.extend(future.result())
+                all_leads.extend(overpass.pop(ville, ()))
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+        return all_leads
+
+    def export_csv(self, leads: list, filename: str, fields: list = None):
         """Exporte les leads en CSV"""
         if not leads:
             print("Aucun lead à exporter")
             return
 
-        fieldnames = ['name', 'email', 'phone', 'website', 'address', 'score', 'priority', 'source', 'ville_recherche', 'scraped_at']
-
         with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+            writer = csv.DictWriter(f, fieldnames=fields or self.EXPORT_FIELDS, extrasaction='ignore')
             writer.writeheader()
             writer.writerows(leads)
 
@@ -465,57 +958,55 @@ out body center;"""
     def export_json(self, leads: list, filename: str):
         """Exporte les leads en JSON (pour import API)"""
         with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(leads, f, ensure_ascii=False, indent=2)
+            json.dump([dict(lead) for lead in leads], f, ensure_ascii=False, indent=2)
 
         print(f"✅ {len(leads)} leads exportés vers {filename}")
 
-    def send_to_boxibox_api(self, leads: list, api_url: str, api_key: str):
-        """Envoie les leads à l'API BoxiBox"""
-        print(f"\n📤 Envoi de {len(leads)} leads à BoxiBox...")
-
-        success = 0
-        errors = 0
-
-        for lead in leads:
-            if lead['score'] < 50:  # Skip low-quality leads
-                continue
-
-            try:
-                response = requests.post(
-                    f"{api_url}/api/v1/external/leads",
-                    headers={
-                        'X-API-Key': api_key,
-                        'Content-Type': 'application/json',
-                    },
-                    json={
-                        'first_name': '',
-                        'last_name': '',
-                        'email': lead.get('email', ''),
-                        'phone': lead.get('phone', ''),
-                        'company': lead.get('name', ''),
-                        'source': f"scraper_{lead.get('source', 'manual')}",
-                        'score': lead.get('score', 50),
-                        'priority': lead.get('priority', 'warm'),
-                        'notes': f"Adresse: {lead.get('address', 'N/A')}\nSite: {lead.get('website', 'N/A')}",
-                        'metadata': {
-                            'scraped_at': lead.get('scraped_at'),
-                            'ville_recherche': lead.get('ville_recherche'),
-                        }
-                    },
-                    timeout=10
-                )
-
-                if response.status_code == 201:
-                    success += 1
-                else:
-                    errors += 1
+    def export_parquet(self, leads: list, filename: str, fields: list = None):
+        """Exporte les leads en Parquet (schema type, lecture par colonnes)"""
+        count = columnar.write_leads(leads, filename, fields)
+        print(f"✅ {count} leads exportés vers {filename}")
 
-                time.sleep(0.5)  # Rate limiting
-
-            except Exception as e:
-                errors += 1
+    def send_to_boxibox_api(self, leads: list, api_url: str, api_key: str,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE, concurrency: int = DEFAULT_CONCURRENCY,
+                            report: str = None, sync_store: SyncStore = None) -> list:
+        """
+        Envoie les leads (score >= 50) à l'API BoxiBox, par lots.
+        Avec sync_store: seulement les leads absents du CRM (pas encore envoyés ou refusés puis corrigés).
+        """
+        print(f"\n📤 Envoi de {len(leads)} leads à BoxiBox...")
 
-        print(f"✅ {success} leads créés, {errors} erreurs")
+        client = BoxiBoxClient(api_url, api_key, chunk_size=chunk_size, concurrency=concurrency)
+        try:
+            if sync_store:
+                results = sync_leads(client, sync_store, leads)
+            else:
+                results = client.upload(leads)
+        finally:
+            client.close()
+
+        counts = client.summary(results)
+        print(f"✅ {counts[CREATED]} leads créés, {counts[DUPLICATE]} doublons, "
+              f"{counts[INVALID] + counts[ERROR]} erreurs, {counts[SKIPPED]} sans email")
+        if report:
+            client.export_report(results, report)
+            print(f"   Rapport par lead: {report}")
+        return results
+
+
+def print_geo_report(leads: list):
+    """Repartition par departement + densite de concurrence (index spatial)"""
+    print(f"\n🗺️  Repartition geographique:")
+    for dept, count in count_by_departement(leads).most_common(10):
+        print(f"   Departement {dept}: {count} leads")
+
+    index = GeoIndex.from_leads(leads)
+    distances = sorted(
+        found[1] for found in (index.nearest_competitor(i) for i in range(len(index))) if found
+    )
+    if distances:
+        print(f"   Leads geolocalises: {len(index)}")
+        print(f"   Distance mediane au concurrent le plus proche: {distances[len(distances) // 2]:.1f} km")
 
 
 def main():
@@ -524,40 +1015,133 @@ def main():
                         help='Villes à scraper (séparées par des virgules)')
     parser.add_argument('--output', type=str, default='leads_self_stockage.csv',
                         help='Fichier de sortie')
-    parser.add_argument('--format', type=str, choices=['csv', 'json', 'both'], default='csv',
-                        help='Format de sortie')
+    parser.add_argument('--format', type=str, choices=['csv', 'json', 'both', 'parquet'], default='csv',
+                        help='Format de sortie (parquet: necessite pyarrow)')
     parser.add_argument('--api-url', type=str, help='URL de l\'API BoxiBox')
     parser.add_argument('--api-key', type=str, help='Clé API BoxiBox')
+    parser.add_argument('--api-chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='Leads par lot envoye a l\'API BoxiBox')
+    parser.add_argument('--api-concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='Requetes simultanees max vers l\'API BoxiBox')
+    parser.add_argument('--api-report', type=str, help='Rapport CSV de l\'envoi (statut par lead)')
+    parser.add_argument('--api-sync', action='store_true',
+                        help='N\'envoyer que les leads absents du CRM (deja envoyes: memorises)')
+    parser.add_argument('--api-sync-state', type=str, default=DEFAULT_SYNC_PATH,
+                        help='Fichier SQLite des leads deja synchronises')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Nombre de villes scrapees en parallele par source (1 = sequentiel)')
+    parser.add_argument('--overpass-batch', action='store_true',
+                        help='Overpass: une requete par groupe de villes au lieu d\'une par ville')
+    parser.add_argument('--geo-report', action='store_true',
+                        help='Afficher la repartition par departement et la distance au concurrent le plus proche')
+    parser.add_argument('--cache', type=str, default=http_cache.DEFAULT_CACHE_PATH,
+                        help='Fichier SQLite du cache HTTP')
+    parser.add_argument('--no-cache', action='store_true', help='Desactiver le cache HTTP')
+    replay_group = parser.add_mutually_exclusive_group()
+    replay_group.add_argument('--record', type=str, metavar='FICHIER',
+                              help='Enregistrer les reponses HTTP (JSON, rejouable hors ligne)')
+    replay_group.add_argument('--replay', type=str, metavar='FICHIER',
+                              help='Rejouer un enregistrement au lieu d\'appeler le reseau')
+    parser.add_argument('--html-parser', type=str, choices=html_parsing.BACKENDS, default=None,
+                        help='Backend HTML (defaut: le plus rapide installe)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='N\'exporter que les leads nouveaux, modifies ou disparus depuis le dernier run')
+    parser.add_argument('--refresh-hours', type=float, default=DEFAULT_REFRESH_HOURS,
+                        help='Mode incremental: sauter les villes scrapees il y a moins de N heures')
+    parser.add_argument('--lead-store', type=str, default=DEFAULT_STORE_PATH,
+                        help='Fichier SQLite du stock de leads (mode incremental)')
 
     args = parser.parse_args()
 
     villes = [v.strip() for v in args.villes.split(',')]
+    if args.format == 'parquet' and not columnar.available():
+        print("❌ --format parquet necessite pyarrow (pip install pyarrow)")
+        return
+    if args.html_parser and args.html_parser not in html_parsing.available_backends():
+        print(f"❌ Backend HTML {args.html_parser} non installe "
+              f"(disponibles: {', '.join(html_parsing.available_backends())})")
+        return
 
     print("=" * 50)
     print("🎯 BoxiBox - Scraper de Prospection Self-Stockage")
     print("=" * 50)
     print(f"Villes: {', '.join(villes)}")
     print(f"Output: {args.output}")
-
-    scraper = SelfStorageScraper()
-    leads = scraper.scrape_all(villes)
+    print(f"Concurrence: {args.concurrency}")
+
+    # Enregistrement/rejeu: toutes les requetes passent par le reseau (ou l'enregistrement), pas par le cache
+    use_cache = not (args.no_cache or args.record or args.replay)
+    cache = http_cache.ResponseCache(args.cache) if use_cache else None
+    scraper = SelfStorageScraper(concurrency=args.concurrency, cache=cache,
+                                 overpass_batch=args.overpass_batch, html_backend=args.html_parser)
+    cassette = None
+    if args.replay:
+        cassette = http_replay.mount_replay(scraper.session, http_replay.Cassette.load(args.replay))
+    elif args.record:
+        cassette = http_replay.mount_recorder(scraper.session, http_replay.open_recording(args.record, villes=args.villes))
+    delta = None
+    if args.incremental:
+        store = LeadStore(args.lead_store)
+        leads, delta = scraper.scrape_incremental(villes, store, args.refresh_hours)
+        store.close()
+    else:
+        leads = scraper.scrape_all(villes)
 
     print(f"\n📊 Résumé:")
     print(f"   Total leads uniques: {len(leads)}")
-    print(f"   Leads HOT (score >= 70): {len([l for l in leads if l['score'] >= 70])}")
-    print(f"   Leads WARM (score 50-69): {len([l for l in leads if 50 <= l['score'] < 70])}")
-    print(f"   Leads COLD (score < 50): {len([l for l in leads if l['score'] < 50])}")
-
-    # Export
+    if delta is not None:
+        changes = delta.summary()
+        print(f"   Depuis le dernier run: {changes['new']} nouveaux, {changes['changed']} modifies, "
+              f"{changes['gone']} disparus ({changes['unchanged']} inchanges)")
+    summary = scraper.score_summary
+    print(f"   Leads HOT (score >= 70): {summary['hot']}")
+    print(f"   Leads WARM (score 50-69): {summary['warm']}")
+    print(f"   Leads COLD (score < 50): {summary['cold']}")
+
+    if scraper.dedup:
+        print(f"   Doublons fusionnes: {scraper.dedup.merged}")
+    http_stats = scraper.rate_limiter.stats()
+    print(f"   Requetes HTTP: {http_stats['requests']} (429: {http_stats['throttled']}, "
+          f"attente rate limit: {http_stats['waited_seconds']}s)")
+    if cache:
+        cache_stats = cache.stats()
+        print(f"   Cache HTTP: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"(taux: {cache_stats['hit_rate']:.0%})")
+    if args.replay:
+        replay_stats = cassette.stats()
+        print(f"   Rejeu: {replay_stats['hits']} reponses rejouees, {replay_stats['misses']} absentes")
+    elif args.record:
+        cassette.save(args.record)
+        print(f"   📼 {cassette.recorded} reponses enregistrees -> {args.record}")
+
+    if args.geo_report:
+        print_geo_report(leads)
+
+    # Export (mode incremental: le delta seulement, colonne 'change')
+    exported, fields, parquet_fields = leads, None, None
+    if delta is not None:
+        exported = delta.leads()
+        fields = scraper.EXPORT_FIELDS + ['change']
+        parquet_fields = columnar.LEAD_COLUMNS + ['change']
+        # Seuls les leads nouveaux ou modifies partent vers l'API
+        leads = delta.new + delta.changed
     if args.format in ['csv', 'both']:
-        scraper.export_csv(leads, args.output)
+        scraper.export_csv(exported, args.output, fields)
     if args.format in ['json', 'both']:
         json_file = args.output.replace('.csv', '.json')
-        scraper.export_json(leads, json_file)
+        scraper.export_json(exported, json_file)
+    if args.format == 'parquet':
+        parquet_file = args.output.replace('.csv', '.parquet')
+        scraper.export_parquet(exported, parquet_file, parquet_fields)
 
     # Envoi API si configuré
     if args.api_url and args.api_key:
-        scraper.send_to_boxibox_api(leads, args.api_url, args.api_key)
+        sync_store = SyncStore(args.api_sync_state) if args.api_sync else None
+        scraper.send_to_boxibox_api(leads, args.api_url, args.api_key, chunk_size=args.api_chunk_size,
+                                    concurrency=args.api_concurrency, report=args.api_report,
+                                    sync_store=sync_store)
+        if sync_store:
+            sync_store.close()
 
 
 if __name__ == '__main__':
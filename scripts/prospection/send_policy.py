@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Cadence d'envoi des campagnes email
+La politique anti-spam (emails par minute, plafond journalier, pause tous les
+N emails) est un objet de configuration; le SendGovernor l'applique a tous les
+workers d'envoi a la fois, avec le meme token bucket que le rate limiter HTTP.
+
+Les leads ignores et les dry runs ne consomment aucune attente.
+"""
+
+import threading
+
+from rate_limiter import TokenBucket
+
+# Limite gratuite Brevo
+BREVO_DAILY_CAP = 300
+
+
+class SendPolicy:
+    """Regles de cadence d'une campagne"""
+
+    def __init__(self, messages_per_minute: float = 20, daily_cap: int = BREVO_DAILY_CAP,
+                 pause_every: int = 50, pause_seconds: float = 60, burst: int = 1):
+        self.messages_per_minute = messages_per_minute
+        self.daily_cap = daily_cap
+        # Pause plus longue tous les `pause_every` emails (0 = jamais)
+        self.pause_every = pause_every
+        self.pause_seconds = pause_seconds
+        self.burst = burst
+
+    def __repr__(self):
+        return (f"SendPolicy({self.messages_per_minute:g}/min, max {self.daily_cap}/jour, "
+                f"pause {self.pause_seconds:g}s tous les {self.pause_every})")
+
+
+class SendGovernor:
+    """
+    Autorise les envois un par un selon la politique. acquire() bloque jusqu'au
+    prochain creneau et retourne False une fois le plafond journalier atteint.
+    Avec pace=False (dry run), seul le plafond est applique, sans attente.
+    """
+
+    def __init__(self, policy: SendPolicy, already_sent: int = 0, pace: bool = True):
+        self.policy = policy
+        self.pace = pace
+        self.bucket = TokenBucket(policy.messages_per_minute / 60.0, policy.burst)
+        self._lock = threading.Lock()
+
+        # Compteurs (already_sent: envois deja faits aujourd'hui)
+        self.granted = already_sent
+        self.pauses = 0
+        self.waited = 0.0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.policy.daily_cap - self.granted)
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.granted >= self.policy.daily_cap:
+                return False
+            self.granted += 1
+            pause = (self.pace and self.policy.pause_every
+                     and self.granted > 1 and (self.granted - 1) % self.policy.pause_every == 0)
+            if pause:
+                self.pauses += 1
+
+        if not self.pace:
+            return True
+
+        if pause:
+            print(f"\n⏸️  Pause de {self.policy.pause_seconds:g} secondes (anti-spam)...")
+            self.bucket.penalize(self.policy.pause_seconds)
+
+        waited = self.bucket.acquire()
+        with self._lock:
+            self.waited += waited
+        return True
+
+    def stats(self) -> dict:
+        return {
+            'granted': self.granted,
+            'pauses': self.pauses,
+            'waited_seconds': round(self.waited, 2),
+        }
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Pool de connexions SMTP
+Reutilise les sessions SMTP authentifiees d'un envoi a l'autre au lieu de
+refaire connexion + STARTTLS + LOGIN pour chaque email.
+
+- reconnexion transparente si le serveur coupe la session (SMTPServerDisconnected)
+- connexion recyclee apres MAX_MESSAGES_PER_CONNECTION messages
+- NOOP de verification apres une longue inactivite
+
+Pour tester en local sans Brevo (aiosmtpd, sans TLS ni authentification):
+    python -m aiosmtpd -n -l localhost:8025
+    BREVO_SMTP_HOST=localhost BREVO_SMTP_PORT=8025 BREVO_SMTP_STARTTLS=0 BREVO_SMTP_USER= \\
+        python email_campaign.py --leads leads.csv --template intro
+"""
+
+import queue
+import smtplib
+import threading
+import time
+
+# Messages envoyes sur une meme connexion avant de la renouveler
+MAX_MESSAGES_PER_CONNECTION = 100
+
+# Inactivite (s) au-dela de laquelle la connexion est verifiee par un NOOP
+IDLE_CHECK_SECONDS = 30
+
+
+class _Connection:
+    """Session SMTP ouverte + compteurs d'usage"""
+
+    __slots__ = ('smtp', 'messages', 'last_used')
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.messages = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Pool thread-safe de `size` connexions SMTP authentifiees, ouvertes a la
+    demande. send() emprunte une connexion, envoie, puis la rend au pool.
+    """
+
+    def __init__(self, host: str, port: int, username: str = None, password: str = None,
+                 starttls: bool = True, size: int = 1,
+                 max_messages: int = MAX_MESSAGES_PER_CONNECTION, timeout: int = 30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = max(1, size)
+        self.max_messages = max_messages
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+
+        # Compteurs
+        self.connections = 0
+        self.reconnects = 0
+        self.sent = 0
+
+    @classmethod
+    def from_config(cls, config: dict, size: int = 1) -> 'SMTPConnectionPool':
+        return cls(
+            config['host'], config['port'],
+            username=config.get('username'), password=config.get('password'),
+            starttls=config.get('starttls', True), size=size,
+            max_messages=config.get('max_messages', MAX_MESSAGES_PER_CONNECTION),
+        )
+
+    def _connect(self) -> _Connection:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        with self._lock:
+            self.connections += 1
+        return _Connection(smtp)
+
+    @staticmethod
+    def _discard(conn: _Connection, polite: bool = True):
+        try:
+            if polite:
+                conn.smtp.quit()
+            else:
+                conn.smtp.close()
+        except Exception:
+            conn.smtp.close()
+
+    def _checkout(self) -> _Connection:
+        """Connexion idle (verifiee si inactive depuis longtemps) ou nouvelle"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            if time.monotonic() - conn.last_used < IDLE_CHECK_SECONDS:
+                return conn
+            try:
+                if conn.smtp.noop()[0] == 250:
+                    return conn
+            except smtplib.SMTPException:
+                pass
+            self._discard(conn, polite=False)
+
+    def _checkin(self, conn: _Connection):
+        conn.last_used = time.monotonic()
+        if conn.messages >= self.max_messages:
+            # Recyclage: le serveur voit une session neuve tous les N messages
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+    def send(self, msg, from_addr: str = None, to_addrs=None) -> dict:
+        """
+        Envoie un message (email.message.Message) sur une connexion du pool.
+        Retourne les destinataires refuses (cf. sendmail).
+        """
+        return self._deliver(lambda smtp: smtp.send_message(msg, from_addr, to_addrs))
+
+    def sendmail(self, from_addr: str, to_addrs, raw: str) -> dict:
+        """Envoie un email deja serialise (en-tetes + corps)"""
+        return self._deliver(lambda smtp: smtp.sendmail(from_addr, to_addrs, raw))
+
+    def _deliver(self, send) -> dict:
+        """
+        Execute send(smtp) sur une connexion du pool. Une seule nouvelle
+        tentative, sur une session neuve, si le serveur a coupe la connexion.
+        """
+        with self._slots:
+            conn = self._checkout()
+            try:
+                try:
+                    refused = send(conn.smtp)
+                except smtplib.SMTPServerDisconnected:
+                    self._discard(conn, polite=False)
+                    with self._lock:
+                        self.reconnects += 1
+                    conn = self._connect()
+                    refused = send(conn.smtp)
+            except smtplib.SMTPServerDisconnected:
+                self._discard(conn, polite=False)
+                raise
+            except smtplib.SMTPRecipientsRefused:
+                # La session reste utilisable apres un RSET
+                self._reset(conn)
+                self._checkin(conn)
+                raise
+            except Exception:
+                self._discard(conn, polite=False)
+                raise
+
+            conn.messages += 1
+            with self._lock:
+                self.sent += 1
+            self._checkin(conn)
+            return refused
+
+    def _reset(self, conn: _Connection):
+        try:
+            conn.smtp.rset()
+        except smtplib.SMTPException:
+            pass
+
+    def close(self):
+        """Ferme (QUIT) les connexions inactives; le pool reste utilisable"""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def stats(self) -> dict:
+        return {
+            'sent': self.sent,
+            'connections': self.connections,
+            'reconnects': self.reconnects,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
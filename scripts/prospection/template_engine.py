@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BoxiBox - Templates d'emails precompiles
+Chaque template est analyse une seule fois: placeholders {champ} extraits et
+verifies au chargement, texte fixe pre-echappe, structure MIME (en-tetes,
+boundary) construite une fois. Par lead, seuls le sujet, le destinataire et
+le corps encode en base64 sont regeneres.
+
+- un champ absent ou vide du lead prend sa valeur par defaut (jamais de KeyError)
+- les accolades qui ne forment pas un placeholder restent du texte ({{ }} -> { })
+"""
+
+import base64
+import re
+import uuid
+from email.header import Header
+from email.utils import formataddr
+
+# {identifiant} = placeholder; {{ et }} = accolades litterales
+_TOKEN = re.compile(r'\{\{|\}\}|\{([A-Za-z_][A-Za-z0-9_]*)\}')
+
+# Valeurs par defaut des champs absents ou vides
+FIELD_DEFAULTS = {
+    'company': 'votre centre',
+    'first_name': '',
+    'name': 'votre centre',
+    'city': 'votre ville',
+}
+
+# Champs du lead essayes dans l'ordre pour un placeholder
+FIELD_ALIASES = {
+    'company': ('name', 'company'),
+    'city': ('city', 'ville_recherche'),
+}
+
+# Champs utilisables dans un template (colonnes des leads enrichis)
+LEAD_FIELDS = {
+    'name', 'email', 'phone', 'website', 'address', 'city', 'postal_code',
+    'score', 'priority', 'source', 'siren', 'ville_recherche', 'first_name', 'company',
+}
+
+
+class TemplateError(ValueError):
+    """Template invalide (placeholder inconnu)"""
+
+
+class CompiledText:
+    """Un texte a trous compile en format positionnel: '{0}', '{1}'..."""
+
+    __slots__ = ('source', 'fields', '_format')
+
+    def __init__(self, source: str, allowed: set = None):
+        self.source = source
+        fields = []
+        parts = []
+        position = 0
+        for match in _TOKEN.finditer(source):
+            parts.append(self._escape(source[position:match.start()]))
+            field = match.group(1)
+            if field is None:
+                parts.append(match.group(0))  # {{ ou }} deja echappe
+            else:
+                if allowed is not None and field not in allowed:
+                    raise TemplateError(f"placeholder inconnu {{{field}}}")
+                parts.append(f'{{{len(fields)}}}')
+                fields.append(field)
+            position = match.end()
+        parts.append(self._escape(source[position:]))
+
+        self.fields = tuple(fields)
+        self._format = ''.join(parts).format
+
+    @staticmethod
+    def _escape(text: str) -> str:
+        return text.replace('{', '{{').replace('}', '}}')
+
+    def render(self, values: tuple) -> str:
+        return self._format(*values)
+
+
+def resolve(lead: dict, field: str) -> str:
+    """Valeur d'un placeholder: premier champ non vide, sinon valeur par defaut"""
+    for key in FIELD_ALIASES.get(field, (field,)):
+        value = lead.get(key)
+        if value:
+            return str(value)
+    return FIELD_DEFAULTS.get(field, '')
+
+
+class CompiledTemplate:
+    """Sujet + corps compiles, et squelette MIME de l'email"""
+
+    def __init__(self, name: str, subject: str, body: str, from_email: str, from_name: str,
+                 allowed: set = LEAD_FIELDS):
+        self.name = name
+        try:
+            self.subject = CompiledText(subject, allowed)
+            self.body = CompiledText(body, allowed)
+        except TemplateError as e:
+            raise TemplateError(f"Template '{name}': {e}") from None
+
+        # Champs distincts a resoudre une seule fois par lead
+        self.fields = tuple(dict.fromkeys(self.subject.fields + self.body.fields))
+        self._subject_idx = tuple(self.fields.index(f) for f in self.subject.fields)
+        self._body_idx = tuple(self.fields.index(f) for f in self.body.fields)
+
+        # Squelette MIME fixe (multipart/alternative avec une partie texte).
+        # La boundary contient '_', absent de l'alphabet base64 du corps.
+        boundary = f'=_BoxiBox_{uuid.uuid4().hex}'
+        self._from_header = formataddr((from_name, from_email))
+        self._headers_suffix = (
+            f'From: {self._from_header}\r\n'
+            'MIME-Version: 1.0\r\n'
+            f'Content-Type: multipart/alternative; boundary="{boundary}"\r\n'
+            '\r\n'
+        )
+        self._part_prefix = (
+            f'--{boundary}\r\n'
+            'Content-Type: text/plain; charset="utf-8"\r\n'
+            'MIME-Version: 1.0\r\n'
+            'Content-Transfer-Encoding: base64\r\n'
+            '\r\n'
+        )
+        self._suffix = f'\r\n--{boundary}--\r\n'
+
+    def render(self, lead: dict) -> tuple:
+        """(sujet, corps) personnalises pour le lead"""
+        values = [resolve(lead, field) for field in self.fields]
+        subject = self.subject.render([values[i] for i in self._subject_idx])
+        body = self.body.render([values[i] for i in self._body_idx])
+        return subject, body
+
+    def build_message(self, to_email: str, subject: str, body: str) -> str:
+        """Email complet pret pour sendmail(): seules les parties variables sont encodees"""
+        return ''.join((
+            'Subject: ', encode_header(subject), '\r\n',
+            'To: ', encode_header(to_email), '\r\n',
+            self._headers_suffix,
+            self._part_prefix,
+            base64.encodebytes(body.encode('utf-8')).decode('ascii').replace('\n', '\r\n'),
+            self._suffix,
+        ))
+
+
+def encode_header(value: str) -> str:
+    """En-tete tel quel s'il est ASCII, sinon encoded-words RFC 2047"""
+    # Pas de retour a la ligne venant des donnees du lead (injection d'en-tetes)
+    value = ' '.join(value.splitlines())
+    if value.isascii():
+        return value
+    return Header(value, 'utf-8').encode()
+
+
+def compile_templates(templates: dict, from_email: str, from_name: str) -> dict:
+    """Compile (et valide) tous les templates: {nom: CompiledTemplate}"""
+    return {
+        name: CompiledTemplate(name, template['subject'], template['body'], from_email, from_name)
+        for name, template in templates.items()
+    }